@@ -7,15 +7,27 @@ World modelling and representation for the ATC game.
 - Represent the radar.
 '''
 
+import os
+import logging
+import hashlib
+from time import time
 from itertools import combinations
+from collections import OrderedDict
 
+import numpy
 import pygame.sprite
 
 import lib.utils as U
+import lib.spatial
+import engine.completion
+import engine.trails
 import sprites.radarsprites
 import pilot.pilot
+import entities.aeroplane
 from engine.settings import settings as S
+from engine.resources import resources as R
 from engine.logger import log
+from engine.profiler import profiler
 from lib.euclid import Vector3
 
 __author__ = "Mac Ryan"
@@ -86,6 +98,27 @@ class RunwayManager(object):
             port_iata, runway_name = keys
             del self.__busy_runways[port_iata][runway_name]
 
+    def get_state(self):
+        '''
+        Return the occupancy of the runways as a dictionary in the form
+        ``{port_iata : {runway_name : plane_icao}}``.
+        '''
+        return dict((iata, dict((name, plane.icao) for name, plane in
+                                runways.items() if plane))
+                    for iata, runways in self.__busy_runways.items())
+
+    def set_state(self, state):
+        '''
+        Restore the occupancy of the runways from the output of
+        ``get_state()``. The planes must already be in the aerospace.
+        '''
+        self.__busy_runways = {}
+        for iata, runways in state.items():
+            port = self.aerospace.airports[iata]
+            for name, icao in runways.items():
+                plane = self.aerospace.get_plane_by_icao(icao)
+                self.use_runway(port, port.runways[name], plane)
+
 
 class Aerospace(object):
 
@@ -97,23 +130,64 @@ class Aerospace(object):
 
     The internal __planes dictionary has the following structure:
     {flight_number : (Aeroplane(), PlaneIcon(), TrailingDot() * ...}
+    Planes are kept in order of insertion, so that the simulation evolves the
+    same way when the aerospace is restored from a snapshot.
     '''
 
+    # Tags and icons rects are enlarged by this ratio of their size when
+    # checking for overlaps (same as ``collide_rect_ratio(1.6)``)
+    TAG_CLEARANCE = 0.6
+    TAG_ANGLE_STEP = 10      #degrees between candidate tag placements
+    TAG_RADIUS_STEP = 10     #pixels between candidate tag placements
+    TAG_MAX_RADIUS = 3       #multiple of the default radius of a tag
+    SPRITES_POOL_SIZE = 50   #max sprite bundles kept for recycling
+    BKGROUND_CACHE_VERSION = 1  #to be increased if the drawing code changes
+    # Settings that affect the appearance of the radar background
+    BKGROUND_SETTINGS = ['RADAR_AID', 'RADAR_AID_COLOUR', 'RADAR_AID_STEPS',
+                         'RADAR_RANGE', 'METRES_PER_PIXEL', 'RADAR_RECT',
+                         'AIRPORT_MASTER_IMG_SCALING', 'HUD_INFO_FONT_SIZE',
+                         'MAIN_FONT', 'WHITE', 'GRAY', 'RED', 'GREEN', 'BLUE']
+
     def __init__(self, gamelogic, surface):
         self.gamelogic = gamelogic
         self.surface = surface
-        self.__draw_radar_aid()
+        self.bkground = None
         self.flying_sprites = pygame.sprite.LayeredUpdates()
         self.top_layer = pygame.sprite.Group()
         self.tags = pygame.sprite.Group()
-        self.__planes = {}
+        self.__planes = OrderedDict()
+        # Indexes of the planes (icao --> plane), kept up to date when planes
+        # are added or removed and when their ``on_ground`` or ``locked``
+        # flags change.
+        self.__airborne = OrderedDict()
+        self.__locked = OrderedDict()
+        self.__on_ground = {}        #airport iata --> index
+        self.__ground_ports = {}     #icao --> airport iata
+        self.__by_origin = {}        #airport iata / gate name --> index
+        self.__by_destination = {}   #airport iata / gate name --> index
         self.__airports = {}
         self.__beacons = {}
         self.__gates = {}
         self.tcas_data = {}
+        self.__tags_index = lib.spatial.RectIndex()
+        self.__tag_offsets = {}
+        self.__sprites_pool = []
+        self.completions = engine.completion.CompletionIndex()
+        self.trails = engine.trails.TrailBuffer(S.TRAIL_LENGTH)
+        self.__derived_stats = dict(entities.aeroplane.DERIVED_STATS)
         pilot.pilot.Pilot.set_aerospace(self)
         self.runways_manager = RunwayManager(self)
 
+    def __get_radar_marking(self):
+        '''
+        Return how many metres a step of the radar aid consist of, making sure
+        the value is sensible (not 12735.5, for example...)
+        '''
+        sensibles = [n*1000 for n in (1, 5, 10, 20, 25, 50, 100)]
+        attempts = [S.RADAR_RANGE * 2 / n for n in sensibles]
+        closest = min(attempts, key = lambda x : abs(x-S.RADAR_AID_STEPS))
+        return sensibles[attempts.index(closest)]
+
     def __draw_radar_aid(self):
         '''
         Draw the radar aid.
@@ -121,17 +195,12 @@ class Aerospace(object):
         if not S.RADAR_AID:
             return
         centre = U.sc((S.RADAR_RANGE, S.RADAR_RANGE))
-        # Find how many metres a step consist of, making sure the final value
-        # is sensible (not 12735.5, for example...)
-        sensibles = [n*1000 for n in (1, 5, 10, 20, 25, 50, 100)]
-        attempts = [S.RADAR_RANGE * 2 / n for n in sensibles]
-        closest = min(attempts, key = lambda x : abs(x-S.RADAR_AID_STEPS))
-        metres_per_step = sensibles[attempts.index(closest)]
+        metres_per_step = self.__get_radar_marking()
         if S.RADAR_AID == 'circles':
             step_range = range(metres_per_step, U.rint(S.RADAR_RANGE*2**0.5),
                                metres_per_step)
             for radius in step_range:
-                pygame.draw.circle(self.surface, S.RADAR_AID_COLOUR, centre,
+                pygame.draw.circle(self.bkground, S.RADAR_AID_COLOUR, centre,
                                    U.rint(radius/S.METRES_PER_PIXEL), 1)
         elif S.RADAR_AID in ('grid', 'crosses', 'dots'):
             # In the following line: since division is integer division, this
@@ -139,7 +208,7 @@ class Aerospace(object):
             first = S.RADAR_RANGE - S.RADAR_RANGE/metres_per_step*metres_per_step
             step_range = range(first, S.RADAR_RANGE * 2 + metres_per_step,
                                metres_per_step)
-            draw = lambda fm, to : pygame.draw.aaline(self.surface,
+            draw = lambda fm, to : pygame.draw.aaline(self.bkground,
                                       S.RADAR_AID_COLOUR, U.sc(fm), U.sc(to))
             for step in step_range:
                 if S.RADAR_AID == 'grid':
@@ -148,7 +217,7 @@ class Aerospace(object):
                 elif S.RADAR_AID in ('dots', 'crosses'):
                     for step2 in step_range:
                         if S.RADAR_AID == 'dots':
-                            pygame.draw.circle(self.surface, S.RADAR_AID_COLOUR,
+                            pygame.draw.circle(self.bkground, S.RADAR_AID_COLOUR,
                                                U.sc((step, step2)), 2)
                         elif S.RADAR_AID == 'crosses':
                             x, y = step, step2
@@ -158,18 +227,100 @@ class Aerospace(object):
         else:
                 msg = 'Wrong value of `RADAR_AID` in config file!'
                 raise BaseException(msg)
-        S.RADAR_MARKING = metres_per_step
 
-    def __filter_self_collisions(self, sprite, collisions):
+    def __draw_airport(self, a_port):
         '''
-        Filter the list of collisions eliminating false positive (sprite will
-        always "collide" with self!).
+        Draw an airport and its IATA name on the radar.
         '''
-        try:
-            collisions.remove(sprite)
-        except ValueError:
-            pass
-        return collisions
+        a_image = a_port.get_image(scale=1.0/S.METRES_PER_PIXEL,
+                                   with_labels=False)
+        # Place airport on radar
+        offset = Vector3(-a_image.get_width()/2, -a_image.get_height()/2).xy
+        centre = U.sc(a_port.location.xy)
+        pos = (centre[0]+offset[0], centre[1]+offset[1])
+        self.bkground.blit(a_image, pos)
+        # Draw IATA name
+        fontobj = R.get_font(S.MAIN_FONT, S.HUD_INFO_FONT_SIZE)
+        label = fontobj.render(a_port.iata, True, S.GREEN)
+        pos = centre[0]-label.get_width()/2, centre[1]-label.get_height()/2
+        self.bkground.blit(label, pos)
+        # Draw RNWY feet and PORT centre (debugging purposes)
+#        for rnwy in a_port.runways.values():
+#            pos1 = a_port.location + rnwy['location']
+#            pos2 = a_port.location + rnwy['centre']
+#            pygame.draw.circle(self.surface, WHITE, sc(pos1.xy), 1)
+#            pygame.draw.circle(self.surface, YELLOW, sc(pos2.xy), 1)
+#        pygame.draw.circle(self.surface, RED, sc(a_port.location.xy), 1)
+
+    def __get_bkground_key(self):
+        '''
+        Return a hash of everything the radar background depends on: the
+        size of the radar, the relevant settings and the airports, gates and
+        beacons of the aerospace.
+        '''
+        vector = lambda v : (v.x, v.y, v.z)
+        desc = [self.BKGROUND_CACHE_VERSION, self.surface.get_size()]
+        desc.extend([getattr(S, name) for name in self.BKGROUND_SETTINGS])
+        for iata, port in sorted(self.__airports.items()):
+            desc.append((iata, vector(port.location),
+                         [(s.orientation, s.length, s.width,
+                           vector(s.centre_pos)) for s in port.strips]))
+        for name, gate in sorted(self.__gates.items()):
+            desc.append((name, gate.radial, gate.heading, gate.width,
+                         gate.bottom, gate.top))
+        for id, beacon in sorted(self.__beacons.items()):
+            desc.append((id, tuple(beacon.location)))
+        return hashlib.sha1(repr(desc)).hexdigest()
+
+    def draw_bkground(self):
+        '''
+        Draw the static background of the radar (radar aid, airports, gates
+        and beacons) in ``self.bkground``. The radar screen itself is left
+        untouched (see ``blit_bkground()``), so that the background can be
+        drawn while loading the game in a separate thread.
+
+        The background is cached as a PNG file named after the hash of all it
+        depends on, so that it is drawn only the first time a scenario is
+        played with given settings and screen size.
+        '''
+        if S.RADAR_AID:
+            S.RADAR_MARKING = self.__get_radar_marking()
+        fname = None
+        if S.BKGROUND_CACHE:
+            directory = os.path.join(os.path.expanduser('~'), '.atc-ng',
+                                     'cache')
+            fname = os.path.join(directory,
+                                 'radar-%s.png' % self.__get_bkground_key())
+            if os.path.isfile(fname):
+                try:
+                    self.bkground = pygame.image.load(fname).convert()
+                    return
+                except pygame.error as e:
+                    log.warning('Cached radar background %s is unreadable: '
+                                '%s', fname, e)
+        self.bkground = pygame.surface.Surface(self.surface.get_size(), 0,
+                                               self.surface)
+        self.__draw_radar_aid()
+        for a_port in self.__airports.values():
+            self.__draw_airport(a_port)
+        for gate in self.__gates.values():
+            gate.draw(self.bkground)
+        for beacon in self.__beacons.values():
+            beacon.draw(self.bkground)
+        if fname:
+            try:
+                if not os.path.isdir(directory):
+                    os.makedirs(directory)
+                pygame.image.save(self.bkground, fname)
+            except (pygame.error, IOError, OSError) as e:
+                log.warning('Radar background could not be cached in %s: %s',
+                            fname, e)
+
+    def blit_bkground(self):
+        '''
+        Blit the whole background on the radar screen.
+        '''
+        self.surface.blit(self.bkground, (0, 0))
 
     def __get_crossed_gates(self, plane):
         '''
@@ -179,14 +330,17 @@ class Aerospace(object):
         crossed = []
         origin = Vector3(S.RADAR_RANGE, S.RADAR_RANGE)
         point = Vector3(*plane.position.xy)
-        for gate in self.gates.values():
+        gates = self.gates.values()
+        boundaries = ((plane.heading - S.GATE_TOLERANCE) % 360,
+                      (plane.heading + S.GATE_TOLERANCE) % 360)
+        aligned = U.batch_heading_in_between(boundaries,
+                                             [g.radial for g in gates])
+        for gate, is_aligned in zip(gates, aligned):
+            if not is_aligned or \
+               not gate.bottom <= plane.altitude <= gate.top:
+                continue
             vector = U.heading_to_v3(gate.radial)
-            dist = U.distance_point_line(point, origin, vector)
-            boundaries = ((plane.heading - S.GATE_TOLERANCE) % 360,
-                          (plane.heading + S.GATE_TOLERANCE) % 360)
-            if dist <= gate.width / 2 and \
-               U.heading_in_between(boundaries, gate.radial) and \
-               gate.bottom <= plane.altitude <= gate.top:
+            if U.distance_point_line(point, origin, vector) <= gate.width / 2:
                 crossed.append(gate)
         return crossed
 
@@ -194,78 +348,126 @@ class Aerospace(object):
         '''
         Add aeroplanes to the aerospace.
         '''
+        self.trails.add(plane.icao, plane.position.xy)
+        bundle = self.__get_sprites(plane)
+        icon, tag, tag_c = bundle[0], bundle[-2], bundle[-1]
         # This record will contain all info relative to a given plane
-        record = dict(plane = plane, sprites = [])
+        record = dict(plane = plane, sprites = bundle)
         # Icon sprite
-        icon = sprites.radarsprites.AeroplaneIcon(plane, plane.category)
         self.flying_sprites.add(icon, layer=0)
         self.top_layer.add(icon)
-        record['sprites'].append(icon)
         # Trail dots sprites
-        for time_shift in range(1, S.TRAIL_LENGTH):
-            dot = sprites.radarsprites.TrailingDot(plane, time_shift)
-            self.flying_sprites.add(dot, layer=time_shift)
-            record['sprites'].append(dot)
+        for dot in bundle[1:-2]:
+            self.flying_sprites.add(dot, layer=dot.time_shift)
         # Plane tag
-        tag = sprites.radarsprites.Tag(plane, self.surface.get_rect())
         self.flying_sprites.add(tag, layer=0)
         self.top_layer.add(tag)
         self.tags.add(tag)
-        record['sprites'].append(tag)
         # Tag connector
-        tag_c = sprites.radarsprites.TagConnector(tag)
         self.flying_sprites.add(tag_c, layer=0)
-        record['sprites'].append(tag_c)
         # Storage of plane info in internal dictionary
         self.__planes[plane.icao] = record
+        self.__by_origin.setdefault(plane.origin,
+                                    OrderedDict())[plane.icao] = plane
+        self.__by_destination.setdefault(plane.destination,
+                                         OrderedDict())[plane.icao] = plane
+        self.reindex_plane(plane)
+        self.completions.add_plane(plane.icao)
         return plane
 
+    def __get_airport_at(self, position):
+        '''
+        Return the iata code of the airport closest to ``position``.
+        '''
+        port = min(self.__airports.values(),
+                   key=lambda port : U.ground_distance(port.location, position))
+        return port.iata
+
+    def reindex_plane(self, plane):
+        '''
+        Update the indexes of the planes after a change of the flags of
+        ``plane``. Planes not in the aerospace are ignored.
+        '''
+        icao = plane.icao
+        record = self.__planes.get(icao)
+        if record is None or record['plane'] is not plane:
+            return
+        if plane.flags.on_ground:
+            if icao not in self.__ground_ports:
+                self.__airborne.pop(icao, None)
+                iata = self.__get_airport_at(plane.position)
+                self.__ground_ports[icao] = iata
+                self.__on_ground.setdefault(iata, OrderedDict())[icao] = plane
+        elif icao not in self.__airborne:
+            iata = self.__ground_ports.pop(icao, None)
+            if iata is not None:
+                del self.__on_ground[iata][icao]
+            self.__airborne[icao] = plane
+        if plane.flags.locked:
+            self.__locked[icao] = plane
+        else:
+            self.__locked.pop(icao, None)
+
+    def __get_sprites(self, plane):
+        '''
+        Return the list of sprites representing ``plane`` on radar (icon,
+        trailing dots, tag and tag connector). Sprites of removed planes are
+        recycled if available.
+        '''
+        if self.__sprites_pool:
+            bundle = self.__sprites_pool.pop()
+            bundle[0].rebind(plane, plane.category)
+            for sprite in bundle[1:-1]:
+                sprite.rebind(plane)
+            return bundle
+        bundle = [sprites.radarsprites.AeroplaneIcon(plane, plane.category)]
+        for time_shift in range(1, S.TRAIL_LENGTH):
+            bundle.append(sprites.radarsprites.TrailingDot(plane, time_shift))
+        tag = sprites.radarsprites.Tag(plane, self.surface.get_rect())
+        bundle.append(tag)
+        bundle.append(sprites.radarsprites.TagConnector(tag))
+        return bundle
+
     def remove_plane(self, plane):
         '''
         Remove aeroplanes from the aerospace.
         '''
-        for sprite in self.__planes[plane.icao]['sprites']:
+        bundle = self.__planes[plane.icao]['sprites']
+        for sprite in bundle:
             sprite.kill()
+        if len(self.__sprites_pool) < self.SPRITES_POOL_SIZE:
+            self.__sprites_pool.append(bundle)
         del self.__planes[plane.icao]
+        icao = plane.icao
+        self.__airborne.pop(icao, None)
+        self.__locked.pop(icao, None)
+        iata = self.__ground_ports.pop(icao, None)
+        if iata is not None:
+            del self.__on_ground[iata][icao]
+        del self.__by_origin[plane.origin][icao]
+        del self.__by_destination[plane.destination][icao]
+        self.completions.remove_plane(plane.icao)
+        self.trails.remove(plane.icao)
 
     def add_airport(self, a_port):
         '''
         Add an airport to the aerospace.
         '''
         self.__airports[a_port.iata] = a_port
-        a_image = a_port.get_image(scale=1.0/S.METRES_PER_PIXEL,
-                                   with_labels=False)
-        # Place airport on radar
-        offset = Vector3(-a_image.get_width()/2, -a_image.get_height()/2).xy
-        centre = U.sc(a_port.location.xy)
-        pos = (centre[0]+offset[0], centre[1]+offset[1])
-        self.surface.blit(a_image, pos)
-        # Draw IATA name
-        fontobj = pygame.font.Font(S.MAIN_FONT, S.HUD_INFO_FONT_SIZE)
-        label = fontobj.render(a_port.iata, True, S.GREEN)
-        pos = centre[0]-label.get_width()/2, centre[1]-label.get_height()/2
-        self.surface.blit(label, pos)
-        # Draw RNWY feet and PORT centre (debugging purposes)
-#        for rnwy in a_port.runways.values():
-#            pos1 = a_port.location + rnwy['location']
-#            pos2 = a_port.location + rnwy['centre']
-#            pygame.draw.circle(self.surface, WHITE, sc(pos1.xy), 1)
-#            pygame.draw.circle(self.surface, YELLOW, sc(pos2.xy), 1)
-#        pygame.draw.circle(self.surface, RED, sc(a_port.location.xy), 1)
+        self.completions.add_airport(a_port)
 
     def add_gate(self, gate):
         '''
         Add a gate to the aerospace.
         '''
         self.__gates[gate.name] = gate
-        gate.draw(self.surface)
 
     def add_beacon(self, beacon):
         '''
         Add a gate to the aerospace.
         '''
         self.__beacons[beacon.id] = beacon
-        beacon.draw(self.surface)
+        self.completions.add_beacon(beacon)
 
     def connect_tags(self):
         '''
@@ -276,23 +478,114 @@ class Aerospace(object):
             tpos = value['sprites'][-1].position
             pygame.draw.aaline(self.surface, S.WHITE, ppos, tpos)
 
+    def __inflate(self, rect):
+        '''
+        Return ``rect`` enlarged by the clearance to keep around tags.
+        '''
+        return rect.inflate(rect.w * self.TAG_CLEARANCE,
+                            rect.h * self.TAG_CLEARANCE)
+
+    def __get_tag_offsets(self, tag):
+        '''
+        Return the candidate placements for ``tag``, closest to its current
+        placement first, as a tuple of arrays (angles, radii, x offsets, y
+        offsets). They are cached, as there are only a few possible current
+        angles.
+        '''
+        key = (tag.angle, tag.default_radius)
+        if key in self.__tag_offsets:
+            return self.__tag_offsets[key]
+        default = tag.default_radius
+        radii = range(default, default * self.TAG_MAX_RADIUS + 1,
+                      self.TAG_RADIUS_STEP)
+        step = self.TAG_ANGLE_STEP
+        deltas = [0]
+        for delta in range(step, 180 + step, step):
+            deltas.extend((delta, -delta))
+        angles = [(tag.angle + delta) % 360 for delta in deltas[:360 / step]]
+        candidates = [(angle, radius) for radius in radii for angle in angles]
+        angles, radii = [numpy.array(a) for a in zip(*candidates)]
+        rads = numpy.radians(angles)
+        offsets = (angles, radii,
+                   numpy.round(numpy.cos(rads) * radii).astype(int),
+                   -numpy.round(numpy.sin(rads) * radii).astype(int))
+        self.__tag_offsets[key] = offsets
+        return offsets
+
+    def __find_tag_placement(self, tag, index):
+        '''
+        Look for a free placement for ``tag`` among the candidate positions,
+        at increasing distance from its plane. Return True and place the tag
+        if one is found, False otherwise.
+        '''
+        angles, radii, ox, oy = self.__get_tag_offsets(tag)
+        # All candidates are tested at once against all the occupied rects
+        # in their neighbourhood.
+        base = tag.get_rect_at(0, 0)
+        inflated = self.__inflate(base)
+        reach = 2 * radii[-1]
+        obstacles = index.query(inflated.inflate(reach, reach))
+        rr = tag.radar_rect
+        free = (base.left + ox >= rr.left) & (base.right + ox <= rr.right) & \
+               (base.top + oy >= rr.top) & (base.bottom + oy <= rr.bottom)
+        if obstacles:
+            obs = numpy.array([(r.left, r.top, r.right, r.bottom)
+                               for r in obstacles])
+            left = (inflated.left + ox)[:, numpy.newaxis]
+            top = (inflated.top + oy)[:, numpy.newaxis]
+            right = left + inflated.w
+            bottom = top + inflated.h
+            collides = ((left < obs[:, 2]) & (right > obs[:, 0]) &
+                        (top < obs[:, 3]) & (bottom > obs[:, 1])).any(axis=1)
+            free &= ~collides
+        if not free.any():
+            return False
+        i = free.argmax()
+        tag.angle = int(angles[i])
+        tag.radius = int(radii[i])
+        tag.rect = base.move(int(ox[i]), int(oy[i]))
+        return True
+
     def place_tags(self):
         '''
         Spread plane tags so as not to overlap with other tags or planes.
         (This should guarantee it's always possible to read them).
-        '''
-        is_colliding = lambda tag : \
-            self.__filter_self_collisions(tag,
-                       pygame.sprite.spritecollide(tag, self.top_layer,
-                           False, pygame.sprite.collide_rect_ratio(1.6)))
-        angle_step = 5
-        radius_step = 10
+
+        Tags keep the placement of the previous ping as long as it is on radar
+        and free, so that they don't jump around. The others are moved to the
+        first free candidate position, searched with a spatial index of the
+        occupied rectangles. The search is interrupted after
+        ``TAG_PLACEMENT_BUDGET`` milliseconds: tags left without a free spot
+        may overlap. The tags searched least recently are searched first, so
+        that a few tags that can't be placed don't starve the others.
+        '''
+        index = self.__tags_index
+        index.clear()
+        for record in self.__planes.values():
+            icon = record['sprites'][0]
+            index.insert(icon, self.__inflate(icon.rect))
+        to_place = []
+        for tag in self.tags:
+            if tag.place() and not index.collides(self.__inflate(tag.rect)):
+                index.insert(tag, self.__inflate(tag.rect))
+            else:
+                to_place.append(tag)
+        to_place.sort(key=lambda tag : tag.last_search)
+        deadline = time() + S.TAG_PLACEMENT_BUDGET / 1000.0
+        for tag in to_place:
+            placed = False
+            now = time()
+            if now < deadline:
+                tag.last_search = now
+                placed = self.__find_tag_placement(tag, index)
+            # No free spot (very crowded radar): overlap, if possible
+            # without leaving the radar
+            if not placed and not tag.place():
+                tag.angle = tag.default_angle
+                tag.radius = tag.default_radius
+                tag.place()
+            index.insert(tag, self.__inflate(tag.rect))
         for tag in self.tags:
-            start_angle = tag.angle
-            while not tag.place() or is_colliding(tag):
-                tag.angle = (tag.angle + angle_step) % 360
-                if tag.angle == start_angle:
-                    tag.radius += radius_step
             tag.connector.update()
 
     def kill_escaped(self):
@@ -319,10 +612,11 @@ class Aerospace(object):
                         event = S.PLANE_LEAVES_CORRECT_GATE  #yay! :)
                 plane['plane'].pilot.say(msg, colour)
                 self.gamelogic.remove_plane(plane['plane'], event)
-                log.info('%s left aerospace under event %s' %
-                         (plane['plane'].icao, event))
-                log.debug('Data at exit was: %s' %
-                          plane['plane'].get_current_configuration())
+                log.info('%s left aerospace under event %s',
+                         plane['plane'].icao, event)
+                if log.isEnabledFor(logging.DEBUG):
+                    log.debug('Data at exit was: %s',
+                              plane['plane'].get_current_configuration())
 
     def get_plane_by_icao(self, icao):
         icao = icao.upper()
@@ -335,6 +629,60 @@ class Aerospace(object):
         '''
         return [v['plane'] for v in self.__planes.values()]
 
+    @property
+    def airborne(self):
+        '''
+        Return a list of the planes that are not on ground.
+        '''
+        return self.__airborne.values()
+
+    @property
+    def locked(self):
+        '''
+        Return a list of the planes under computer control (taking off or
+        landing).
+        '''
+        return self.__locked.values()
+
+    def get_planes_on_ground(self, iata):
+        '''
+        Return a list of the planes on ground at the airport ``iata``.
+        '''
+        try:
+            return self.__on_ground[iata].values()
+        except KeyError:
+            return []
+
+    def count_planes_airborne(self):
+        '''
+        Return the number of planes that are not on ground.
+        '''
+        return len(self.__airborne)
+
+    def count_planes_on_ground(self):
+        '''
+        Return the number of planes on ground, at any airport.
+        '''
+        return len(self.__planes) - len(self.__airborne)
+
+    def get_planes_by_origin(self, name):
+        '''
+        Return a list of the planes coming from the airport or gate ``name``.
+        '''
+        try:
+            return self.__by_origin[name].values()
+        except KeyError:
+            return []
+
+    def get_planes_by_destination(self, name):
+        '''
+        Return a list of the planes directed to the airport or gate ``name``.
+        '''
+        try:
+            return self.__by_destination[name].values()
+        except KeyError:
+            return []
+
     @property
     def airports(self):
         '''
@@ -356,30 +704,21 @@ class Aerospace(object):
         '''
         return self.__beacons
 
-    def check_proximity(self, point):
-        '''
-        Check if a given point is near enough to another plane to trigger the
-        TCAS alarm.
-        '''
-        for plane in self.aeroplanes:
-            distance = point - plane.position
-            if abs(distance.z) < S.VERTICAL_CLEARANCE and \
-               distance.x**2 + distance.y**2 < S.HORIZONTAL_CLEARANCE**2:
-                return True
-        return False
-
     def set_tcas_data(self):
         '''
         TCAS = Traffic Collision Avoidance System. Set the data that will be
         queried by individual TCAS onboard each plane.
         '''
         data = {}
-        # Filter out aeroplanes that are on ground
-        planes = [p for p in self.aeroplanes if p.flags.on_ground != True]
+        pairs = 0
+        # Aeroplanes that are on ground are ignored
+        planes = self.__airborne.values()
+        h_clearance = S.HORIZONTAL_CLEARANCE**2
         for p1, p2 in combinations(planes, 2):
-            distance = p1.position - p2.position
-            if abs(distance.z) < S.VERTICAL_CLEARANCE and \
-               distance.x**2 + distance.y**2 < S.HORIZONTAL_CLEARANCE**2:
+            pos1, pos2 = p1.position, p2.position
+            if abs(pos1.z - pos2.z) < S.VERTICAL_CLEARANCE and \
+               (pos1.x - pos2.x)**2 + (pos1.y - pos2.y)**2 < h_clearance:
+                pairs += 1
                 try:
                     data[p1.icao].append(p2)
                 except KeyError:
@@ -389,17 +728,53 @@ class Aerospace(object):
                 except KeyError:
                     data[p2.icao] = [p1]
         self.tcas_data = data
+        profiler.set_counters(tcas_pairs=pairs)
 
     def update(self, pings):
-        for plane in self.__planes.values():
-            plane['plane'].update(pings)
+        t = time()
+        # Sleeping aeroplanes (waiting at an airport) are neither simulated
+        # nor redrawn, but the time they wait still counts for the score.
+        awake = [r for r in self.__planes.values() if not r['plane'].asleep]
+        asleep = len(self.__planes) - len(awake)
+        for record in awake:
+            record['plane'].update(pings)
+        if asleep:
+            mult = asleep * pings * S.PING_IN_SECONDS
+            self.gamelogic.score_event(S.PLANE_WAITS_ONE_SECOND,
+                                       multiplier=mult)
+        # Aeroplanes terminated during the update are gone
+        awake = [r for r in awake if r['plane'].icao in self.__planes]
+        rescaled = self.trails.record([(r['plane'].icao,
+                                        r['plane'].position.xy)
+                                       for r in awake])
+        t = profiler.lap('physics', t)
         self.set_tcas_data()
-        self.flying_sprites.update()
+        t = profiler.lap('tcas', t)
+        for record in self.__planes.values() if rescaled else awake:
+            for sprite in record['sprites']:
+                sprite.update()
+        for record in awake:
+            if record['plane'].can_sleep():
+                record['plane'].asleep = True
+        t = profiler.lap('draw', t)
         self.kill_escaped()
+        t = profiler.lap('physics', t)
         self.place_tags()
         for tag in self.tags:
             tag.connector.generate()
+        profiler.lap('tags', t)
+        # Hit rate of the memoised derived state of the aeroplanes since the
+        # previous update
+        stats = entities.aeroplane.DERIVED_STATS
+        hits = stats['hits'] - self.__derived_stats['hits']
+        reads = hits + stats['misses'] - self.__derived_stats['misses']
+        self.__derived_stats = dict(stats)
+        profiler.set_counters(planes=len(self.__planes), asleep=asleep,
+                              sprites=len(self.flying_sprites),
+                              derived_hits=100 * hits / reads if reads else 0)
 
     def draw(self):
+        t = time()
         self.flying_sprites.clear(self.surface, self.bkground)
         self.flying_sprites.draw(self.surface)
+        profiler.lap('draw', t)
@@ -5,9 +5,9 @@ Provide the logic for the playing mode of ATC-NG.
 '''
 
 import random
-from time import time
 
 import lib.utils as U
+import lib.spatial
 import entities.yamlhandlers as ymlhand
 from engine.settings import settings as S
 from engine.logger import log
@@ -41,24 +41,25 @@ class Challenge(object):
     MAX_PORT_PLANES = 6           # maximum number of created planes that can
                                   # be on ground simultaneously
 
-    def __init__(self, gamelogic):
+    def __init__(self, gamelogic, scenario='default'):
         self.gamelogic = gamelogic
         self.airline_handler = ymlhand.AirlinesHandler()
         self.model_handler = ymlhand.PlaneModelHandler()
-        self.__init_scenario()
+        self.__init_scenario(scenario)
         self.__init_entry_data()
         self.fuel_per_metre = 1000 / (S.RADAR_RANGE*11.3936)  #4 times diagonal
-        # PLANE ENTRY VARIABLES
+        # PLANE ENTRY VARIABLES - times are in seconds of simulated time, so
+        # that the match doesn't depend on the framerate (see ``update()``)
         self.plane_counter = 0
         self.frequency = self.FREQ_START
-        self.last_entry = time() - self.FREQ_START + self.DELAY
-        self.last_freq_increase = time()
+        self.last_entry = - self.FREQ_START + self.DELAY
+        self.last_freq_increase = 0
 
-    def __init_scenario(self):
+    def __init_scenario(self, fname):
         '''
         Load an appropriate scenario and set all the local variables
         '''
-        fname = 'default'
+        self.scenario_name = fname
         self.scenario = ymlhand.ScenarioHandler(fname)
         self.flightnum_generator = self.airline_handler.random_flight
         self.model_generator = self.model_handler.random_model
@@ -69,12 +70,19 @@ class Challenge(object):
         position on the map.
         '''
         gates_data = []
+        # Entry slots are the flight levels of the gates: the gates are
+        # indexed by position, to find quickly the slots near an aeroplane.
+        self.__gates_index = lib.spatial.PointIndex(S.HORIZONTAL_CLEARANCE)
+        self.__gate_levels = {}
+        self.__occupied_slots = {}  #gate name --> set of levels
         for gate in self.scenario.gates:
             position = Vector3(*gate.location)
             velocity = U.heading_to_v3((gate.heading + 180)%360)
             levels = range(gate.top, gate.bottom-500, -500)
             levels = [l for l in levels if l%1000 == 500]
             gates_data.append((gate.name, position, velocity, levels))
+            self.__gates_index.insert(gate.name, position)
+            self.__gate_levels[gate.name] = levels
         ports_data = []
         for port in self.scenario.airports:
             position = port.location.copy()
@@ -83,12 +91,33 @@ class Challenge(object):
             ports_data.append((port.iata, position, velocity))
         self.__entry_data = dict(gates=gates_data, airports=ports_data)
 
+    def __occupy_entry_slots(self, position):
+        '''
+        Mark as occupied the entry slots too close to ``position`` for an
+        aeroplane to enter there without triggering the TCAS.
+        '''
+        for name in self.__gates_index.query(position,
+                                             S.HORIZONTAL_CLEARANCE):
+            levels = [l for l in self.__gate_levels[name]
+                      if abs(l - position.z) < S.VERTICAL_CLEARANCE]
+            if levels:
+                self.__occupied_slots.setdefault(name, set()).update(levels)
+
+    def __refresh_entry_slots(self):
+        '''
+        Find the entry slots occupied by the aeroplanes in the aerospace.
+        Aeroplanes entering afterwards (in the same ping) are added by
+        ``__generate_flight_plan``.
+        '''
+        self.__occupied_slots = {}
+        for plane in self.gamelogic.aerospace.airborne:
+            self.__occupy_entry_slots(plane.position)
+
     def __check_grounded_is_ok(self):
         '''
         Return False if there are already too many planes in airports.
         '''
-        short = self.gamelogic.aerospace.aeroplanes
-        on_ground = len([p for p in short if p.flags.on_ground == True])
+        on_ground = self.gamelogic.aerospace.count_planes_on_ground()
         return True if on_ground < self.MAX_PORT_PLANES else False
 
     def __generate_flight_plan(self):
@@ -111,15 +140,17 @@ class Challenge(object):
             entry_data_gates = self.__entry_data['gates'][:]
             random.shuffle(entry_data_gates)
             # Attempt to make planes enter the aerospace without making them
-            # collide with each other
+            # collide with each other: lowest free level of the first gate
+            # with one.
             while entry_data_gates:
                 orig, pos, vel, levels = entry_data_gates.pop()
-                levels = levels[:]
-                while levels:
-                    # Prevent in-place modification on __entry_data
-                    pos = pos.copy()
-                    pos.z = levels.pop()
-                    if not self.gamelogic.aerospace.check_proximity(pos):
+                occupied = self.__occupied_slots.get(orig, ())
+                for level in reversed(levels):
+                    if level not in occupied:
+                        # Prevent in-place modification on __entry_data
+                        pos = pos.copy()
+                        pos.z = level
+                        self.__occupy_entry_slots(pos)
                         vel = vel.copy()
                         tmp = random.choice(self.scenario.airports)
                         dest = tmp.iata
@@ -160,18 +191,47 @@ class Challenge(object):
         kwargs.update(result)
         # Set the module of the velocity (until here a normalized vector)
         kwargs['velocity'] *= kwargs['max_speed']
-        log.debug('About to add plane: %s' % kwargs)
-        self.gamelogic.add_plane(Aeroplane(self.gamelogic.aerospace, **kwargs))
+        log.debug('About to add plane: %s', kwargs)
+        plane = Aeroplane(self.gamelogic.aerospace, **kwargs)
+        self.gamelogic.add_plane(plane)
+        if self.gamelogic.replay:
+            self.gamelogic.replay.spawn(self.gamelogic.ping_count, plane.icao)
         self.plane_counter += 1
 
+    def get_state(self):
+        '''
+        Return the data needed to resume the challenge at a later time.
+        '''
+        return dict(plane_counter=self.plane_counter,
+                    frequency=self.frequency,
+                    last_entry=self.last_entry,
+                    last_freq_increase=self.last_freq_increase,
+                    ports_order=[d[0] for d in self.__entry_data['airports']])
+
+    def set_state(self, state):
+        '''
+        Resume the challenge from the output of ``get_state()``.
+        '''
+        for name in ('plane_counter', 'frequency', 'last_entry',
+                     'last_freq_increase'):
+            setattr(self, name, state[name])
+        # The airports entry data is shuffled in place, so its order is part
+        # of the state of the challenge
+        ports = dict((d[0], d) for d in self.__entry_data['airports'])
+        self.__entry_data['airports'] = [ports[iata] for iata in
+                                         state['ports_order']]
+
     def update(self):
         '''
         Perform actions (typically making a new aeroplane to appear) based
-        on the kind of challenge.
+        on the kind of challenge. This is called once per radar ping, and it
+        uses the simulated time, so that given the same seed the planes will
+        always appear at the same ping.
         '''
-        now = time()
+        now = self.gamelogic.sim_time
         if now - self.last_entry > self.frequency:
             self.last_entry = now
+            self.__refresh_entry_slots()
             if self.plane_counter == 0:
                 for i in range(self.PLANE_NUMBER_START):
                     self.__add_plane()
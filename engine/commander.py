@@ -7,19 +7,19 @@ Provide functionality for entering commands and processing them.
 import re
 import time
 import textwrap
-import os.path as path
 from collections import deque
 from copy import copy
 
-import yaml
 import pygame.font
 from pygame.locals import *
-from pkg_resources import resource_stream  #@UnresolvedImport
 
 import lib.utils as U
 from engine.settings import settings as S
+from engine.resources import resources as R
 from engine.logger import log
+from engine.profiler import profiler
 from lib.euclid import Vector3
+from lib.trie import PrefixTrie
 
 __author__ = "Mac Ryan"
 __copyright__ = "Copyright 2011, Mac Ryan"
@@ -69,20 +69,37 @@ def __attach_combo_info():
     for k, v in dict_.items():
         PLANE_COMMANDS[k]['combos'] = list(set(v) - set([k]))
 
+def __compile_grammar():
+    '''
+    Build the lookup tables used by the parser and by autocompletion, so that
+    tokens are resolved without scanning the command files.
+    '''
+    for pool, trie in ((GAME_COMMANDS, GAME_COMMANDS_TRIE),
+                       (PLANE_COMMANDS, PLANE_COMMANDS_TRIE)):
+        for cname, command in pool.items():
+            spellings = sorted(command['spellings'], key=len)
+            SHORTEST_SPELLING[cname] = spellings[0]
+            LONGEST_SPELLINGS[cname] = spellings[::-1]
+            FLAG_SPELLINGS[cname] = {}
+            for flag, flag_spellings in (command.get('flags') or {}).items():
+                for spelling in flag_spellings:
+                    FLAG_SPELLINGS[cname][spelling] = flag
+            for spelling in spellings:
+                SPELLINGS[spelling] = cname
+                trie.insert(spelling, cname)
+                ALL_COMMANDS_TRIE.insert(spelling, cname)
+            # Strips reStructuredText markup
+            description = command.copy()
+            description['description'] = __rst_to_strip.sub(
+                                        '', description['description'])
+            description['description'] = \
+                    description['description'].replace('  ', ' ')
+            DESCRIPTIONS[cname] = description
+
 # +-----------------------+
 # | MODULE INITIALISATION |
 # +-----------------------+
 
-# LOAD COMMAND DESCRIPTIONS
-__data = resource_stream(__name__, path.join('data', 'gcommands.yml'))
-GAME_COMMANDS = yaml.load(__data)
-__data = resource_stream(__name__, path.join('data', 'pcommands.yml'))
-PLANE_COMMANDS = yaml.load(__data)
-__data = resource_stream(__name__, path.join('data', 'pcombos.yml'))
-VALID_PLANE_COMMANDS_COMBOS = yaml.load(__data)
-__command_files_sanity_check()
-__attach_combo_info()
-
 # STRIPPING REGEX TO CONVERT FROM reStructuredText TO plain text
 __rst_to_strip = re.compile(
         r'(`)|'                           # literals and interpreted arguments
@@ -95,23 +112,49 @@ __rst_to_strip = re.compile(
         r'(\<.+\>)'                       # target literals
         )
 
+# COMMAND DESCRIPTIONS (filled by ``initialise()``)
+GAME_COMMANDS = {}
+PLANE_COMMANDS = {}
+VALID_PLANE_COMMANDS_COMBOS = []
+
+# COMPILED GRAMMAR (spellings are unique across both pools of commands)
+SPELLINGS = {}              #spelling --> command name
+FLAG_SPELLINGS = {}         #command name --> {flag spelling: flag name}
+SHORTEST_SPELLING = {}      #command name --> shortest spelling
+LONGEST_SPELLINGS = {}      #command name --> spellings, longest first
+DESCRIPTIONS = {}           #command name --> command with plain text doc
+GAME_COMMANDS_TRIE = PrefixTrie()
+PLANE_COMMANDS_TRIE = PrefixTrie()
+ALL_COMMANDS_TRIE = PrefixTrie()
+COMMANDS_TRIES = {'game_commands' : GAME_COMMANDS_TRIE,
+                  'plane_commands' : PLANE_COMMANDS_TRIE,
+                  'all_commands' : ALL_COMMANDS_TRIE}
+
 # +------------------+
 # | MODULE FUNCTIONS |
 # +------------------+
 
+def initialise():
+    '''
+    Load the command files and compile the grammar, unless already done.
+    This happens automatically when the first parser is created.
+    '''
+    if GAME_COMMANDS:
+        return
+    load = lambda fname : R.get_yaml('engine/data/' + fname)
+    GAME_COMMANDS.update(load('gcommands.yml'))
+    PLANE_COMMANDS.update(load('pcommands.yml'))
+    VALID_PLANE_COMMANDS_COMBOS.extend(load('pcombos.yml'))
+    __command_files_sanity_check()
+    __attach_combo_info()
+    __compile_grammar()
+
 def get_command_description(cname):
     '''
     Return the available information on the command ``cname``.
     '''
-    if cname in PLANE_COMMANDS.keys():
-        command = PLANE_COMMANDS[cname]
-    elif cname in GAME_COMMANDS.keys():
-        command = GAME_COMMANDS[cname]
-    res = command.copy()
-    # Strips reStructuredText markup
-    res['description'] = __rst_to_strip.sub('', res['description'])
-    res['description'] = res['description'].replace('  ', ' ')
-    return res
+    initialise()
+    return DESCRIPTIONS[cname].copy()
 
 # +----------------+
 # | MODULE CLASSES |
@@ -129,6 +172,7 @@ class Parser(object):
     '''
 
     def __init__(self, aerospace, game_commands_processor):
+        initialise()  #the module, if this is the first parser
         self.aerospace = aerospace
         self.game_commands_processor = game_commands_processor
         self.initialise()
@@ -153,11 +197,7 @@ class Parser(object):
         ``HEADING`` and so on.
         Return None if the given alias does not match any command.
         '''
-        for pool in (GAME_COMMANDS, PLANE_COMMANDS):
-            for cname in pool:
-                if alias in pool[cname]['spellings']:
-                    return cname
-        return None
+        return SPELLINGS.get(alias)
 
     # VALIDATORS These methods provide validation for the arguments of the
     # commands. All arguments are passed-in as strings and are converted to a
@@ -334,14 +374,9 @@ class Parser(object):
                     issued = c
                     self.bits.append(a)
             # Identify the issued command
-            command_name = None
-            command = None
-            for k, v in PLANE_COMMANDS.items():
-                if issued in v['spellings']:
-                    command_name = k
-                    command = v
-                    break
-            if not command_name or not command:
+            command_name = SPELLINGS.get(issued)
+            command = PLANE_COMMANDS.get(command_name)
+            if not command:
                 msg = '"%s" is neither a command nor a flag.' % issued
                 return msg
             # Parse arguments
@@ -363,18 +398,9 @@ class Parser(object):
                     return msg
             # Check for flags and parse them if present
             flags = []
-            possible_flag = command['flags']  #[] = skip
-            while possible_flag:
-                possible_flag = False
-                if not self.bits:
-                    break
-                candidate = self.bits[-1]
-                for k, v in command['flags'].items():
-                    if candidate in v:
-                        flags.append(k)
-                        self.bits.pop()
-                        possible_flag = True
-                        break
+            flag_spellings = FLAG_SPELLINGS[command_name]
+            while self.bits and self.bits[-1] in flag_spellings:
+                flags.append(flag_spellings[self.bits.pop()])
             # Store the parsed commands
             parsed_commands.append([command_name, args, flags])
         # Verify that some command has been entered
@@ -406,13 +432,8 @@ class Parser(object):
         except IndexError:  # Empty bits --> No command issued
             msg = 'What is the command?'
             return msg
-        cname = None
-        command = None
-        for k, v in GAME_COMMANDS.items():
-            if issued in v['spellings']:
-                cname = k
-                command = v
-                break
+        cname = SPELLINGS.get(issued)
+        command = GAME_COMMANDS.get(cname)
         if command:
             args = self.bits
             # Check the amount of parameters is correct
@@ -459,8 +480,8 @@ class CommandLine(object):
                      (S.CONSOLE_LINES_NUM + 1.0 / S.CONSOLE_FONT_SIZE_RATIO)
         large_size = int(small_size / S.CONSOLE_FONT_SIZE_RATIO)
         small_size = int(small_size)
-        self.large_f = pygame.font.Font(S.MAIN_FONT, large_size)
-        self.small_f = pygame.font.Font(S.MAIN_FONT, small_size)
+        self.large_f = R.get_font(S.MAIN_FONT, large_size)
+        self.small_f = R.get_font(S.MAIN_FONT, small_size)
         self.max_large_line_length = self.__get_max_line_length(self.large_f)
         self.max_small_line_length = self.__get_max_line_length(self.small_f)
         # Parser and processors
@@ -480,89 +501,27 @@ class CommandLine(object):
             if width > S.CLI_RECT.width:
                 return chars_number - 2  #always leave some space to the right
 
-    def __get_all_spellings_all_commands(self, commands):
+    def _complete_command(self, trie, root):
         '''
-        Return a list of all possible spellings of all the commands in a pool
-        of commands.
+        Return the completion of ``root`` among the command spellings in
+        ``trie``, or None if no spelling begins with ``root``. If only one
+        command matches, its longest spelling is used (for example ``HE``
+        is completed to ``HEADING`` rather than to ``HEAD``).
         '''
-        ret = []
-        for c in commands.values():
-            ret.extend(c['spellings'])
-        return ret
-
-    def __keep_longest_aliases(self, aliases):
-        '''
-        Return a list in which only the longest alias of a group of aliases
-        sharing the same root is kept. For example if the arguments are
-        ``['H', 'HEAD', 'HEADING']``, ``['HEADING']`` will be returned.
-        '''
-        filtered = []
-        aset = set(aliases)
-        for pool in (GAME_COMMANDS, PLANE_COMMANDS):
-            for values in pool.values():
-                tmp = set(values['spellings']) & aset
-                if tmp:
-                    filtered.append(sorted(list(tmp), key=len).pop())
-        return filtered
+        cnames = trie.values(root)
+        if len(cnames) == 1:
+            for spelling in LONGEST_SPELLINGS[cnames[0]]:
+                if spelling.startswith(root):
+                    return spelling + ' '
+        return trie.complete(root)
 
     def _pick_shortest_alias(self, command):
         '''
         Return the shortes form for a command or None if the command spelling
         hasn't been found.
         '''
-        for pool in (GAME_COMMANDS, PLANE_COMMANDS):
-            for values in pool.values():
-                spellings = values['spellings']
-                if command in spellings:
-                    return min(spellings, key=len)
-        return None
-
-    def _get_list_of_existing(self, what, context=None):
-        '''
-        Return a list of existing (=valid) strings representing `what`
-        ('planes', 'airports', 'runaways' or 'beacons'). The `contex` value
-        is used for those `what` which are not global to the aerospace (e.g.:
-        runaways can be given for a given airport, not aerospace).
-        '''
-        if what == 'planes':
-            return [p.icao for p in self.aerospace.aeroplanes]
-        elif what == 'plane_commands':
-            return self.__get_all_spellings_all_commands(PLANE_COMMANDS)
-        elif what == 'airports':
-            return [iata for iata in self.aerospace.airports.keys()]
-        elif what == 'runaways':
-            assert context != None  #Context must be the name of the airport
-            for iata, ap in self.aerospace.airports.items():
-                if iata == context:
-                    return [r for r in ap.runways.keys()]
-            return []
-        elif what == 'beacons':
-            return [id for id in self.aerospace.beacons.keys()]
-        elif what == 'game_commands':
-            return self.__get_all_spellings_all_commands(GAME_COMMANDS)
-        elif what == 'all_commands':
-            r = self.__get_all_spellings_all_commands(GAME_COMMANDS)
-            r.extend(self.__get_all_spellings_all_commands(PLANE_COMMANDS))
-            return r
-        else:
-            raise BaseException('Unknown type of items: %s!' % what)
-
-    def _get_common_beginning(self, strings):
-        '''
-        Return the strings that is common to the beginning of each string in
-        the strings list.
-        '''
-        result = []
-        if not strings:
-            return result
-        limit = min([len(s) for s in strings])
-        for i in range(limit):
-            chs = set([s[i] for s in strings])
-            if len(chs) == 1:
-                result.append(chs.pop())
-            else:
-                break
-        return ''.join(result)
+        cname = SPELLINGS.get(command)
+        return SHORTEST_SPELLING[cname] if cname else None
 
     def _render_console_lines(self):
         '''
@@ -577,6 +536,7 @@ class CommandLine(object):
                                         SRCALPHA)
         for i in range(len(lines)):
             result.blit(surfaces[i], (0,i*font_height))
+        profiler.count_surfaces(len(surfaces) + 1)
         return result
 
     def _short_commmand(self, commandline):
@@ -603,7 +563,7 @@ class CommandLine(object):
         '''
         Append a message to the console.
         '''
-        log.debug(text)
+        log.debug('%s', text)
         wrapped = textwrap.wrap(text,
                                 width=self.max_small_line_length,
                                 subsequent_indent=' ' * S.CONSOLE_INDENTATION)
@@ -655,33 +615,27 @@ class CommandLine(object):
                     what = 'plane_commands'
                 # the argument of circling can be 'L' (left) which could be
                 # understood as the shorthand for 'LAND'
-                elif pre in PLANE_COMMANDS['LAND']['spellings'] and \
-                     prepre not in PLANE_COMMANDS['CIRCLE']['spellings']:
+                elif SPELLINGS.get(pre) == 'LAND' and \
+                     SPELLINGS.get(prepre) != 'CIRCLE':
                     what = 'airports'
-                elif pre in PLANE_COMMANDS['HEADING']['spellings'] or \
-                     pre in PLANE_COMMANDS['CLEAR']['spellings']:
+                elif SPELLINGS.get(pre) in ('HEADING', 'CLEAR'):
                     what = 'beacons'
                 elif prepre:
-                    if prepre in PLANE_COMMANDS['LAND']['spellings']:
+                    if SPELLINGS.get(prepre) == 'LAND':
                         what = 'runaways'
                         context = pre
                     elif (self.parser._validate_icao(splitted[0]) or \
                          self.parser._validate_icao(splitted[1])) and \
-                         pre not in PLANE_COMMANDS.keys():
+                         pre not in PLANE_COMMANDS:
                         what = 'plane_commands'
         if not what:
             return
-        pool = [el.upper() for el in self._get_list_of_existing(what, context)]
-        matches = [i for i in pool if i.find(root)==0]
-        if what in ('plane_commands', 'game_commands', 'all_commands'):
-            matches = self.__keep_longest_aliases(matches)
-        if len(matches) == 1:
-            match = matches[0]+' '
-        elif len(matches) > 1:
-            match = self._get_common_beginning(matches)
+        if what in COMMANDS_TRIES:
+            match = self._complete_command(COMMANDS_TRIES[what], root)
         else:
-            return
-        self.chars.extend(list(match[len(root):]))
+            match = self.aerospace.completions.complete(what, root, context)
+        if match:
+            self.chars.extend(list(match[len(root):]))
 
     def do_parsing(self):
         '''
@@ -707,6 +661,7 @@ class CommandLine(object):
                 self.msg_append(S.NEUTRAL_COLOUR,
                                 ' '.join((self.cmd_prefix,self.text)))
                 self.command_history.insert(0, self.text)
+                self.aerospace.gamelogic.record_command(self.text)
             # ...and executed
             callable_(args)
             # Command line is emptied
@@ -768,6 +723,7 @@ class CommandLine(object):
             self.last_console_snapshot = copy(self.console_lines)
             self.console_image = self._render_console_lines()
         image = self.large_f.render(self.text + cursor, True, S.WHITE, S.BLACK)
+        profiler.count_surfaces()
         sw, sh = self.surface.get_size()
         x = sw*0.01
         y = sh*0.03
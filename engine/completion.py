@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8  -*-
+'''
+Autocompletion of the names of the objects in the aerospace.
+'''
+
+from lib.trie import PrefixTrie
+
+__author__ = "Mac Ryan"
+__copyright__ = "Copyright 2011, Mac Ryan"
+__license__ = "GPL v3"
+#__version__ = "<dev>"
+#__date__ = "<unknown>"
+__maintainer__ = "Mac Ryan"
+__email__ = "quasipedia@gmail.com"
+__status__ = "Development"
+
+
+class CompletionIndex(object):
+
+    '''
+    Prefix tries of the names of planes, airports, runways and beacons of an
+    aerospace.
+
+    The aerospace keeps the index up to date as objects are added and
+    removed, so that completing a name on the command line doesn't require
+    to list all the existing objects at each key press.
+    '''
+
+    def __init__(self):
+        self.planes = PrefixTrie()
+        self.airports = PrefixTrie()
+        self.beacons = PrefixTrie()
+        self.runways = {}  #iata --> trie of the runways of the airport
+
+    def add_plane(self, icao):
+        self.planes.insert(icao.upper())
+
+    def remove_plane(self, icao):
+        self.planes.remove(icao.upper())
+
+    def add_airport(self, a_port):
+        iata = a_port.iata.upper()
+        self.airports.insert(iata)
+        self.runways[iata] = PrefixTrie((r.upper(), None)
+                                        for r in a_port.runways.keys())
+
+    def add_beacon(self, beacon):
+        self.beacons.insert(beacon.id.upper())
+
+    def complete(self, what, root, context=None):
+        '''
+        Return the completion of ``root`` among the existing `what`
+        ('planes', 'airports', 'runaways' or 'beacons'), followed by a space
+        if only one name matches. The `context` is the name of the airport
+        when completing runways. Return None if no name matches.
+        '''
+        if what == 'planes':
+            trie = self.planes
+        elif what == 'airports':
+            trie = self.airports
+        elif what == 'runaways':
+            assert context != None  #Context must be the name of the airport
+            trie = self.runways.get(context)
+            if trie is None:
+                return None
+        elif what == 'beacons':
+            trie = self.beacons
+        else:
+            raise BaseException('Unknown type of items: %s!' % what)
+        match = trie.complete(root)
+        if match is not None and trie.count(root) == 1:
+            match += ' '
+        return match
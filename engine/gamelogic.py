@@ -9,6 +9,7 @@ Amongst others:
     - invokes AI support for planes in emergency
 '''
 
+import random
 import textwrap
 from time import time, strftime, gmtime
 
@@ -22,8 +23,14 @@ import engine.aerospace
 import engine.commander
 import sprites.guisprites
 import engine.challenge
+import engine.recorder
+import engine.replay
+import engine.metrics
+import engine.profiler
 from engine.settings import settings as S
+from engine.resources import resources as R
 from engine.logger import log
+from engine.profiler import profiler
 
 __author__ = "Mac Ryan"
 __copyright__ = "Copyright 2011, Mac Ryan"
@@ -42,6 +49,8 @@ class GameCommandsProcessor(object):
     '''
 
     TEXT_W = 76
+    # Rendered help pages, by (command name, size of the radar screen)
+    HELP_PAGES = {}
 
     def __init__(self, gamelogic):
         self.gamelogic = gamelogic
@@ -77,7 +86,7 @@ class GameCommandsProcessor(object):
     def __display_paused_message(self):
         dest = self.gamelogic.radar_surface
         font_size = dest.get_rect().height / 16
-        fontobj = pygame.font.Font(S.MAIN_FONT, font_size)
+        fontobj = R.get_font(S.MAIN_FONT, font_size)
         lines = ['GAME IS PAUSED']
         source = U.render_lines(fontobj, lines, S.RED)
         U.blit_dead_centre(dest, source)
@@ -96,10 +105,55 @@ class GameCommandsProcessor(object):
             self.__restore_radar()
             log.debug('### GAME RESUMED ###')
 
+    def _toggle_profiler(self):
+        '''
+        Show or hide the profiler overlay on the radar screen.
+        '''
+        gl = self.gamelogic
+        if gl.profiler_overlay:
+            # While paused, the overlay must disappear from the radar image
+            # that will be restored on resume.
+            if self.good_radar_image:
+                gl.profiler_overlay.surface = self.good_radar_image
+            gl.profiler_overlay.erase()
+            gl.profiler_overlay = None
+        else:
+            gl.profiler_overlay = engine.profiler.ProfilerOverlay(
+                                    gl.radar_surface, gl.aerospace.bkground)
+
     def _give_help_on(self, cname):
         '''
         Provide help on a given command.
         '''
+        self.display_image(self.get_help_page(cname))
+
+    def get_help_page(self, cname):
+        '''
+        Return the rendered help on a given command.
+        '''
+        key = (cname, self.gamelogic.radar_surface.get_size())
+        try:
+            return self.HELP_PAGES[key]
+        except KeyError:
+            img = self.HELP_PAGES[key] = U.render_colour_lines(
+                                self.fontobj, self.__get_help_lines(cname))
+            return img
+
+    def prewarm(self):
+        '''
+        Render the help pages of all commands, one per iteration, so that
+        the main loop can do it a little at a time once the match started.
+        '''
+        cnames = sorted(engine.commander.GAME_COMMANDS.keys()) + \
+                 sorted(engine.commander.PLANE_COMMANDS.keys())
+        for cname in cnames:
+            self.get_help_page(cname)
+            yield cname
+
+    def __get_help_lines(self, cname):
+        '''
+        Return the lines of text of the help on a given command.
+        '''
         INDENT = 2
         NORMAL = S.PALE_GRAY
         EMPHASIS = S.WHITE
@@ -140,18 +194,24 @@ class GameCommandsProcessor(object):
         if 'combos' in data.keys():  #game commands can't be combined!
             ea('Can be combined with:')
             ia(', '.join(data['combos']))
-        self.display(lines)
+        return lines
 
     def display(self, lines):
         '''
         Display some text on the radar screen, pausing the game if necessary.
         ``lines`` is a list of tuples in the form (text, colour).
         '''
+        self.display_image(U.render_colour_lines(self.fontobj, lines))
+
+    def display_image(self, img):
+        '''
+        Display some rendered text on the radar screen, pausing the game if
+        necessary.
+        '''
         if self.gamelogic.machine_state == S.MS_RUN:
             self._toggle_paused()
         else:
             self.__blur_radar()
-        img = U.render_colour_lines(self.fontobj, lines)
         self.gamelogic.radar_surface.blit(img, self.text_blit_position)
 
     def process_command(self, commandline):
@@ -171,6 +231,8 @@ class GameCommandsProcessor(object):
                 self.__display_paused_message()
         elif cname == 'HELP':
             self._give_help_on(args[0])
+        elif cname == 'PROFILE':
+            self._toggle_profiler()
         elif cname == 'SORT':
             self.gamelogic.strips.filter = args[0]
         elif cname == 'LIST':
@@ -187,8 +249,17 @@ class GameLogic(object):
     Docstring.
     '''
 
-    def __init__(self, surface):
+    def __init__(self, surface, scenario='default', seed=None,
+                 record_replay=True, load=True):
         self.machine_state = S.MS_RUN
+        # Simulation clock and random number generator. The seed is what
+        # makes a match reproducible, together with the issued commands.
+        self.ping_count = 0
+        if seed is None:
+            seed = int(time() * 1000) % 2**32
+        self.seed = seed
+        random.seed(seed)
+        log.info('Random seed for this match: %s', seed)
         # Surfaces
         self.global_surface = surface
         self.radar_surface = surface.subsurface(S.RADAR_RECT)
@@ -214,6 +285,7 @@ class GameLogic(object):
                          (S.SCORE_RECT.x + S.SCORE_RECT.w, S.SCORE_RECT.y-1))
         self.aerospace = engine.aerospace.Aerospace(self, self.radar_surface)
         self.game_commander = GameCommandsProcessor(self)
+        self.profiler_overlay = None
         self.cli = engine.commander.CommandLine(
             self.cli_surface, self.aerospace,
             self.game_commander.process_command)
@@ -223,12 +295,72 @@ class GameLogic(object):
         # Scoring
         self.score = 0
         self.fatalities = 0
+        self.event_counts = {}  #number of occurrences of each score event
         # Game interface
         self.fixed_sprites = pygame.sprite.Group()
         self.fixed_sprites.add(sprites.guisprites.Score(self))
-        self.challenge = engine.challenge.Challenge(self)
+        self.scenario_name = scenario
+        self.record_replay = record_replay
+        self.challenge = None
+        self.recorder = self.replay = self.metrics = None
+        # Unless the caller takes care of it (see ``load()``), the match is
+        # ready to be played when the constructor returns.
+        if load:
+            for progress, phase in self.load():
+                pass
+            for progress, phase in self.render():
+                pass
+            self.start()
+
+    def load(self):
+        '''
+        Load the challenge and the scenario. Only data files are read (no
+        pygame surface or font is used), so that it can be done in a separate
+        thread.
+
+        This is a generator: before each phase of the loading it yields a
+        tuple with the completed fraction of the loading and the description
+        of the phase. When it is exhausted, ``render()`` must be run.
+        '''
+        yield 0.0, 'Loading airlines, aeroplanes and scenario'
+        self.challenge = engine.challenge.Challenge(self, self.scenario_name)
+        yield 0.9, 'Loading airports, gates and beacons'
         self.parse_scenario(self.challenge.scenario)
+
+    def render(self):
+        '''
+        Render the maps of the airports and the radar background. SDL is not
+        thread-safe, so this must be run in the main thread, after ``load()``.
+        This is a generator, like ``load()``. When it is exhausted,
+        ``start()`` must be called.
+        '''
+        scenario = self.challenge.scenario
+        steps = float(len(scenario.airports) + 1)
+        for i, port in enumerate(scenario.airports):
+            yield i / steps, 'Drawing airport %s' % port.iata
+            self.__add_airport_map(port)
+        yield (steps - 1) / steps, 'Drawing the radar screen'
+        self.aerospace.draw_bkground()
+        for port in scenario.airports:
+            port.del_cached_images()
+
+    def start(self):
+        '''
+        Display the loaded scenario and start the match.
+        '''
+        self.draw_maps()
+        self.aerospace.blit_bkground()
         self._update_statusbar(start_over=True)
+        # Flight data recorder
+        self.recorder = engine.recorder.FlightDataRecorder() \
+                        if S.FDR_ENABLED else None
+        # Replay of the match
+        if self.record_replay:
+            self.replay = engine.replay.ReplayWriter(self.scenario_name,
+                                                     self.seed)
+        # Periodic metrics export
+        self.metrics = engine.metrics.MetricsExporter(self) \
+                       if S.METRICS_ENABLED else None
 
     def _update_statusbar(self, start_over=False):
         '''
@@ -247,6 +379,7 @@ class GameLogic(object):
         fontobj = U.get_fontobj_by_text_width(S.MAIN_FONT, text,
                   (S.STATUSBAR_RECT.w, S.STATUSBAR_RECT.h-2))
         text = fontobj.render(text, True, S.WHITE)
+        profiler.count_surfaces()
         self.statusbar_surface.blit(text, (0,
                             S.STATUSBAR_RECT.h - fontobj.get_height() - 1))
 
@@ -258,7 +391,7 @@ class GameLogic(object):
         a_map = pygame.surface.Surface(
                (S.MAPS_RECT.w, S.MAPS_RECT.h), SRCALPHA)
         # Prepare the label and get its size
-        fontobj = pygame.font.Font(S.MAIN_FONT, margin*2)
+        fontobj = R.get_font(S.MAIN_FONT, margin*2)
         text = '%s ] %s' % (port.iata, port.name)
         ellipsis = ''
         while True:
@@ -285,37 +418,52 @@ class GameLogic(object):
 
     def parse_scenario(self, scenario):
         '''
-        Parse and render a scenario.
+        Add the airports, gates and beacons of a scenario to the aerospace.
         '''
         # airportS
         for port in scenario.airports:
             self.aerospace.add_airport(port)
-            self.__add_airport_map(port)
-            port.del_cached_images()
-        self.draw_maps()
         # GATES
         for gate in scenario.gates:
             self.aerospace.add_gate(gate)
         # BEACONS
         for beacon in scenario.beacons:
             self.aerospace.add_beacon(beacon)
-        # Update the background of the aerospace
-        self.aerospace.bkground = self.aerospace.surface.copy()
 
-    def add_plane(self, plane):
+    @property
+    def sim_time(self):
         '''
-        Add a plane from the game.
+        Simulated time elapsed since the beginning of the match, in seconds.
+        '''
+        return self.ping_count * S.PING_IN_SECONDS
+
+    def record_command(self, commandline):
+        '''
+        Store a command issued by the player in the replay of the match.
+        '''
+        if self.replay:
+            self.replay.command(self.ping_count, commandline)
+
+    def _register_plane(self, plane):
+        '''
+        Place a plane in the aerospace and create its flight strip.
         '''
-        planes = self.aerospace.aeroplanes
         ports = self.aerospace.airports
         self.aerospace.add_plane(plane)
         status = S.INBOUND if plane.destination in ports.keys() else S.OUTBOUND
-        self.strips.add(sprites.guisprites.FlightStrip(plane, status))
+        self.strips.add_strip(plane, status)
+
+    def add_plane(self, plane):
+        '''
+        Add a plane from the game.
+        '''
+        airborne = self.aerospace.count_planes_airborne()
+        self._register_plane(plane)
         plane.pilot.say('Hello tower, we are ready to copy instructions!',
                         S.ALERT_COLOUR)
         # Only airborne planes impact on proficiency score
         if plane.position.z > 0:
-            already_there = len([p for p in planes if p.position.z > 0]) - 1
+            already_there = airborne - 1
             if already_there > 0:
                 self.score_event(S.PLANE_ENTERS, multiplier=already_there)
 
@@ -355,7 +503,10 @@ class GameLogic(object):
         Events are defined in the settings, other keyword arguments are passed
         according the the event.
         '''
-        # The second element of an event is the amount of points
+        # The first element of an event is its code, the second one is the
+        # amount of points
+        code = event[0]
+        self.event_counts[code] = self.event_counts.get(code, 0) + 1
         score = event[1]
         # If it's a aeroplane end-of-life event, compute the fuel effect.
         if event in (S.PLANE_LANDS_CORRECT_PORT, S.PLANE_LANDS_WRONG_PORT,
@@ -375,21 +526,60 @@ class GameLogic(object):
                              S.EMERGENCY_TCAS)
         self.score += score
 
+    def shutdown(self):
+        '''
+        Operations to be performed at the end of the match.
+        '''
+        if self.recorder:
+            self.recorder.close()
+        if self.replay:
+            self.replay.close()
+        if self.metrics:
+            self.metrics.close()
+
+    def step(self):
+        '''
+        Advance the simulation of exactly one radar ping. Drawing is left to
+        the caller, so that the simulation can also run headlessly.
+        '''
+        start = t = time()
+        self.challenge.update()
+        profiler.lap('challenge', t)
+        self.aerospace.update(1)
+        if self.recorder:
+            self.recorder.record(self.aerospace.aeroplanes)
+        self.ping_count += 1
+        if self.metrics:
+            self.metrics.ping(time() - start)
+
     def update(self, milliseconds):
+        # Subsystems are timed by the profiler (the simulation itself is
+        # timed within ``step``)
         if self.machine_state == S.MS_RUN:
             self.ms_from_last_ping += milliseconds
-            self.challenge.update()
+            t = time()
             self.strips.update()
+            t = profiler.lap('strips', t)
             self.strips.clear(self.strips_surface, self.strips_bkground)
             self.strips.draw(self.strips_surface)
             self.fixed_sprites.update()
             self.fixed_sprites.draw(self.score_surface)
+            profiler.lap('draw', t)
             if self.ms_from_last_ping > S.PING_PERIOD:
                 pings = self.ms_from_last_ping / S.PING_PERIOD
                 self.ms_from_last_ping %= S.PING_PERIOD
-                self.aerospace.update(pings)
+                # Pings are always computed one at a time, so that the outcome
+                # of the match doesn't depend on the framerate.
+                for i in range(pings):
+                    self.step()
                 self.aerospace.draw()
+            if self.profiler_overlay:
+                self.profiler_overlay.draw()
         elif self.machine_state == S.MS_PAUSED:
             pass
+        t = time()
         self._update_statusbar()
         self.cli.draw()
+        profiler.lap('cli', t)
+        if self.metrics:
+            self.metrics.frame(milliseconds)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8  -*-
+'''
+Load the game in the background.
+
+Loading the data of a match (airlines, aeroplane models, scenario) takes a
+while. It is therefore performed by a separate thread, while the main one
+keeps the window responsive and displays the progress of the loading. The
+loading thread must not use pygame surfaces or fonts, as SDL is not
+thread-safe: images are rendered afterwards, in the main thread.
+'''
+
+import sys
+import threading
+from time import time
+
+from engine.logger import log
+
+__author__ = "Mac Ryan"
+__copyright__ = "Copyright 2011, Mac Ryan"
+__license__ = "GPL v3"
+#__version__ = "<dev>"
+#__date__ = "<unknown>"
+__maintainer__ = "Mac Ryan"
+__email__ = "quasipedia@gmail.com"
+__status__ = "Development"
+
+
+class BackgroundLoader(threading.Thread):
+
+    '''
+    Background thread running a loading generator, like
+    ``GameLogic.load()``, that yields a (progress, phase) tuple before each
+    phase of the loading.
+
+    Exceptions are not lost: they are raised again in the main thread by
+    ``finished()``.  The loading can be interrupted between two phases with
+    ``cancel()``.
+    '''
+
+    def __init__(self, steps):
+        super(BackgroundLoader, self).__init__(name='loader')
+        self.daemon = True  #a crash of the game must not wait for the loading
+        self.steps = steps
+        self.progress = 0.0
+        self.phase = ''
+        self.error = None
+        self.cancelled = False
+
+    def run(self):
+        try:
+            start = time()
+            for progress, phase in self.steps:
+                self.__log_phase(start)
+                if self.cancelled:
+                    return
+                self.progress, self.phase, start = progress, phase, time()
+            self.__log_phase(start)
+            self.progress = 1.0
+        except:
+            self.error = sys.exc_info()
+
+    def __log_phase(self, start):
+        if self.phase:
+            log.debug('Loading: %s took %.1f ms', self.phase,
+                      (time() - start) * 1000)
+
+    def finished(self):
+        '''
+        Return True if the loading is over, raising in the calling thread the
+        exception that interrupted it, if any.
+        '''
+        if self.is_alive():
+            return False
+        if self.error:
+            raise self.error[0], self.error[1], self.error[2]
+        return True
+
+    def cancel(self):
+        '''
+        Stop the loading at the end of the current phase, and wait for it.
+        '''
+        self.cancelled = True
+        self.join()
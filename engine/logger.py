@@ -2,12 +2,23 @@
 # -*- coding: utf-8  -*-
 '''
 Provide logging capabilities to the ATC-NG game.
+
+Records are not written to disk by the thread that generates them: the ``log``
+object only appends them to a queue, and a background writer thread takes
+care of formatting and writing them. This way the simulation never waits on
+the disk, even with a ``debug`` threshold.
+
+The writer drains the queue periodically rather than being woken up by each
+record: with the GIL, handing every record over to another thread costs the
+simulation more than the write it saves.
 '''
 
 import os
+import atexit
 import logging
-import inspect
-from time import strftime
+import threading
+from collections import deque
+from time import strftime, sleep
 
 from engine.settings import settings as S
 
@@ -21,6 +32,97 @@ __email__ = "quasipedia@gmail.com"
 __status__ = "Development"
 
 
+class QueueHandler(logging.Handler):
+
+    '''
+    Logging handler that hands records over to a queue (a ``deque``, whose
+    ``append`` is thread-safe and never blocks) instead of writing them
+    somewhere. (Python 2 ``logging`` does not ship one.)
+    '''
+
+    def __init__(self, queue):
+        logging.Handler.__init__(self)
+        self.queue = queue
+
+    def prepare(self, record):
+        '''
+        Merge the message with its arguments. This must happen in the calling
+        thread, as arguments are often live simulation objects (vectors,
+        aeroplanes...) that will have changed by the time the writer thread
+        gets to them.
+        '''
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(
+                                                            record.exc_info)
+            record.exc_info = None
+        return record
+
+    def emit(self, record):
+        try:
+            self.queue.append(self.prepare(record))
+        except Exception:
+            self.handleError(record)
+
+
+class LogWriter(threading.Thread):
+
+    '''
+    Background thread consuming the records queue every ``FLUSH_INTERVAL``
+    seconds and passing them to the handler doing the actual (blocking)
+    output.
+    '''
+
+    FLUSH_INTERVAL = 0.2
+
+    def __init__(self, queue, handler):
+        super(LogWriter, self).__init__(name='log-writer')
+        self.daemon = True
+        self.queue = queue
+        self.handler = handler
+        self.stopping = False
+
+    def run(self):
+        while not self.stopping:
+            sleep(self.FLUSH_INTERVAL)
+            self.drain()
+        self.drain()
+        self.handler.close()
+
+    def drain(self):
+        '''
+        Write all the queued records.
+        '''
+        queue = self.queue
+        while queue:
+            self.handler.handle(queue.popleft())
+
+    def stop(self):
+        '''
+        Flush pending records and terminate the thread.
+        '''
+        if self.is_alive():
+            self.stopping = True
+            self.join()
+
+
+class Logger(logging.Logger):
+
+    '''
+    Main logger of ATC-NG. The log file and the writer thread are set up by
+    ``initialise()``, which is called the first time the logger is used.
+    '''
+
+    initialised = False
+
+    def isEnabledFor(self, level):
+        # All logging methods check this before doing anything else
+        if not self.initialised:
+            initialise()
+        return logging.Logger.isEnabledFor(self, level)
+
+
 def __remove_old_logs():
     '''
     Removes old logs from the system.
@@ -30,10 +132,17 @@ def __remove_old_logs():
     while len(logs) >= S.LOG_NUMBER:
         os.unlink(os.path.join(__log_dir, logs.pop()))
 
-def __get_logger():
+def initialise():
     '''
-    Prepare and reuturn the main logger object, used throughout ATC-NG.
+    Remove old logs, set the threshold of the main logger (unless set
+    already) and start writing the log file. Do nothing if already done.
     '''
+    global writer
+    if log.initialised:
+        return
+    log.initialised = True
+    S.initialise()  #creates the user directory, if missing
+    __remove_old_logs()
     YAML_LOOKUP = dict(debug = logging.DEBUG,
                        info = logging.INFO,
                        warning = logging.WARNING,
@@ -43,19 +152,21 @@ def __get_logger():
     if S.LOG_THRESHOLD not in YAML_LOOKUP:
         msg = 'Incorrect LOG_THRESHOLD value in the setting file!'
         raise BaseException(msg)
-    # Create a logging instance and set it's threshold
-    log = logging.getLogger('main')
-    log.setLevel(YAML_LOOKUP[S.LOG_THRESHOLD])
-    # Set the handler (file output)
+    if log.level == logging.NOTSET:
+        log.setLevel(YAML_LOOKUP[S.LOG_THRESHOLD])
+    # Set the handler (file output), which is driven by the writer thread
     fname = os.path.join(__log_dir, strftime('%Y-%m-%d@%Hh%M.log'))
     handler_file = logging.FileHandler(fname)
     # Set the format of the logging messages
     fmt = '%(relativeCreated)8d %(levelname)-9s %(module)-20s %(message)s'
     datefmt='%H:%M:%S'
     handler_file.setFormatter(logging.Formatter(fmt=fmt, datefmt=datefmt))
-    log.addHandler(handler_file)
-    return log
+    queue = deque()
+    writer = LogWriter(queue, handler_file)
+    writer.start()
+    atexit.register(writer.stop)
+    log.addHandler(QueueHandler(queue))
 
 __log_dir = os.path.join(os.path.expanduser('~'), '.atc-ng', 'logs')
-__remove_old_logs()
-log = __get_logger()
\ No newline at end of file
+writer = None
+log = Logger('main')
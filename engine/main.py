@@ -9,22 +9,32 @@ there". It's implemented in python (with pygame).
 This module sole purpose is to initialise and manage the pygame environment.
 '''
 
+from time import time
+IMPORTS_START = time()  #for the startup profile
+
 import os
 import sys
+import argparse
 
 import pygame.display
 import pygame.image
 import traceback
 from pygame.locals import *
-from pkg_resources import resource_filename #@UnresolvedImport
 
+import engine.logger
+import engine.commander
+import engine.loader
+import sprites.radarsprites
+import sprites.guisprites
 from engine.settings import settings as S
+from engine.resources import resources as R
 from engine.logger import log
+from engine.profiler import profiler, StartupTimer
 
 __author__ = "Mac Ryan"
 __copyright__ = "Copyright 2011, Mac Ryan"
 __license__ = "GPL v3"
-#__version__ = "<dev>"
+#__version__ = "<dev>"
 #__date__ = "<unknown>"
 __maintainer__ = "Mac Ryan"
 __email__ = "quasipedia@gmail.com"
@@ -38,11 +48,13 @@ __status__ = "Development"
 
 class MainWindow(object):
 
-    def __init__(self):
+    SPLASH_FRAMERATE = 20  #the loading thread needs the CPU more
+
+    def __init__(self, startup=None, profile_startup=False):
+        self.startup = startup or StartupTimer()
+        self.profile_startup = profile_startup
         # Initialisation of pygame environment
-        fn = resource_filename(__name__, os.path.join('data', 'icon.png'))
-        icon = pygame.image.load(fn)
-        pygame.display.set_icon(icon)
+        pygame.display.set_icon(R.get_image('engine/data/icon.png'))
         if S.USE_FULLSCREEN:
             self.screen = pygame.display.set_mode(S.WINDOW_SIZE,
                                                   pygame.FULLSCREEN)
@@ -51,16 +63,83 @@ class MainWindow(object):
             self.screen = pygame.display.set_mode(S.WINDOW_SIZE)
         self.screen.fill(S.BLACK)
         pygame.display.flip()
+        self.startup.lap('Window')
         # Create timer
         self.clock = pygame.time.Clock() #to track FPS
         self.fps= 0
-        # Create game logic - the import happens here because the module
-        # initialisation requires the pygame environment to be initialised
+        # Commands and sprites would be initialised on first use anyway, but
+        # this way each phase is timed separately
         import gamelogic
-        self.game_logic = gamelogic.GameLogic(self.screen)
+        self.startup.lap('Game modules')
+        engine.commander.initialise()
+        self.startup.lap('Commands')
+        sprites.radarsprites.initialise()
+        sprites.guisprites.initialise()
+        self.startup.lap('Sprites')
+        self.game_logic = gamelogic.GameLogic(self.screen, load=False)
+        self.startup.lap('Game logic')
+        self.load_game()
+        # Caches not needed for the first frame are filled afterwards
+        self.prewarm = self.game_logic.game_commander.prewarm()
         # State machine
         self.running = False
 
+    def load_game(self):
+        '''
+        Load the match in a separate thread, displaying the progress of the
+        loading on the radar screen in the meanwhile. The scenario is then
+        rendered in the main thread, as pygame is not thread-safe.
+        '''
+        gl = self.game_logic
+        loader = engine.loader.BackgroundLoader(gl.load())
+        splash = sprites.guisprites.Splash(gl.radar_surface.get_size())
+        loader.start()
+        first_frame = True
+        while not loader.finished():
+            if self.__quit_requested():
+                loader.cancel()
+                return
+            self.__show_splash(splash, loader.progress / 2, loader.phase)
+            if first_frame:
+                self.startup.lap('Splash')
+                first_frame = False
+            self.clock.tick(self.SPLASH_FRAMERATE)
+        self.startup.lap('Loading')
+        for progress, phase in gl.render():
+            if self.__quit_requested():
+                return
+            self.__show_splash(splash, 0.5 + progress / 2, phase)
+        self.startup.lap('Rendering')
+        gl.start()
+
+    def __quit_requested(self):
+        '''
+        Return True (and set the machine state accordingly) if the window has
+        been closed.
+        '''
+        for event in pygame.event.get():
+            if event.type == QUIT:
+                self.game_logic.machine_state = S.MS_QUIT
+                return True
+        return False
+
+    def __show_splash(self, splash, progress, phase):
+        splash.update(progress, phase)
+        self.game_logic.radar_surface.blit(splash.image, splash.rect)
+        pygame.display.flip()
+
+    def report_startup(self):
+        '''
+        Log the duration of the startup phases, and print them if requested.
+        '''
+        lines = self.startup.get_report()
+        for line in lines:
+            log.info('Startup: %s', line)
+        if self.profile_startup:
+            print 'Time to first frame:'
+            for line in lines:
+                print '  ' + line
+
     def handle_events(self):
         '''
         Route pygame events to the appropriate handler.
@@ -82,20 +161,45 @@ class MainWindow(object):
             pygame.display.set_caption(capt % self.clock.get_fps())
             self.handle_events()
             self.game_logic.update(self.clock.get_time())
+            t = time()
             pygame.display.flip()
+            profiler.lap('flip', t)
+            profiler.end_frame()
+            if self.startup:
+                self.startup.lap('First frame')
+                self.report_startup()
+                self.startup = None
+            elif self.prewarm and next(self.prewarm, None) is None:
+                self.prewarm = None
             self.clock.tick(S.MAX_FRAMERATE)
+        self.game_logic.shutdown()
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Air Traffic Controller - NG')
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='print the time taken by each startup phase')
+    args = parser.parse_args(argv)
+    startup = StartupTimer(IMPORTS_START)
+    startup.lap('Imports')
     try:
         version = __version__  #set when package is buit @UndefinedVariable
     except NameError:
         version = '<unknown>'
+    window = None
     try:
+        S.initialise()
+        startup.lap('Settings')
+        engine.logger.initialise()
+        startup.lap('Logger')
         log.info('### NEW MATCH - Game version: %s ################' % version)
-        MainWindow().main_loop()
+        window = MainWindow(startup, args.profile_startup)
+        window.main_loop()
     except:
         trace = traceback.format_exc()
         log.critical(trace)
+        # Save the flight data, it is precious to analyse what went wrong
+        if window:
+            window.game_logic.shutdown()
         print trace
         sys.exit(1)
 
@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+# -*- coding: utf-8  -*-
+'''
+Periodic metrics export for the ATC-NG game.
+
+Every ``METRICS_PERIOD`` seconds the exporter takes a sample of the state of
+the game (frame times, ping step times, traffic, TCAS pairs, runway
+occupancy, score rate and memory usage) and emits it as one JSON object per
+line, either to a file or to a Unix socket, so that slowdowns on consoles
+running for hours can be correlated with traffic levels.
+
+The game loop only collects the raw numbers and hands them over to a queue:
+percentiles, JSON encoding and output are done by a writer thread. If the
+writer can't keep up (e.g. nobody reads from the socket) samples are dropped
+rather than slowing the game down.
+'''
+
+import os
+import glob
+import json
+import socket
+import resource
+import threading
+from Queue import Queue, Full
+from time import time, strftime
+
+import numpy
+
+from engine.settings import settings as S
+from engine.logger import log
+
+__author__ = "Mac Ryan"
+__copyright__ = "Copyright 2011, Mac Ryan"
+__license__ = "GPL v3"
+#__version__ = "<dev>"
+#__date__ = "<unknown>"
+__maintainer__ = "Mac Ryan"
+__email__ = "quasipedia@gmail.com"
+__status__ = "Development"
+
+SOCKET_PREFIX = 'unix:'
+PERCENTILES = [50, 90, 99]
+QUEUE_SIZE = 32  #samples waiting to be written before new ones are dropped
+
+
+def get_rss():
+    '''
+    Return the resident set size of the process in kilobytes. Where
+    ``/proc`` is not available, the peak RSS is returned instead.
+    '''
+    try:
+        with open('/proc/self/statm') as file_:
+            pages = int(file_.read().split()[1])
+        return pages * resource.getpagesize() / 1024
+    except (IOError, OSError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def remove_old_metrics(directory):
+    '''
+    Keep only the metrics of the last ``LOG_NUMBER`` matches.
+    '''
+    fnames = sorted(glob.glob(os.path.join(directory, '*.metrics.jsonl')),
+                    reverse=True)
+    for fname in fnames[max(S.LOG_NUMBER - 1, 0):]:
+        os.unlink(fname)
+
+def summarise(values):
+    '''
+    Return a dictionary with mean, percentiles and maximum of ``values``
+    (in milliseconds), or None if there are no values.
+    '''
+    if not values:
+        return None
+    values = numpy.array(values)
+    summary = dict(('p%d' % p, round(v, 3)) for p, v in
+                   zip(PERCENTILES, numpy.percentile(values, PERCENTILES)))
+    summary.update(n=len(values), mean=round(values.mean(), 3),
+                   max=round(values.max(), 3))
+    return summary
+
+
+class MetricsWriter(threading.Thread):
+
+    '''
+    Background thread turning the samples in the queue into JSON lines and
+    writing them to the target (a file name or ``unix:/path/to/socket``).
+    '''
+
+    def __init__(self, queue, target):
+        super(MetricsWriter, self).__init__(name='metrics-writer')
+        self.daemon = True
+        self.queue = queue
+        self.target = target
+        self.output = None
+
+    def __open(self):
+        if self.target.startswith(SOCKET_PREFIX):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.target[len(SOCKET_PREFIX):])
+            self.output = sock.makefile('w')
+        else:
+            self.output = open(self.target, 'a')
+
+    def __close(self):
+        if self.output:
+            try:
+                self.output.close()
+            except (IOError, OSError, socket.error):
+                pass
+            self.output = None
+
+    def __format(self, sample):
+        '''
+        Return the JSON line for a sample collected by the game loop.
+        '''
+        sample['frame_ms'] = summarise(sample['frame_ms'])
+        sample['ping_ms'] = summarise(sample['ping_ms'])
+        return json.dumps(sample, sort_keys=True) + '\n'
+
+    def write(self, sample):
+        line = self.__format(sample)
+        try:
+            if not self.output:
+                self.__open()
+            self.output.write(line)
+            self.output.flush()
+        except (IOError, OSError, socket.error) as e:
+            # The sample is lost; the connection is retried with the next one
+            log.warning('Metrics could not be written to %s: %s',
+                        self.target, e)
+            self.__close()
+
+    def run(self):
+        while True:
+            sample = self.queue.get()
+            if sample is None:
+                break
+            self.write(sample)
+        self.__close()
+
+    def stop(self):
+        '''
+        Write pending samples and terminate the thread.
+        '''
+        if self.is_alive():
+            self.queue.put(None)
+            self.join()
+
+
+class MetricsExporter(object):
+
+    '''
+    Collect the metrics of a ``GameLogic`` and periodically pass them to a
+    ``MetricsWriter``. ``frame()`` must be called once per frame and
+    ``ping()`` once per simulated radar ping.
+    '''
+
+    def __init__(self, gamelogic, target=None, period=None):
+        if target is None:
+            target = S.METRICS_TARGET
+        if not target:
+            directory = os.path.join(os.path.expanduser('~'), '.atc-ng',
+                                     'logs')
+            remove_old_metrics(directory)
+            target = os.path.join(directory,
+                                  strftime('%Y-%m-%d@%Hh%M.metrics.jsonl'))
+        if period is None:
+            period = S.METRICS_PERIOD
+        self.gamelogic = gamelogic
+        self.period = period
+        self.dropped = 0
+        self.__queue = Queue(QUEUE_SIZE)
+        self.writer = MetricsWriter(self.__queue, target)
+        self.writer.start()
+        self.__start_period(time())
+        log.info('Metrics are exported to %s every %s s', target, period)
+
+    def __start_period(self, now):
+        gl = self.gamelogic
+        self.period_start = now
+        self.period_score = gl.score
+        self.period_sim_time = gl.sim_time
+        self.frame_times = []
+        self.ping_times = []
+
+    def frame(self, milliseconds):
+        '''
+        Record the duration of a frame, and emit a sample if it is time to.
+        '''
+        self.frame_times.append(milliseconds)
+        now = time()
+        if now - self.period_start >= self.period:
+            self.sample(now)
+
+    def ping(self, seconds):
+        '''
+        Record the time it took to simulate one radar ping.
+        '''
+        self.ping_times.append(seconds * 1000)
+
+    def sample(self, now=None):
+        '''
+        Collect the current metrics and queue them for the writer thread.
+        '''
+        if now is None:
+            now = time()
+        gl = self.gamelogic
+        aerospace = gl.aerospace
+        airborne = aerospace.count_planes_airborne()
+        on_ground = aerospace.count_planes_on_ground()
+        runways = aerospace.runways_manager.get_state()
+        sim_elapsed = gl.sim_time - self.period_sim_time
+        score_rate = (gl.score - self.period_score) * 60 / sim_elapsed \
+                     if sim_elapsed else 0.0
+        sample = dict(
+            time=round(now, 3),
+            period=round(now - self.period_start, 3),
+            ping=gl.ping_count,
+            sim_time=gl.sim_time,
+            frame_ms=self.frame_times,
+            ping_ms=self.ping_times,
+            planes_airborne=airborne,
+            planes_on_ground=on_ground,
+            tcas_pairs=sum(len(v) for v in aerospace.tcas_data.values()) / 2,
+            runways_busy=sum(len(r) for r in runways.values()),
+            runways=runways,
+            score=round(gl.score, 1),
+            score_per_sim_minute=round(score_rate, 2),
+            rss_kb=get_rss(),
+            dropped=self.dropped)
+        try:
+            self.__queue.put_nowait(sample)
+        except Full:
+            self.dropped += 1
+        self.__start_period(now)
+
+    def close(self):
+        '''
+        Emit a last sample and wait for the writer to finish.
+        '''
+        self.sample()
+        self.writer.stop()
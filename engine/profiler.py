@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+# -*- coding: utf-8  -*-
+'''
+Lightweight profiling of the main loop of the ATC-NG game.
+
+The ``profiler`` object accumulates the time spent in each subsystem during a
+frame and a few counters (planes, sprites, TCAS pairs, surfaces allocated).
+Instrumentation points are placed directly in the code, like this::
+
+    t = time()
+    self.set_tcas_data()
+    t = profiler.lap('tcas', t)
+
+Each instrumentation point costs a call to ``time()`` and a dictionary
+update, so the profiler is always active. The ``/PROFILE`` game command only
+toggles the ``ProfilerOverlay`` that displays the rolling averages on the
+radar screen.
+'''
+
+from collections import deque
+from time import time
+
+import pygame.font
+import pygame.draw
+import pygame.surface
+
+import lib.utils as U
+from engine.settings import settings as S
+from engine.resources import resources as R
+
+__author__ = "Mac Ryan"
+__copyright__ = "Copyright 2011, Mac Ryan"
+__license__ = "GPL v3"
+#__version__ = "<dev>"
+#__date__ = "<unknown>"
+__maintainer__ = "Mac Ryan"
+__email__ = "quasipedia@gmail.com"
+__status__ = "Development"
+
+
+class Profiler(object):
+
+    '''
+    Per-frame timings and counters, averaged over the last ``WINDOW`` frames.
+    '''
+
+    # (key, label) of the timed subsystems, in the order they are displayed
+    SECTIONS = [('challenge', 'Challenge'),
+                ('strips', 'Strips'),
+                ('physics', 'Aerospace physics'),
+                ('tcas', 'TCAS'),
+                ('tags', 'Tag placement'),
+                ('draw', 'Sprite draw'),
+                ('cli', 'CLI'),
+                ('flip', 'Flip')]
+    # (key, label) of the counters. ``surfaces`` is incremented during the
+    # frame, the others are set to their current value.
+    COUNTERS = [('planes', 'Planes'),
+                ('asleep', 'Sleeping planes'),
+                ('sprites', 'Sprites'),
+                ('tcas_pairs', 'TCAS pairs'),
+                ('derived_hits', 'Derived state hits %'),
+                ('surfaces', 'Surfaces/frame')]
+    WINDOW = 60  #frames
+
+    def __init__(self):
+        self.frames = deque(maxlen=self.WINDOW)
+        self.__settable = set(k for k, label in self.COUNTERS
+                              if k != 'surfaces')
+        self.__start_frame()
+
+    def __start_frame(self):
+        self.times = dict((k, 0.0) for k, label in self.SECTIONS)
+        self.surfaces = 0
+
+    def lap(self, section, start):
+        '''
+        Add the time elapsed since ``start`` to ``section``. Return the
+        current time, so that consecutive sections can be chained.
+        '''
+        now = time()
+        self.times[section] += now - start
+        return now
+
+    def count_surfaces(self, amount=1):
+        '''
+        Record the allocation of ``amount`` surfaces.
+        '''
+        self.surfaces += amount
+
+    def set_counters(self, **kwargs):
+        '''
+        Set the current value of the counters passed as keyword arguments.
+        Only the keys in ``COUNTERS`` are accepted (except ``surfaces``,
+        which is incremented with ``count_surfaces``).
+        '''
+        for key in kwargs:
+            if key not in self.__settable:
+                msg = 'Unknown profiler counter: %s' % key
+                raise BaseException(msg)
+        self.__dict__.update(kwargs)
+
+    def end_frame(self):
+        '''
+        Store the data of the frame that just finished and start a new one.
+        '''
+        self.frames.append((self.times, self.surfaces))
+        self.__start_frame()
+
+    def get_report(self):
+        '''
+        Return a list of (label, value) tuples describing the last ``WINDOW``
+        frames. Times are the average and maximum milliseconds per frame.
+        '''
+        report = []
+        frames = self.frames or [(self.times, self.surfaces)]
+        n = float(len(frames))
+        total = 0.0
+        for key, label in self.SECTIONS:
+            values = [times[key] * 1000 for times, surfaces in frames]
+            total += sum(values) / n
+            report.append((label, '%6.2f ms (max %6.2f)' %
+                                  (sum(values) / n, max(values))))
+        report.append(('Total', '%6.2f ms' % total))
+        for key, label in self.COUNTERS:
+            if key == 'surfaces':
+                value = sum(surfaces for times, surfaces in frames) / n
+                report.append((label, '%6.1f' % value))
+            else:
+                report.append((label, '%4d' % getattr(self, key, 0)))
+        return report
+
+
+class ProfilerOverlay(object):
+
+    '''
+    Display the profiler report in the top-left corner of the radar screen.
+    The text is rendered again only every ``REFRESH`` frames, to keep the
+    overlay from measuring mostly itself.
+    '''
+
+    REFRESH = 15  #frames
+    MARGIN = 4
+
+    def __init__(self, surface, bkground):
+        self.surface = surface
+        self.bkground = bkground
+        size = max(S.HUD_INFO_FONT_SIZE, 10)
+        self.fontobj = R.get_font(S.MAIN_FONT, size)
+        self.image = None
+        self.rect = None
+        self.frame = 0
+
+    def __render(self):
+        report = profiler.get_report()
+        lines = [('PROFILER (last %d frames)' % profiler.WINDOW, S.WHITE)]
+        width = max([len(label) for label, value in report])
+        lines.extend([('%s %s' % (label.ljust(width), value), S.PALE_GRAY)
+                      for label, value in report])
+        text = U.render_colour_lines(self.fontobj, lines)
+        w, h = text.get_size()
+        self.image = pygame.surface.Surface(
+                            (w + 2 * self.MARGIN, h + 2 * self.MARGIN))
+        self.image.fill(S.BLACK)
+        pygame.draw.rect(self.image, S.WHITE, self.image.get_rect(), 1)
+        self.image.blit(text, (self.MARGIN, self.MARGIN))
+
+    def draw(self):
+        if self.frame % self.REFRESH == 0:
+            self.erase()
+            self.__render()
+        self.frame += 1
+        self.rect = self.surface.blit(self.image, (0, 0))
+
+    def erase(self):
+        '''
+        Restore the radar background underneath the overlay.
+        '''
+        if self.rect:
+            self.surface.blit(self.bkground, self.rect, self.rect)
+            self.rect = None
+
+
+class StartupTimer(object):
+
+    '''
+    Duration of the phases of the startup of the game, up to the first
+    frame. Each phase begins where the previous one (or ``start``) ended.
+    '''
+
+    def __init__(self, start=None):
+        self.phases = []
+        self.last = time() if start is None else start
+
+    def lap(self, phase):
+        '''
+        Record the end of ``phase``.
+        '''
+        now = time()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def get_report(self):
+        '''
+        Return a list of lines of text with the duration of each phase.
+        '''
+        width = max([len(phase) for phase, seconds in self.phases] + [5])
+        lines = ['%s %8.1f ms' % (phase.ljust(width), seconds * 1000)
+                 for phase, seconds in self.phases]
+        total = sum([seconds for phase, seconds in self.phases])
+        lines.append('%s %8.1f ms' % ('Total'.ljust(width), total * 1000))
+        return lines
+
+
+# Module-level profiler, shared by all instrumentation points.
+profiler = Profiler()
@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+# -*- coding: utf-8  -*-
+'''
+Flight data recorder for the ATC-NG game.
+
+At each radar ping the recorder appends the state of every aeroplane in the
+aerospace to a set of column buffers (one NumPy array per recorded quantity).
+Every ``FDR_FLUSH_PINGS`` pings, and at the end of the match, the buffered
+rows are written to the log directory as a compressed ``.npz`` segment, so
+that what happened during a match can be analysed without grepping the debug
+log. Segments of the same match share the same timestamp prefix and can be
+loaded back together with ``load_recording()``.
+'''
+
+import os
+import glob
+import threading
+from time import strftime
+
+import numpy
+
+from engine.settings import settings as S
+from engine.logger import log
+
+__author__ = "Mac Ryan"
+__copyright__ = "Copyright 2011, Mac Ryan"
+__license__ = "GPL v3"
+#__version__ = "<dev>"
+#__date__ = "<unknown>"
+__maintainer__ = "Mac Ryan"
+__email__ = "quasipedia@gmail.com"
+__status__ = "Development"
+
+
+class FlightDataRecorder(object):
+
+    '''
+    Record the per-ping state of all the aeroplanes in the aerospace.
+
+    Each row of the recording is the state of one aeroplane at one ping. The
+    ``plane`` column is an index in the ``icao`` table saved along with each
+    segment, ``flags`` is a bitfield (see ``FLAGS``) and ``procedure`` an
+    index in ``PROCEDURES`` (0 meaning no procedure is being performed).
+    '''
+
+    # Name and type of the columns, in the order in which they are recorded
+    COLUMNS = [('ping',        numpy.int32),
+               ('plane',       numpy.int32),
+               ('x',           numpy.float64),
+               ('y',           numpy.float64),
+               ('z',           numpy.float64),
+               ('vx',          numpy.float64),
+               ('vy',          numpy.float64),
+               ('vz',          numpy.float64),
+               ('t_heading',   numpy.float32),
+               ('t_altitude',  numpy.float32),
+               ('t_speed',     numpy.float32),
+               ('fuel',        numpy.float32),
+               ('fuel_delta',  numpy.float32),
+               ('flags',       numpy.uint16),
+               ('procedure',   numpy.int8),
+               ('phase',       numpy.int8)]
+    # Bit position of the flags in the ``flags`` column
+    FLAGS = ['collision', 'priority', 'locked', 'busy', 'on_ground',
+             'fuel_emergency', 'tcas', 'expedite']
+    PROCEDURES = [None, 'Avert', 'Bye', 'Circle', 'Clear', 'Land', 'TakeOff']
+    INITIAL_CAPACITY = 4096
+
+    def __init__(self, directory=None, flush_pings=None):
+        if directory is None:
+            directory = os.path.join(os.path.expanduser('~'), '.atc-ng',
+                                     'logs')
+        if flush_pings is None:
+            flush_pings = S.FDR_FLUSH_PINGS
+        self.directory = directory
+        self.flush_pings = flush_pings
+        self.prefix = strftime('%Y-%m-%d@%Hh%M')
+        self.ping = 0
+        self.segment = 0
+        self.icaos = []
+        self.__icao_index = {}
+        self.__procedure_index = dict((name, i) for i, name in
+                                      enumerate(self.PROCEDURES) if name)
+        self.__writers = []
+        self.__allocate(self.INITIAL_CAPACITY)
+        self.__remove_old_recordings()
+
+    def __allocate(self, capacity):
+        '''
+        (Re)allocate the column buffers, preserving the recorded rows.
+        '''
+        columns = {}
+        for name, type_ in self.COLUMNS:
+            columns[name] = numpy.empty(capacity, dtype=type_)
+            if hasattr(self, 'columns'):
+                columns[name][:self.rows] = self.columns[name][:self.rows]
+        self.columns = columns
+        self.capacity = capacity
+        if not hasattr(self, 'rows'):
+            self.rows = 0
+
+    def __remove_old_recordings(self):
+        '''
+        Keep only the recordings of the last ``LOG_NUMBER`` matches.
+        '''
+        pattern = os.path.join(self.directory, '*.fdr-*.npz')
+        prefixes = sorted(set(os.path.basename(f).split('.fdr-')[0]
+                              for f in glob.glob(pattern)), reverse=True)
+        for prefix in prefixes[max(S.LOG_NUMBER - 1, 0):]:
+            for fname in glob.glob(os.path.join(self.directory,
+                                                prefix + '.fdr-*.npz')):
+                os.unlink(fname)
+
+    def __plane_index(self, icao):
+        '''
+        Return the index of ``icao`` in the icao table, adding it if needed.
+        '''
+        try:
+            return self.__icao_index[icao]
+        except KeyError:
+            self.__icao_index[icao] = len(self.icaos)
+            self.icaos.append(icao)
+            return self.__icao_index[icao]
+
+    def record(self, planes):
+        '''
+        Append the state of ``planes`` for the current ping. The values of
+        each plane are read once into a flat list, which is converted to a
+        table in one go and copied column by column into the buffers.
+        '''
+        n = len(planes)
+        if n:
+            if self.rows + n > self.capacity:
+                capacity = self.capacity
+                while self.rows + n > capacity:
+                    capacity *= 2
+                self.__allocate(capacity)
+            start, end = self.rows, self.rows + n
+            nan = numpy.nan
+            icao_index = self.__icao_index
+            procedure_index = self.__procedure_index
+            values = []
+            extend = values.extend
+            for plane in planes:
+                pos = plane.position
+                vel = plane.velocity
+                fl = plane.flags
+                pilot = plane.pilot
+                status = pilot.status
+                tc = pilot.target_conf
+                heading = tc.heading
+                altitude = tc.altitude
+                speed = tc.speed
+                procedure = status['procedure']
+                try:
+                    index = icao_index[plane.icao]
+                except KeyError:
+                    index = self.__plane_index(plane.icao)
+                # Unset targets (None) are stored as NaN, the flags are
+                # booleans packed in the order of ``FLAGS``.
+                extend((index, pos.x, pos.y, pos.z, vel.x, vel.y, vel.z,
+                        nan if heading is None else heading,
+                        nan if altitude is None else altitude,
+                        nan if speed is None else speed,
+                        plane.fuel, plane.fuel_delta,
+                        fl.collision | fl.priority << 1 | fl.locked << 2 |
+                        fl.busy << 3 | fl.on_ground << 4 |
+                        fl.fuel_emergency << 5 | plane.tcas.state << 6 |
+                        (status['haste'] != 'normal') << 7,
+                        0 if procedure is None else
+                        procedure_index[procedure.__class__.__name__],
+                        0 if procedure is None else
+                        getattr(procedure, 'phase', -1)))
+            width = len(self.COLUMNS) - 1
+            table = numpy.fromiter(values, numpy.float64, n * width)
+            table = table.reshape(n, width)
+            self.columns['ping'][start:end] = self.ping
+            for i, (name, type_) in enumerate(self.COLUMNS[1:]):
+                self.columns[name][start:end] = table[:, i]
+            self.rows = end
+        self.ping += 1
+        if self.flush_pings and self.ping % self.flush_pings == 0:
+            self.flush()
+
+    def flush(self):
+        '''
+        Write the buffered rows to a new segment file and empty the buffers.
+        Compression and disk output happen in a separate thread.
+        '''
+        if not self.rows:
+            return
+        self.segment += 1
+        fname = os.path.join(self.directory, '%s.fdr-%04d.npz' %
+                             (self.prefix, self.segment))
+        data = dict((name, self.columns[name][:self.rows].copy())
+                    for name, type_ in self.COLUMNS)
+        data['icao'] = numpy.array(self.icaos)
+        data['flag_names'] = numpy.array(self.FLAGS)
+        data['procedure_names'] = numpy.array(
+                            [name or '' for name in self.PROCEDURES])
+        self.rows = 0
+        self.__writers = [w for w in self.__writers if w.is_alive()]
+        writer = threading.Thread(target=self.__write, args=(fname, data),
+                                  name='fdr-writer')
+        writer.start()
+        self.__writers.append(writer)
+
+    def __write(self, fname, data):
+        '''
+        Save a segment to disk (runs in a writer thread).
+        '''
+        try:
+            numpy.savez_compressed(fname, **data)
+        except (IOError, OSError) as e:
+            log.error('Flight data recorder could not write %s: %s', fname, e)
+
+    def close(self):
+        '''
+        Flush pending rows and wait for all the segments to be on disk.
+        '''
+        self.flush()
+        for writer in self.__writers:
+            writer.join()
+        self.__writers = []
+
+
+def load_recording(prefix, directory=None):
+    '''
+    Load all the segments of the recording whose name starts with ``prefix``
+    (e.g.: ``2011-09-13@21h42``) and return them as a single dictionary of
+    columns. The ``icao`` column is expanded so that it has one entry per row.
+    '''
+    if directory is None:
+        directory = os.path.join(os.path.expanduser('~'), '.atc-ng', 'logs')
+    fnames = sorted(glob.glob(os.path.join(directory,
+                                           prefix + '*.fdr-*.npz')))
+    if not fnames:
+        raise IOError('No flight data recordings matching "%s"' % prefix)
+    segments = [numpy.load(fname) for fname in fnames]
+    names = [name for name, type_ in FlightDataRecorder.COLUMNS]
+    result = dict((name, numpy.concatenate([s[name] for s in segments]))
+                  for name in names)
+    # The icao table of later segments is a superset of earlier ones.
+    icaos = segments[-1]['icao']
+    result['icao'] = icaos[result['plane']]
+    return result
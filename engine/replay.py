@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8  -*-
+'''
+Replay files for the ATC-NG game.
+
+A match is fully determined by the scenario, the seed of the random number
+generator and the commands issued by the player at each radar ping. A replay
+file stores exactly that: a one-line JSON header followed by one record per
+line in the form ``<ping>\\t<kind>\\t<payload>``, where ``kind`` is ``C`` for a
+command entered on the console and ``S`` for an aeroplane spawned by the
+challenge (spawns are not needed to reproduce the match, they are stored to
+detect when a replay diverges from the original one). The file is gzipped.
+
+Replays are written in the ``replays`` subdirectory of the user directory and
+can be played back headlessly with ``utils/run-replay.py``.
+'''
+
+import os
+import glob
+import gzip
+import json
+from time import strftime
+
+from engine.settings import settings as S
+from engine.logger import log
+
+__author__ = "Mac Ryan"
+__copyright__ = "Copyright 2011, Mac Ryan"
+__license__ = "GPL v3"
+#__version__ = "<dev>"
+#__date__ = "<unknown>"
+__maintainer__ = "Mac Ryan"
+__email__ = "quasipedia@gmail.com"
+__status__ = "Development"
+
+REPLAY_VERSION = 1
+COMMAND = 'C'
+SPAWN = 'S'
+
+
+class ReplayWriter(object):
+
+    '''
+    Write the replay of the current match.
+
+    Each record is flushed as soon as it is written, so that the replay of a
+    match that ended with a crash is still readable up to the crash itself.
+    '''
+
+    def __init__(self, scenario, seed, directory=None):
+        if directory is None:
+            directory = os.path.join(os.path.expanduser('~'), '.atc-ng',
+                                     'replays')
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.__remove_old_replays(directory)
+        self.fname = os.path.join(directory, strftime('%Y-%m-%d@%Hh%Mm%S') +
+                                  '.replay.gz')
+        self.file = gzip.open(self.fname, 'wb')
+        header = dict(version=REPLAY_VERSION, scenario=scenario, seed=seed,
+                      ping_period=S.PING_PERIOD)
+        self.file.write(json.dumps(header, sort_keys=True) + '\n')
+        self.file.flush()
+
+    def __remove_old_replays(self, directory):
+        '''
+        Keep only the replays of the last ``LOG_NUMBER`` matches.
+        '''
+        fnames = sorted(glob.glob(os.path.join(directory, '*.replay.gz')),
+                        reverse=True)
+        for fname in fnames[max(S.LOG_NUMBER - 1, 0):]:
+            os.unlink(fname)
+
+    def __write(self, ping, kind, payload):
+        if self.file.closed:
+            return
+        self.file.write('%d\t%s\t%s\n' % (ping, kind, payload))
+        self.file.flush()
+
+    def command(self, ping, commandline):
+        '''
+        Record a command entered on the console before ``ping`` was computed.
+        '''
+        self.__write(ping, COMMAND, commandline)
+
+    def spawn(self, ping, icao):
+        '''
+        Record the entry of aeroplane ``icao`` in the aerospace.
+        '''
+        self.__write(ping, SPAWN, icao)
+
+    def close(self):
+        self.file.close()
+
+
+def load_replay(fname):
+    '''
+    Load a replay file and return a tuple ``(header, records)``, where
+    ``records`` is a list of ``(ping, kind, payload)`` tuples, in the order in
+    which they have been recorded. Truncated files (e.g.: from a match that
+    crashed) are read up to the last complete record.
+    '''
+    records = []
+    try:
+        file_ = gzip.open(fname, 'rb')
+        header = json.loads(file_.readline())
+    except (IOError, ValueError) as e:
+        msg = 'Cannot read replay header in %s: %s' % (fname, e)
+        raise BaseException(msg)
+    if header.get('version') != REPLAY_VERSION:
+        msg = 'Unsupported replay version: %s' % header.get('version')
+        raise BaseException(msg)
+    try:
+        for line in file_:
+            if not line.endswith('\n'):
+                break
+            ping, kind, payload = line[:-1].split('\t', 2)
+            records.append((int(ping), kind, payload))
+    except (IOError, EOFError) as e:
+        log.warning('Replay %s is truncated: %s', fname, e)
+    file_.close()
+    return header, records
@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+# -*- coding: utf-8  -*-
+'''
+Access to the data files (YAML descriptions, images, fonts) of the ATC-NG
+game.
+
+Resources are named by their path from the root of the source tree, always
+with forward slashes, e.g. ``sprites/data/sprite-jet.png``. The ``resources``
+object decodes each of them only once and keeps the result in memory.
+
+Data can also be read from a pack: a single file holding all the resources,
+that is memory-mapped and indexed, so that a deployed game doesn't open
+dozens of files at startup. In the pack, YAML files are stored already
+parsed. A pack is built with ``utils/build-pack.py`` and is only used when
+the ``ATC_NG_PACK`` environment variable points to it: the pack is not
+rebuilt when the data files change, so in the source tree they are read
+directly.
+'''
+
+import os
+import mmap
+import struct
+import cPickle
+import threading
+from cStringIO import StringIO
+
+import yaml
+try:
+    from yaml import CLoader as Loader
+except ImportError:
+    from yaml import Loader
+import pygame.font
+import pygame.image
+
+__author__ = "Mac Ryan"
+__copyright__ = "Copyright 2011, Mac Ryan"
+__license__ = "GPL v3"
+#__version__ = "<dev>"
+#__date__ = "<unknown>"
+__maintainer__ = "Mac Ryan"
+__email__ = "quasipedia@gmail.com"
+__status__ = "Development"
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACK_NAME = 'atc-ng.pack'
+PACK_MAGIC = 'ATCPACK1'
+PACK_HEADER = '<8sI'  #magic, length of the index
+# Directories whose files are packed. The template user directory is not, as
+# it is copied as it is in the home of the user.
+PACKED_DIRS = ['engine/data', 'entities/data', 'sprites/data']
+PACK_EXCLUDED = ['engine/data/template_user_dir']
+PACK_EXCLUDED_EXT = ['.svg']
+
+
+def build_pack(fname, root=ROOT):
+    '''
+    Write in ``fname`` a pack of all the resources found in ``root``.
+    The index maps resource names to (offset, size, kind) tuples, where
+    ``kind`` is ``yaml`` for parsed YAML files (pickled) or ``raw``.
+    Return the number of packed resources.
+    '''
+    index = {}
+    chunks = []
+    offset = 0
+    for directory in PACKED_DIRS:
+        base = os.path.join(root, *directory.split('/'))
+        for dname, dlist, flist in os.walk(base):
+            rel = os.path.relpath(dname, root).replace(os.sep, '/')
+            dlist[:] = [d for d in dlist
+                        if '%s/%s' % (rel, d) not in PACK_EXCLUDED]
+            for file_ in sorted(flist):
+                if os.path.splitext(file_)[1] in PACK_EXCLUDED_EXT:
+                    continue
+                with open(os.path.join(dname, file_), 'rb') as src:
+                    data = src.read()
+                kind = 'raw'
+                if file_.endswith('.yml'):
+                    kind = 'yaml'
+                    data = cPickle.dumps(yaml.load(data, Loader=Loader),
+                                         cPickle.HIGHEST_PROTOCOL)
+                index['%s/%s' % (rel, file_)] = (offset, len(data), kind)
+                chunks.append(data)
+                offset += len(data)
+    index = cPickle.dumps(index, cPickle.HIGHEST_PROTOCOL)
+    with open(fname, 'wb') as file_:
+        file_.write(struct.pack(PACK_HEADER, PACK_MAGIC, len(index)))
+        file_.write(index)
+        for data in chunks:
+            file_.write(data)
+    return len(chunks)
+
+
+class ResourceManager(object):
+
+    '''
+    Load resources from the source tree or from a pack, caching the decoded
+    objects. The pack is looked for the first time a resource is requested.
+
+    Data files can be read from a loading thread while the main one uses
+    images and fonts: the pack is opened under a lock, but images and fonts
+    must only be requested from the main thread (SDL is not thread-safe).
+    '''
+
+    def __init__(self, root=ROOT, pack=None):
+        self.root = root
+        self.pack_fname = pack or os.environ.get('ATC_NG_PACK')
+        self.__pack = None
+        self.__index = None
+        self.__lock = threading.Lock()  #for the opening of the pack
+        self.__yaml = {}
+        self.__images = {}
+        self.__fonts = {}
+
+    def __get_index(self):
+        '''
+        Return the index of the pack ({} if there is no pack), opening the
+        pack if needed.
+        '''
+        with self.__lock:
+            if self.__index is None:
+                self.__index = self.__open_pack()
+        return self.__index
+
+    def __open_pack(self):
+        '''
+        Memory-map the pack, if any, and return its index ({} if there is no
+        pack).
+        '''
+        if not self.pack_fname:
+            return {}
+        if not os.path.isfile(self.pack_fname):
+            msg = 'Resource pack %s not found!' % self.pack_fname
+            raise BaseException(msg)
+        with open(self.pack_fname, 'rb') as file_:
+            pack = mmap.mmap(file_.fileno(), 0, access=mmap.ACCESS_READ)
+        header_size = struct.calcsize(PACK_HEADER)
+        magic, length = struct.unpack(PACK_HEADER, pack[:header_size])
+        if magic != PACK_MAGIC:
+            msg = '%s is not a resource pack!' % self.pack_fname
+            raise BaseException(msg)
+        index = cPickle.loads(pack[header_size:header_size + length])
+        self.__data_start = header_size + length
+        self.__pack = pack
+        return index
+
+    def __get_packed(self, name):
+        '''
+        Return the bytes and the kind of ``name`` in the pack, or None.
+        '''
+        try:
+            offset, size, kind = self.__get_index()[name]
+        except KeyError:
+            return None
+        start = self.__data_start + offset
+        return self.__pack[start:start + size], kind
+
+    def get_path(self, name):
+        '''
+        Return the path of ``name`` in the source tree.
+        '''
+        return os.path.join(self.root, *name.split('/'))
+
+    def get_bytes(self, name):
+        '''
+        Return the content of the resource ``name``.
+        '''
+        packed = self.__get_packed(name)
+        if packed:
+            data, kind = packed
+            if kind == 'raw':
+                return data
+        with open(self.get_path(name), 'rb') as file_:
+            return file_.read()
+
+    def listdir(self, name):
+        '''
+        Return the sorted list of the resources in the directory ``name``.
+        '''
+        prefix = name.rstrip('/') + '/'
+        names = [n[len(prefix):] for n in self.__get_index()
+                 if n.startswith(prefix) and '/' not in n[len(prefix):]]
+        if not names:
+            names = os.listdir(self.get_path(name))
+        return sorted(names)
+
+    def get_yaml(self, name):
+        '''
+        Return the parsed YAML file ``name``. Each call returns a new copy of
+        the data, that the caller is free to modify.
+        '''
+        try:
+            pickled = self.__yaml[name]
+        except KeyError:
+            packed = self.__get_packed(name)
+            if packed and packed[1] == 'yaml':
+                pickled = packed[0]
+            else:
+                pickled = cPickle.dumps(
+                            yaml.load(self.get_bytes(name), Loader=Loader),
+                            cPickle.HIGHEST_PROTOCOL)
+            self.__yaml[name] = pickled
+        return cPickle.loads(pickled)
+
+    def get_image(self, name):
+        '''
+        Return the image ``name`` as a surface. The surface is shared, so it
+        must not be drawn upon.
+        '''
+        try:
+            return self.__images[name]
+        except KeyError:
+            image = pygame.image.load(StringIO(self.get_bytes(name)), name)
+            self.__images[name] = image
+            return image
+
+    def get_font(self, name, size):
+        '''
+        Return a font object for the font file ``name`` at ``size``.
+        '''
+        try:
+            return self.__fonts[(name, size)]
+        except KeyError:
+            # Fonts read their file lazily: each needs its own stream
+            fontobj = pygame.font.Font(StringIO(self.get_bytes(name)), size)
+            self.__fonts[(name, size)] = fontobj
+            return fontobj
+
+
+# Module-level resource manager, shared by the whole game.
+resources = ResourceManager()
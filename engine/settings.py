@@ -16,7 +16,6 @@ import yaml
 import os
 import sys
 import shutil
-from pkg_resources import resource_filename as fname #@UnresolvedImport
 
 __author__ = "Mac Ryan"
 __copyright__ = "Copyright 2011, Mac Ryan"
@@ -36,27 +35,45 @@ class Settings(object):
 
     It implements the borg pattern as suggested by Alex Martelli:
     http://code.activestate.com/recipes/66531
+
+    Settings are loaded by ``initialise()``, which is called automatically
+    the first time a setting is read, so that importing the module is cheap.
     '''
 
     __shared_state = {}
     __home = os.path.expanduser('~')
-    __template_base = fname(__name__, os.path.join('data',
-                                                   'template_user_dir'))
+    __data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              'data')
+    __template_base = os.path.join(__data_dir, 'template_user_dir')
     __target_base = os.path.join(__home, '.atc-ng')
     __current_module = sys.modules[__name__]
 
     def __init__(self):
+        self.__dict__ = self.__shared_state # borg pattern!
+
+    def __getattr__(self, name):
+        # Only called for missing attributes: load the settings if needed
+        if name.startswith('__') or self.__shared_state.get('initialised'):
+            raise AttributeError(name)
+        self.initialise()
+        return getattr(self, name)
+
+    def initialise(self):
         '''
-        Check that the class hasn't been instantiated before, then load all
-        the settings.
+        Initialise pygame and load all the settings, unless already done.
+        Values assigned before initialisation are kept.
         '''
-        self.__dict__ = self.__shared_state # borg pattern!
+        if self.__shared_state.get('initialised'):
+            return
+        overrides = self.__shared_state.copy()
+        self.initialised = True
+        pygame.init()
 
         # +---------------------+
         # | LOAD DEFAULT VALUES |
         # +---------------------+
 
-        __fname = fname(__name__, os.path.join('data', 'hardsettings.yml'))
+        __fname = os.path.join(self.__data_dir, 'hardsettings.yml')
         self.__load_configuration_file(__fname)
         __fname = os.path.join(self.__template_base, 'settings.yml')
         __overridable_settings = self.__load_configuration_file(__fname)
@@ -81,8 +98,7 @@ class Settings(object):
         # +-----------------------------+
 
         self.PING_IN_SECONDS = self.PING_PERIOD / 1000.0
-        self.MAIN_FONT = fname(
-              __name__, os.path.join('data', 'ex_modenine.ttf'))
+        self.MAIN_FONT = 'engine/data/ex_modenine.ttf'  #resource name
         self.WINDOW_SIZE = self.__get_ratioed_max_size(self.ASPECT_RATIO)
         radarside = self.WINDOW_SIZE[1] * (1 - self.CONSOLE_HEIGHT) * \
                     (1 - self.STATUSBAR_HEIGHT)
@@ -110,6 +126,7 @@ class Settings(object):
               # -3 for the lines separating BUI elements
               (self.WINDOW_SIZE[0] - self.RADAR_RECT.w - \
                self.STRIPS_RECT.w - 2), self.WINDOW_SIZE[1])
+        self.__dict__.update(overrides)
 
     def __get_ratioed_max_size(self, aspect_ratio):
         '''
@@ -199,5 +216,4 @@ class Settings(object):
 
 
 # THIS ONLY RUN ONCE, WHEN THE MODULE IS FIRST LOADED.
-pygame.init()
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf-8  -*-
+'''
+Snapshots of the simulation state of the ATC-NG game.
+
+A snapshot contains everything that is needed for the simulation to continue
+exactly as it would have done from the moment in which the snapshot has been
+taken: the aeroplanes (with their pilots and procedures), the runway
+occupancy, the TCAS data, the challenge counters, the score (with the count of
+the score events) and the state of the random number generator. It contains no pygame objects: sprites, strips
+and the radar image are rebuilt when the snapshot is restored.
+
+Snapshots are pickled and zlib-compressed strings. They can be used to
+checkpoint a long session or to fork many "what-if" simulations from the same
+starting point (restoring the same snapshot in several ``GameLogic``
+instances)::
+
+    data = take_snapshot(gamelogic)
+    ...
+    restore_snapshot(other_gamelogic, data)
+'''
+
+import zlib
+import random
+import cPickle
+
+import pilot.procedures
+import pilot.navigator
+from entities.aeroplane import Aeroplane
+
+__author__ = "Mac Ryan"
+__copyright__ = "Copyright 2011, Mac Ryan"
+__license__ = "GPL v3"
+#__version__ = "<dev>"
+#__date__ = "<unknown>"
+__maintainer__ = "Mac Ryan"
+__email__ = "quasipedia@gmail.com"
+__status__ = "Development"
+
+SNAPSHOT_VERSION = 3
+# Aeroplane attributes that change during the match but that are not passed
+# to the constructor.
+PLANE_ATTRIBUTES = ['entry_time', 'time_last_cmd', 'fuel_delta',
+                    'dist_to_target']
+# Attributes of procedures and landers that are references to live objects,
+# and are therefore rebuilt on restore rather than saved.
+PROCEDURE_REFERENCES = ['pilot', 'plane', 'lander']
+LANDER_REFERENCES = ['pilot', 'plane', 'port', 'rnwy', 'foot', 'ils']
+
+
+# +------------------+
+# | HELPER FUNCTIONS |
+# +------------------+
+
+def __get_procedure_state(procedure):
+    '''
+    Return the state of a procedure as a tuple (class name, attributes,
+    lander state), or None if no procedure is being performed.
+    '''
+    if procedure is None:
+        return None
+    attrs = dict((k, v) for k, v in procedure.__dict__.items()
+                 if k not in PROCEDURE_REFERENCES)
+    lander = getattr(procedure, 'lander', None)
+    if lander is not None:
+        lander = dict(port=lander.port.iata, rnwy=lander.rnwy['name'],
+                      attrs=dict((k, v) for k, v in lander.__dict__.items()
+                                 if k not in LANDER_REFERENCES))
+    return (procedure.__class__.__name__, attrs, lander)
+
+def __set_procedure_state(pi, state):
+    '''
+    Rebuild the procedure described by ``state`` for pilot ``pi``. The
+    procedure constructor is bypassed, as it would issue commands.
+    '''
+    if state is None:
+        pi.status['procedure'] = None
+        return
+    name, attrs, lander = state
+    cls = getattr(pilot.procedures, name)
+    procedure = cls.__new__(cls)
+    procedure.pilot = pi
+    procedure.plane = pi.plane
+    procedure.__dict__.update(attrs)
+    if lander is not None:
+        procedure.lander = pilot.navigator.Lander(pi, lander['port'],
+                                                  lander['rnwy'])
+        procedure.lander.__dict__.update(lander['attrs'])
+    pi.status['procedure'] = procedure
+
+def __get_plane_state(plane):
+    '''
+    Return the state of an aeroplane (and of its pilot) as plain data.
+    '''
+    pi = plane.pilot
+    tc = pi.target_conf
+    state = dict((name, getattr(plane, name)) for name in PLANE_ATTRIBUTES)
+    state.update(
+        properties=dict((name, getattr(plane, name)) for name in
+                        Aeroplane.KNOWN_PROPERTIES),
+        trail=plane.aerospace.trails.get_world(plane.icao),
+        flags=plane.flags.get_state(),
+        tcas=plane.tcas.state,
+        status=dict((k, v) for k, v in pi.status.items() if k != 'procedure'),
+        procedure=__get_procedure_state(pi.status['procedure']),
+        target_conf=dict(speed=tc.speed, altitude=tc.altitude,
+                         heading=tc.heading_setting),
+        order_being_processed=pi.order_being_processed)
+    return state
+
+def __build_plane(aerospace, state):
+    '''
+    Return a new aeroplane in the state described by ``state``.
+    '''
+    plane = Aeroplane(aerospace, **state['properties'])
+    for name in PLANE_ATTRIBUTES:
+        setattr(plane, name, state[name])
+    plane.flags.set_state(state['flags'])
+    plane.tcas.state = state['tcas']
+    pi = plane.pilot
+    pi.status.update(state['status'])
+    __set_procedure_state(pi, state['procedure'])
+    tc = pi.target_conf
+    tc.speed = state['target_conf']['speed']
+    tc.altitude = state['target_conf']['altitude']
+    if state['target_conf']['heading'] is not None:
+        tc.heading = state['target_conf']['heading']
+    pi.order_being_processed = state['order_being_processed']
+    plane.update_instruments()
+    return plane
+
+
+# +-----------+
+# | INTERFACE |
+# +-----------+
+
+def take_snapshot(gamelogic):
+    '''
+    Return a snapshot of the simulation run by ``gamelogic``, as a string.
+    '''
+    aerospace = gamelogic.aerospace
+    state = dict(
+        version=SNAPSHOT_VERSION,
+        scenario=gamelogic.challenge.scenario_name,
+        ping_count=gamelogic.ping_count,
+        random=random.getstate(),
+        score=gamelogic.score,
+        event_counts=dict(gamelogic.event_counts),
+        fatalities=gamelogic.fatalities,
+        challenge=gamelogic.challenge.get_state(),
+        planes=[__get_plane_state(p) for p in aerospace.aeroplanes],
+        runways=aerospace.runways_manager.get_state(),
+        tcas=dict((icao, [p.icao for p in planes]) for icao, planes in
+                  aerospace.tcas_data.items()))
+    return zlib.compress(cPickle.dumps(state, cPickle.HIGHEST_PROTOCOL), 1)
+
+def restore_snapshot(gamelogic, snapshot):
+    '''
+    Restore a snapshot taken with ``take_snapshot`` in ``gamelogic``, which
+    must be running the same scenario. The aeroplanes currently in the
+    aerospace are removed and no score event is generated.
+    '''
+    state = cPickle.loads(zlib.decompress(snapshot))
+    if state['version'] != SNAPSHOT_VERSION:
+        msg = 'Unsupported snapshot version: %s' % state['version']
+        raise BaseException(msg)
+    if state['scenario'] != gamelogic.challenge.scenario_name:
+        msg = 'Snapshot of scenario "%s" cannot be restored in "%s"' % \
+              (state['scenario'], gamelogic.challenge.scenario_name)
+        raise BaseException(msg)
+    aerospace = gamelogic.aerospace
+    for plane in aerospace.aeroplanes:
+        aerospace.remove_plane(plane)
+        gamelogic.strips.remove_strip(plane)
+    for plane_state in state['planes']:
+        plane = __build_plane(aerospace, plane_state)
+        gamelogic._register_plane(plane)
+        aerospace.trails.set_world(plane.icao, plane_state['trail'])
+    aerospace.runways_manager.set_state(state['runways'])
+    aerospace.tcas_data = dict(
+        (icao, [aerospace.get_plane_by_icao(i) for i in icaos])
+        for icao, icaos in state['tcas'].items())
+    gamelogic.challenge.set_state(state['challenge'])
+    gamelogic.ping_count = state['ping_count']
+    gamelogic.score = state['score']
+    gamelogic.event_counts = dict(state['event_counts'])
+    gamelogic.fatalities = state['fatalities']
+    random.setstate(state['random'])
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding: utf-8  -*-
+'''
+Radar trails of the aeroplanes.
+
+The positions of all the aeroplanes during the last radar pings are kept in a
+single ring buffer, in world coordinates, and converted to screen coordinates
+for all the aeroplanes at the same time.
+'''
+
+from collections import OrderedDict, deque
+
+import numpy
+
+from engine.settings import settings as S
+
+__author__ = "Mac Ryan"
+__copyright__ = "Copyright 2011, Mac Ryan"
+__license__ = "GPL v3"
+#__version__ = "<dev>"
+#__date__ = "<unknown>"
+__maintainer__ = "Mac Ryan"
+__email__ = "quasipedia@gmail.com"
+__status__ = "Development"
+
+
+def to_screen(points):
+    '''
+    Array version of ``U.sc``: return the screen coordinates of an array of
+    world points (last dimension of size 2), as an array of integers.
+    '''
+    scaled = numpy.asarray(points, dtype=float) / S.METRES_PER_PIXEL
+    # Round half away from zero, like the built-in ``round``. The difference
+    # between a float and its truncation is exact, so ties are detected
+    # reliably.
+    truncated = numpy.trunc(scaled)
+    rounded = numpy.where(numpy.abs(scaled - truncated) >= 0.5,
+                          truncated + numpy.sign(scaled), truncated)
+    rounded = rounded.astype(int)
+    rounded[..., 1] = S.RADAR_RECT.height - rounded[..., 1]
+    return rounded
+
+
+class TrailBuffer(object):
+
+    '''
+    Ring buffer of the last ``length`` positions of each aeroplane.
+
+    Each aeroplane owns a row of a (rows, length, 2) array of world
+    coordinates; the column of the latest ping is the same for all the rows,
+    so that a new ping is recorded for all the aeroplanes with a single
+    assignment. Screen coordinates are cached as deques of points (latest
+    ping first) that sprites can index quickly: at each ping only the latest
+    positions are converted, while whole trails are converted again only if
+    the scale of the radar changes.
+    '''
+
+    INITIAL_ROWS = 32
+
+    def __init__(self, length):
+        self.length = length
+        self.world = numpy.zeros((self.INITIAL_ROWS, length, 2))
+        self.head = 0  #column of the latest ping
+        self.rows = OrderedDict()  #icao --> row
+        self.__free = range(self.INITIAL_ROWS - 1, -1, -1)
+        self.__screen = {}  #icao --> deque of screen points
+        self.__scale = None
+
+    def __get_order(self):
+        '''
+        Return the indices of the columns, from the latest ping backwards.
+        '''
+        return (self.head - numpy.arange(self.length)) % self.length
+
+    def __get_scale(self):
+        return S.METRES_PER_PIXEL, S.RADAR_RECT.height
+
+    def __convert(self, icao):
+        '''
+        Convert the whole trail of an aeroplane to screen coordinates.
+        '''
+        world = self.world[self.rows[icao], self.__get_order()]
+        self.__screen[icao] = deque(to_screen(world).tolist(), self.length)
+
+    def add(self, icao, point):
+        '''
+        Add the trail of an aeroplane, initially with all the positions at
+        ``point`` (x, y).
+        '''
+        if not self.__free:
+            size = len(self.world)
+            self.world = numpy.concatenate((self.world,
+                                            numpy.zeros_like(self.world)))
+            self.__free = range(2 * size - 1, size - 1, -1)
+        row = self.__free.pop()
+        self.rows[icao] = row
+        self.world[row] = point
+        self.__screen[icao] = deque([to_screen(point).tolist()] * self.length,
+                                    self.length)
+
+    def remove(self, icao):
+        '''
+        Remove the trail of an aeroplane.
+        '''
+        self.__free.append(self.rows.pop(icao))
+        del self.__screen[icao]
+
+    def record(self, positions):
+        '''
+        Record a new ping. ``positions`` is a list of (icao, (x, y)) tuples;
+        aeroplanes not in it are considered still. Return True if the screen
+        coordinates of all the trails have been computed again (because the
+        scale of the radar changed).
+        '''
+        previous = self.head
+        self.head = (self.head + 1) % self.length
+        self.world[:, self.head] = self.world[:, previous]
+        if positions:
+            icaos, points = zip(*positions)
+            rows = [self.rows[icao] for icao in icaos]
+            self.world[rows, self.head] = points
+        if not self.rows:
+            return False
+        scale = self.__get_scale()
+        if scale != self.__scale:
+            self.__scale = scale
+            for icao in self.rows:
+                self.__convert(icao)
+            return True
+        latest = self.world[self.rows.values(), self.head]
+        screen = self.__screen
+        for icao, point in zip(self.rows, to_screen(latest).tolist()):
+            screen[icao].appendleft(point)
+        return False
+
+    def get(self, icao):
+        '''
+        Return the trail of an aeroplane in screen coordinates, as a sequence
+        of [x, y] points from the latest ping backwards.
+        '''
+        return self.__screen[icao]
+
+    def get_world(self, icao):
+        '''
+        Return the trail of an aeroplane in world coordinates, as a list of
+        (x, y) points from the latest ping backwards.
+        '''
+        points = self.world[self.rows[icao], self.__get_order()]
+        return [tuple(p) for p in points.tolist()]
+
+    def set_world(self, icao, points):
+        '''
+        Set the trail of an aeroplane from a list of (x, y) points in world
+        coordinates, from the latest ping backwards.
+        '''
+        self.world[self.rows[icao], self.__get_order()] = points
+        self.__convert(icao)
@@ -5,7 +5,6 @@ Aeroplanes modelling of the ATC simulation game.
 '''
 
 from math import sqrt, degrees, atan2
-from collections import deque
 from time import time
 
 import lib.utils as U
@@ -24,6 +23,10 @@ __maintainer__ = "Mac Ryan"
 __email__ = "quasipedia@gmail.com"
 __status__ = "Development"
 
+# Number of reads of the memoised derived state of the aeroplanes (heading,
+# speed, sprite index) served from the memo or computed.
+DERIVED_STATS = dict(hits=0, misses=0)
+
 
 class Flags(object):
 
@@ -32,11 +35,33 @@ class Flags(object):
     over the place. Flags are mostly used for sprite colour-control. Most of
     the static information on what the plane is doing are contained within
     ``pilot.pilot.Pilot()``.
+
+    ``on_change`` is called with the name of the flag whenever a flag is set.
     '''
 
-    def __init__(self):
+    def __init__(self, on_change=None):
+        object.__setattr__(self, '_Flags__on_change', on_change)
         self.reset()
 
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if self.__on_change:
+            self.__on_change(name)
+
+    def get_state(self):
+        '''
+        Return the value of the flags as a dictionary.
+        '''
+        return dict((k, v) for k, v in self.__dict__.items()
+                    if not k.startswith('_'))
+
+    def set_state(self, state):
+        '''
+        Set the flags from a dictionary returned by ``get_state``.
+        '''
+        for name, value in state.items():
+            setattr(self, name, value)
+
     def reset(self):
         '''
         Set all flags to their default value.
@@ -81,10 +106,17 @@ class Tcas(object):
         # Prevents unresolved cases but altering slighly the plane position if
         # two planes are stacked one on top of the other or fly at the same
         # level.
+        # Each colliding plane contributes (position - other) / distance**2,
+        # accumulated in place rather than through temporary vectors.
+        pos = plane.position
         while True:
-            vectors = [plane.position - p.position for p in colliding]
-            vectors = [v.normalized()/abs(v) for v in vectors]
-            vector = reduce(lambda x,y : x+y, vectors)
+            vector = Vector3()
+            for p in colliding:
+                other = p.position
+                dist = pos.distance(other)
+                vector.x += (pos.x - other.x) / dist / dist
+                vector.y += (pos.y - other.y) / dist / dist
+                vector.z += (pos.z - other.z) / dist / dist
             if vector.z == 0:
                 plane.position.z += 0.01
             elif vector.x == vector.y == 0:
@@ -157,6 +189,13 @@ class Aeroplane(object):
                        ]
 
     def __init__(self, aerospace, **kwargs):
+        # Derived state (heading, speed, sprite index) is memoised in a
+        # dictionary, which is None while the memo is suspended.
+        self.__derived = {}
+        # Aeroplanes that are not changing (waiting at an airport) are left
+        # out of the simulation while asleep: any change to their position,
+        # velocity or flags wakes them up.
+        self.asleep = False
         # Required parameters/properties
         self.aerospace = aerospace
         self.tcas = Tcas(self)
@@ -165,12 +204,10 @@ class Aeroplane(object):
         # Initialisation of other properties
         self.entry_time = time()
         self.min_speed = self.landing_speed*1.5
-        self.flags = Flags()
+        self.flags = Flags(self.__on_change)
         if self.origin in aerospace.airports:
             self.flags.on_ground = True
         self.time_last_cmd = time()
-        self.trail = deque(
-               [U.sc(self.position.xy)] * S.TRAIL_LENGTH, S.TRAIL_LENGTH)
         self.colliding_planes = []
         self.__accelerometer = ' '
         self.__variometer = ' '
@@ -178,10 +215,66 @@ class Aeroplane(object):
         self.fuel_delta = self.fuel / 2
         self.dist_to_target = self.fuel / self.fuel_efficiency / 4
 
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if name in ('position', 'velocity'):
+            self.__on_change()
+
+    def __on_change(self, flag=None):
+        '''
+        Called when the position, the velocity or a flag is set.
+        '''
+        self.asleep = False
+        self.invalidate()
+        if flag in ('on_ground', 'locked'):
+            self.aerospace.reindex_plane(self)
+
+    def invalidate(self):
+        '''
+        Discard the memoised derived state. Called automatically when the
+        position, the velocity or a flag is set.
+        '''
+        if self.__derived:
+            self.__derived = {}
+
+    def can_sleep(self):
+        '''
+        Return True if the aeroplane is waiting at an airport and its updates
+        would not change it, so that it can be put asleep.
+        '''
+        fl = self.flags
+        if not fl.on_ground or fl.busy or fl.locked or self.tcas.state:
+            return False
+        v = self.velocity
+        return v.x == v.y == v.z == 0 and not self.pilot.status['procedure'] \
+               and self.pilot.target_conf.is_reached()
+
+    def suspend_memo(self):
+        '''
+        Suspend the memoisation of derived state, while the position and the
+        velocity are being modified in place (by the pilot).
+        '''
+        self.__derived = None
+
+    def resume_memo(self):
+        '''
+        Resume the memoisation of derived state.
+        '''
+        self.__derived = {}
+
     @property
     def heading(self):
         '''Current heading [CW degrees from North]'''
-        return U.v3_to_heading(self.velocity)
+        derived = self.__derived
+        if derived is None:
+            return U.v3_to_heading(self.velocity)
+        try:
+            value = derived['heading']
+            DERIVED_STATS['hits'] += 1
+        except KeyError:
+            value = derived['heading'] = U.v3_to_heading(self.velocity)
+            DERIVED_STATS['misses'] += 1
+        return value
 
     @property
     def speed(self):
@@ -189,13 +282,30 @@ class Aeroplane(object):
         Current ground speed [m/s].
         (That means speed as projected on the XY plane)
         '''
-        return sqrt(self.velocity.x**2 + self.velocity.y**2)
+        derived = self.__derived
+        if derived is None:
+            return sqrt(self.velocity.x**2 + self.velocity.y**2)
+        try:
+            value = derived['speed']
+            DERIVED_STATS['hits'] += 1
+        except KeyError:
+            value = derived['speed'] = \
+                    sqrt(self.velocity.x**2 + self.velocity.y**2)
+            DERIVED_STATS['misses'] += 1
+        return value
 
     @property
     def altitude(self):
         '''Current altitude [m]'''
         return self.position.z
 
+    @property
+    def trail(self):
+        '''
+        Screen positions during the last radar pings, latest first.
+        '''
+        return self.aerospace.trails.get(self.icao)
+
     def get_current_configuration(self):
         '''
         Return a dictionary with current heading, speed and altitude.
@@ -249,6 +359,14 @@ class Aeroplane(object):
         Return a sprite index value (for selecting the correct sprite in the
         sprite sheets). Highest priority statuses override lower priority ones.
         '''
+        derived = self.__derived
+        if derived is not None:
+            try:
+                value = derived['sprite_index']
+                DERIVED_STATS['hits'] += 1
+                return value
+            except KeyError:
+                DERIVED_STATS['misses'] += 1
         value = S.CONTROLLED
         fl = self.flags
         if fl.busy:
@@ -259,6 +377,8 @@ class Aeroplane(object):
             value = S.COLLISION
         if fl.locked:  #take_offs and landings
             value = S.NON_CONTROLLED
+        if derived is not None:
+            derived['sprite_index'] = value
         return value
 
     def terminate(self, event):
@@ -302,7 +422,7 @@ class Aeroplane(object):
         self.fuel_delta = self.fuel - (2 * dist * self.fuel_efficiency)
         self.dist_to_target = dist
         if not self.flags.fuel_emergency and self.fuel_delta < 0:
-            log.info('%s is declaring fuel emergency' % self.icao)
+            log.info('%s is declaring fuel emergency', self.icao)
             msg = 'Pan-Pan, Pan-Pan, Pan-Pan... We are low on fuel, ' \
                   'requesting priority landing!'
             self.pilot.say(msg, S.KO_COLOUR)
@@ -313,11 +433,8 @@ class Aeroplane(object):
             msg = 'Mayday! Mayday! Mayday! All engines have flamed out, we ' \
                   'are going down!'
             self.pilot.say(msg, S.KO_COLOUR)
-            log.info('%s has ran out of fuel' % self.icao)
+            log.info('%s has ran out of fuel', self.icao)
             self.fuel = 0
             self.max_speed = self.min_speed * 2
             max_down = self.climb_rate_limits[0]
             self.climb_rate_limits = [max_down, max_down / 2.0]
-        # Update sprite
-        self.rect = U.sc(self.position.xy)
-        self.trail.appendleft(U.sc(self.position.xy))
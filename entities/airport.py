@@ -13,6 +13,7 @@ from pygame.locals import *
 
 import lib.utils as U
 from engine.settings import settings as S
+from engine.resources import resources as R
 from lib.euclid import Vector3
 
 __author__ = "Mac Ryan"
@@ -244,7 +245,7 @@ class airport(object):
             # Add the the labels
             pi = self.__plain_image
             font_size = U.rint(max(pi.get_width(), pi.get_height()) / 16.0)
-            fontobj = pygame.font.Font(S.MAIN_FONT, font_size)
+            fontobj = R.get_font(S.MAIN_FONT, font_size)
             for k, v in self.runways.items():
                 label = fontobj.render(k, True, S.WHITE)
                 loc = v['location'] + trasl + \
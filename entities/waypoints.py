@@ -11,6 +11,7 @@ from math import radians, sin, cos
 
 import lib.utils as U
 from engine.settings import settings as S
+from engine.resources import resources as R
 
 __author__ = "Mac Ryan"
 __copyright__ = "Copyright 2011, Mac Ryan"
@@ -84,7 +85,7 @@ class Gate(object):
         lines = ['H:' + str(self.heading).zfill(3),
                  'B:' + fl(self.bottom),
                  'T:' + fl(self.top)]
-        fontobj = pygame.font.Font(S.MAIN_FONT, S.HUD_INFO_FONT_SIZE * aaf)
+        fontobj = R.get_font(S.MAIN_FONT, S.HUD_INFO_FONT_SIZE * aaf)
         label = U.render_lines(fontobj, lines, S.GRAY)
         label = label.subsurface(label.get_bounding_rect())
         w, h = label.get_size()
@@ -101,7 +102,7 @@ class Gate(object):
         g_rect = g_img.get_rect()
         surface.blit(g_img, (x-g_rect.centerx, y-g_rect.centery))
         # LABEL
-        fontobj = pygame.font.Font(S.MAIN_FONT, S.HUD_INFO_FONT_SIZE)
+        fontobj = R.get_font(S.MAIN_FONT, S.HUD_INFO_FONT_SIZE)
         label = fontobj.render(self.name, True, S.RED)
         w, h = label.get_size()
         signed_offset = lambda n : cmp(1,n)*w
@@ -125,7 +126,7 @@ class Beacon(object):
         pos = U.sc(self.location)
         pygame.draw.circle(surface, S.GRAY, pos, 2)
         pygame.draw.circle(surface, S.GRAY, pos, 6, 1)
-        fontobj = pygame.font.Font(S.MAIN_FONT, S.HUD_INFO_FONT_SIZE)
+        fontobj = R.get_font(S.MAIN_FONT, S.HUD_INFO_FONT_SIZE)
         label = fontobj.render(self.id, True, S.BLUE)
         label = label.subsurface(label.get_bounding_rect()).copy()
         w, h = label.get_size()
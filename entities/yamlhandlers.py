@@ -12,17 +12,10 @@ module.
 
 import random
 import re
-import os.path as path
-
-from pkg_resources import resource_stream, resource_listdir  #@UnresolvedImport
-from yaml import load
-try:
-    from yaml import CLoader as Loader
-except ImportError:
-    from yaml import Loader
 
 import entities.airport
 import entities.waypoints
+from engine.resources import resources as R
 
 __author__ = "Mac Ryan"
 __copyright__ = "Copyright 2011, Mac Ryan"
@@ -40,16 +33,14 @@ class YamlHandler(object):
     Ancestor class for handlers that provide some helper method.
     '''
 
-    DIRECTORY = 'data'
+    DIRECTORY = 'entities/data'
     EXT = '.yml'
 
     def load(self, fname):
         '''
         Load a yaml file and store it in the self._data property.
         '''
-        data = resource_stream(__name__,
-                               path.join(self.DIRECTORY, fname + self.EXT))
-        self._data = load(data, Loader=Loader)
+        self._data = R.get_yaml('%s/%s%s' % (self.DIRECTORY, fname, self.EXT))
 
 
 class AirlinesHandler(YamlHandler):
@@ -144,7 +135,7 @@ class airportHandler(YamlHandler):
     '''
 
     def __init__(self, iata):
-        self.DIRECTORY = path.join(self.DIRECTORY, 'airports')
+        self.DIRECTORY = self.DIRECTORY + '/airports'
         self.load(iata)
         strips = [entities.airport.AsphaltStrip(**rw)
                   for rw in self._data['strips']]
@@ -159,7 +150,7 @@ class ScenarioHandler(YamlHandler):
     '''
 
     def __init__(self, fname):
-        self.DIRECTORY = path.join(self.DIRECTORY, 'scenarios')
+        self.DIRECTORY = self.DIRECTORY + '/scenarios'
         self.load(fname)
         # airports
         self.airports = []
@@ -188,9 +179,9 @@ class PlaneModelHandler(YamlHandler):
     '''
 
     def __init__(self):
-        self.DIRECTORY = path.join(self.DIRECTORY, 'aeroplanes')
+        self.DIRECTORY = self.DIRECTORY + '/aeroplanes'
         data = {}
-        fnames = resource_listdir('entities', self.DIRECTORY)
+        fnames = R.listdir(self.DIRECTORY)
         fnames = [n[:-4] for n in fnames if n[-4:] == '.yml']
         for fname in fnames:
             self.load(fname)
@@ -581,6 +581,47 @@ class Vector3:
         n = other.normalized()
         return self.dot(n)*n
 
+    # Operations that work in place or return scalars, so that the hot paths
+    # of the ATC-NG simulation don't create temporary vectors. Arithmetic is
+    # carried out in the same order as with the equivalent expressions on
+    # vectors, so results are identical to the last bit.
+
+    def iadd_scaled(self, other, factor):
+        """Add other * factor to the vector, in place"""
+        self.x += other.x * factor
+        self.y += other.y * factor
+        self.z += other.z * factor
+        return self
+
+    def rotate_z(self, theta):
+        """Rotate the vector around the Z axis through angle theta, in place.
+        Right hand rule applies. Same as rotate_around(Vector3(0, 0, 1),
+        theta), including the rounding of the z component"""
+        ct = math.cos(theta)
+        st = math.sin(theta)
+        self.x, self.y = self.x * ct - self.y * st, self.y * ct + self.x * st
+        self.z = self.z * (1 - ct) + self.z * ct
+        return self
+
+    def magnitude_xy(self):
+        """Return the magnitude of the projection on the XY plane"""
+        return math.sqrt(self.x ** 2 + self.y ** 2)
+
+    def normalize_xy(self, magnitude=1):
+        """Scale the projection on the XY plane to the given magnitude, in
+        place. The z component is left untouched"""
+        d = math.sqrt(self.x ** 2 + self.y ** 2)
+        if d:
+            self.x = self.x / d * magnitude
+            self.y = self.y / d * magnitude
+        return self
+
+    def distance(self, other):
+        """Return the distance from the point other"""
+        return math.sqrt((self.x - other.x) ** 2 + \
+                         (self.y - other.y) ** 2 + \
+                         (self.z - other.z) ** 2)
+
 # a b c
 # e f g
 # i j k
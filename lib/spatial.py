@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8  -*-
+'''
+Spatial indexes for the ATC-NG game.
+'''
+
+__author__ = "Mac Ryan"
+__copyright__ = "Copyright 2011, Mac Ryan"
+__license__ = "GPL v3"
+#__version__ = "<dev>"
+#__date__ = "<unknown>"
+__maintainer__ = "Mac Ryan"
+__email__ = "quasipedia@gmail.com"
+__status__ = "Development"
+
+
+class RectIndex(object):
+
+    '''
+    Index of screen rectangles (pygame ``Rect``) on a uniform grid, to find
+    quickly which of them lie in a given area of the screen.
+
+    Each rectangle is stored in all the cells of ``cell_size`` pixels it
+    overlaps, so that queries only look at the rectangles in the cells
+    overlapped by the query area instead of at all of them.
+    '''
+
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self.clear()
+
+    def __len__(self):
+        return len(self.__rects)
+
+    def __cells(self, rect):
+        '''
+        Return the list of the coordinates of the cells overlapped by rect.
+        '''
+        cs = self.cell_size
+        x_range = xrange(rect.left // cs, max(rect.left, rect.right-1) // cs + 1)
+        y_range = xrange(rect.top // cs, max(rect.top, rect.bottom-1) // cs + 1)
+        return [(x, y) for x in x_range for y in y_range]
+
+    def clear(self):
+        '''
+        Remove all rectangles from the index.
+        '''
+        self.__grid = {}
+        self.__rects = {}
+
+    def insert(self, key, rect):
+        '''
+        Add ``rect`` to the index, identified by ``key`` (which must be
+        hashable). If ``key`` is already in the index, its rectangle is
+        replaced.
+        '''
+        if key in self.__rects:
+            self.remove(key)
+        cells = self.__cells(rect)
+        for cell in cells:
+            try:
+                self.__grid[cell][key] = rect
+            except KeyError:
+                self.__grid[cell] = {key : rect}
+        self.__rects[key] = (rect, cells)
+
+    def remove(self, key):
+        '''
+        Remove the rectangle identified by ``key`` from the index.
+        '''
+        rect, cells = self.__rects.pop(key)
+        for cell in cells:
+            del self.__grid[cell][key]
+
+    def query(self, area):
+        '''
+        Return a list of the rectangles that may collide with ``area``: all
+        those sharing at least one cell with it.
+        '''
+        grid = self.__grid
+        found = {}
+        for cell in self.__cells(area):
+            if cell in grid:
+                found.update(grid[cell])
+        return found.values()
+
+    def collides(self, rect):
+        '''
+        Return True if ``rect`` overlaps any rectangle in the index.
+        '''
+        return rect.collidelist(self.query(rect)) != -1
+
+
+class PointIndex(object):
+
+    '''
+    Index of points (x, y) on a uniform grid, to find quickly which of them
+    lie within a given distance from a position.
+
+    Each point is stored in the cell of ``cell_size`` units containing it, so
+    that queries only look at the points in the cells overlapped by the
+    square enclosing the query circle.
+    '''
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.clear()
+
+    def __len__(self):
+        return len(self.__points)
+
+    def __cell(self, x, y):
+        cs = self.cell_size
+        return int(x // cs), int(y // cs)
+
+    def clear(self):
+        '''
+        Remove all points from the index.
+        '''
+        self.__grid = {}
+        self.__points = {}
+
+    def insert(self, key, point):
+        '''
+        Add ``point`` to the index, identified by ``key`` (which must be
+        hashable). If ``key`` is already in the index, its point is replaced.
+        '''
+        if key in self.__points:
+            self.remove(key)
+        x, y = point[0], point[1]
+        cell = self.__cell(x, y)
+        try:
+            self.__grid[cell][key] = (x, y)
+        except KeyError:
+            self.__grid[cell] = {key : (x, y)}
+        self.__points[key] = (x, y), cell
+
+    def remove(self, key):
+        '''
+        Remove the point identified by ``key`` from the index.
+        '''
+        point, cell = self.__points.pop(key)
+        del self.__grid[cell][key]
+
+    def query(self, point, radius):
+        '''
+        Return a list of the keys of the points closer than ``radius`` to
+        ``point``.
+        '''
+        x, y = point[0], point[1]
+        left, top = self.__cell(x - radius, y - radius)
+        right, bottom = self.__cell(x + radius, y + radius)
+        grid = self.__grid
+        sq_radius = radius**2
+        found = []
+        for cx in xrange(left, right + 1):
+            for cy in xrange(top, bottom + 1):
+                for key, (px, py) in grid.get((cx, cy), {}).iteritems():
+                    if (px - x)**2 + (py - y)**2 < sq_radius:
+                        found.append(key)
+        return found
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: utf-8  -*-
+'''
+Prefix tree for the ATC-NG game.
+'''
+
+__author__ = "Mac Ryan"
+__copyright__ = "Copyright 2011, Mac Ryan"
+__license__ = "GPL v3"
+#__version__ = "<dev>"
+#__date__ = "<unknown>"
+__maintainer__ = "Mac Ryan"
+__email__ = "quasipedia@gmail.com"
+__status__ = "Development"
+
+
+class _Node(object):
+
+    '''
+    A node of the trie. ``key`` is set only if a key ends at the node, while
+    ``values`` counts, for each value, the keys in the subtree of the node.
+    '''
+
+    __slots__ = ('children', 'key', 'value', 'size', 'values')
+
+    def __init__(self):
+        self.children = {}
+        self.key = None
+        self.value = None
+        self.size = 0
+        self.values = {}
+
+
+class PrefixTrie(object):
+
+    '''
+    Map of strings to values that can be queried by prefix.
+
+    Every node knows how many keys (and which values) are stored below it, so
+    that the cost of a query depends only on the length of the prefix and
+    of the answer, and not on the number of keys in the trie.
+    '''
+
+    def __init__(self, items=()):
+        self.clear()
+        for key, value in items:
+            self.insert(key, value)
+
+    def __len__(self):
+        return self.__root.size
+
+    def __contains__(self, key):
+        node = self.__find(key)
+        return node is not None and node.key is not None
+
+    def __find(self, prefix):
+        '''
+        Return the node at the end of ``prefix``, or None.
+        '''
+        node = self.__root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+    def __add_value(self, node, value, amount):
+        node.size += amount
+        count = node.values.get(value, 0) + amount
+        if count:
+            node.values[value] = count
+        else:
+            del node.values[value]
+
+    def clear(self):
+        '''
+        Remove all keys from the trie.
+        '''
+        self.__root = _Node()
+
+    def insert(self, key, value=None):
+        '''
+        Add ``key`` to the trie. If ``key`` is already there, its value is
+        replaced.
+        '''
+        if key in self:
+            self.remove(key)
+        node = self.__root
+        self.__add_value(node, value, 1)
+        for char in key:
+            try:
+                node = node.children[char]
+            except KeyError:
+                child = _Node()
+                node.children[char] = child
+                node = child
+            self.__add_value(node, value, 1)
+        node.key = key
+        node.value = value
+
+    def remove(self, key):
+        '''
+        Remove ``key`` from the trie. Raise KeyError if it isn't there.
+        '''
+        path = [self.__root]
+        for char in key:
+            try:
+                path.append(path[-1].children[char])
+            except KeyError:
+                raise KeyError(key)
+        if path[-1].key is None:
+            raise KeyError(key)
+        value = path[-1].value
+        path[-1].key = path[-1].value = None
+        for node in path:
+            self.__add_value(node, value, -1)
+        # Prune the branch that no longer leads to any key
+        for char, parent, node in reversed(zip(key, path, path[1:])):
+            if node.size:
+                break
+            del parent.children[char]
+
+    def get(self, key, default=None):
+        '''
+        Return the value of ``key``, or ``default`` if it isn't in the trie.
+        '''
+        node = self.__find(key)
+        if node is None or node.key is None:
+            return default
+        return node.value
+
+    def count(self, prefix=''):
+        '''
+        Return the number of keys beginning with ``prefix``.
+        '''
+        node = self.__find(prefix)
+        return node.size if node else 0
+
+    def values(self, prefix=''):
+        '''
+        Return the list of the distinct values of the keys beginning with
+        ``prefix``.
+        '''
+        node = self.__find(prefix)
+        return node.values.keys() if node else []
+
+    def keys(self, prefix=''):
+        '''
+        Return the list of the keys beginning with ``prefix``.
+        '''
+        node = self.__find(prefix)
+        keys = []
+        stack = [node] if node else []
+        while stack:
+            node = stack.pop()
+            if node.key is not None:
+                keys.append(node.key)
+            stack.extend(node.children.values())
+        return keys
+
+    def complete(self, prefix):
+        '''
+        Return the longest string common to the beginning of all the keys
+        beginning with ``prefix``, or None if there are no such keys.
+        '''
+        node = self.__find(prefix)
+        if not node or not node.size:
+            return None
+        chars = [prefix]
+        while node.key is None and len(node.children) == 1:
+            char, node = node.children.items()[0]
+            chars.append(char)
+        return ''.join(chars)
@@ -4,13 +4,15 @@
 A small library with useful functions for ATC-NG.
 '''
 
-from math import cos, sin, radians, degrees, atan2
+from math import cos, sin, radians, atan2, sqrt, pi
 
+import numpy
 import pygame.surface
 from pygame.locals import *
 
 from engine.settings import settings as S
-from lib.euclid import Vector2, Vector3
+from engine.resources import resources as R
+from lib.euclid import Vector3
 
 __author__ = "Mac Ryan"
 __copyright__ = "Copyright 2011, Mac Ryan"
@@ -21,6 +23,10 @@ __maintainer__ = "Mac Ryan"
 __email__ = "quasipedia@gmail.com"
 __status__ = "Development"
 
+# ``math.degrees(x)`` is computed as ``x * DEG_PER_RAD``: multiplying by this
+# constant directly gives identical results without the function call.
+DEG_PER_RAD = 180.0 / pi
+
 def rint(float_):
     '''
     Return the rounded integer of the float_.
@@ -73,7 +79,7 @@ def get_fontobj_by_text_width(font, text, max_size):
     size = 1
     max_w, max_h = max_size
     while True:
-        fontobj = pygame.font.Font(font, size)
+        fontobj = R.get_font(font, size)
         if isinstance(text, list):
             img = render_lines(fontobj, text, S.WHITE)
         else:
@@ -119,11 +125,12 @@ def in_between(boundaries, value):
     Value: the value to be tested
     '''
     PRECISION = 7
-    tmp = list(boundaries)
-    tmp.append(value)
-    tmp = [round(el, PRECISION) for el in tmp]
-    tmp.sort()
-    return tmp[1] == round(value, PRECISION)
+    a = round(boundaries[0], PRECISION)
+    b = round(boundaries[1], PRECISION)
+    value = round(value, PRECISION)
+    if a > b:
+        a, b = b, a
+    return a <= value <= b
 
 def heading_in_between(boundaries, value):
     '''
@@ -138,19 +145,30 @@ def heading_in_between(boundaries, value):
     # early return: if the tested value is == to a limit, is always in-between
     if value in boundaries:
         return True
-    sort_a = lambda a,b : [a,b] if (a-b)%360 > (b-a)%360 else [b,a]
-    tmp = sort_a(*boundaries)
-    a, b = [heading_to_v3(el) for el in tmp]
-    v = heading_to_v3(value)
-    if cmp(a.cross(v).z, 0) == cmp(a.cross(b).z, 0) == cmp(v.cross(b).z, 0):
-        return True
-    return False
+    a, b = boundaries
+    if (a-b)%360 <= (b-a)%360:
+        a, b = b, a
+    ax, ay = __heading_to_xy(a)
+    bx, by = __heading_to_xy(b)
+    vx, vy = __heading_to_xy(value)
+    # Signs of the z components of the cross products a×v, a×b and v×b
+    return cmp(ax*vy - ay*vx, 0) == cmp(ax*by - ay*bx, 0) == \
+           cmp(vx*by - vy*bx, 0)
+
+def __heading_to_xy(heading):
+    '''
+    Return the (x, y) components of ``heading_to_v3(heading)``.
+    '''
+    heading = radians(90-heading)
+    x, y = cos(heading), sin(heading)
+    norm = sqrt(x ** 2 + y ** 2)
+    return x / norm, y / norm
 
 def v3_to_heading(vector):
     '''
     Return the heading of a vector (CW degrees from North).
     '''
-    return (90-degrees(atan2(vector.y, vector.x)))%360
+    return (90 - atan2(vector.y, vector.x) * DEG_PER_RAD) % 360
 
 def is_behind(velocity, position, target):
     '''
@@ -158,11 +176,15 @@ def is_behind(velocity, position, target):
     ``velocity``. The function operates on a 2D projection. Behind is defined
     as over 90° from the velocity vector. from the
     '''
-    tuple_ = (velocity, position, target)
-    velocity, position, target = [Vector3(*el.xy) for el in tuple_]
-    if position == target:
+    dx = target.x - position.x
+    dy = target.y - position.y
+    if dx == dy == 0:
         return False
-    return velocity.angle(target-position) >= 1.5708  #90° in radians
+    cosine = (velocity.x * dx + velocity.y * dy) / \
+             (velocity.magnitude_xy() * sqrt(dx ** 2 + dy ** 2))
+    # ``Vector3.angle`` rounds the cosine to an integer before taking its
+    # arccosine, so the angle is over 90° only when the cosine rounds to -1
+    return cosine <= -0.5
 
 def heading_to_v3(heading):
     '''
@@ -266,9 +288,7 @@ def ground_distance(v1, v2):
     Return the ground distance between two points indicated by 2D or 3D
     vectors.
     '''
-    v1 = Vector2(*v1.xy)
-    v2 = Vector2(*v2.xy)
-    return abs(v1-v2)
+    return sqrt((v1.x - v2.x) ** 2 + (v1.y - v2.y) ** 2)
 
 def distance_point_line(point, origin, vector):
     '''
@@ -294,3 +314,70 @@ def only_one(list_):
     return len(filter(bool, list_)) == 1
 
 
+
+# Batch versions of the geometry functions above, operating on NumPy arrays
+# (or sequences) of values, so that many planes or gates can be tested at
+# once. Arrays of boundaries have shape (n, 2), arrays of vectors (n, 2) or
+# (n, 3); arguments are broadcast against each other.
+
+def batch_in_between(boundaries, values):
+    '''
+    Array version of `in_between`.
+    '''
+    PRECISION = 7
+    boundaries = numpy.round(numpy.asarray(boundaries, dtype=float),
+                             PRECISION)
+    values = numpy.round(numpy.asarray(values, dtype=float), PRECISION)
+    a = boundaries[..., 0]
+    b = boundaries[..., 1]
+    return (numpy.minimum(a, b) <= values) & (values <= numpy.maximum(a, b))
+
+def batch_heading_in_between(boundaries, values):
+    '''
+    Array version of `heading_in_between`.
+    '''
+    boundaries = numpy.asarray(boundaries, dtype=float)
+    values = numpy.asarray(values, dtype=float)
+    b0 = boundaries[..., 0]
+    b1 = boundaries[..., 1]
+    keep = (b0-b1)%360 > (b1-b0)%360
+    ax, ay = __batch_heading_to_xy(numpy.where(keep, b0, b1))
+    bx, by = __batch_heading_to_xy(numpy.where(keep, b1, b0))
+    vx, vy = __batch_heading_to_xy(values)
+    av = numpy.sign(ax*vy - ay*vx)
+    ab = numpy.sign(ax*by - ay*bx)
+    vb = numpy.sign(vx*by - vy*bx)
+    return ((b0-b1)%360 == 180) | (values == b0) | (values == b1) | \
+           ((av == ab) & (ab == vb))
+
+def __batch_heading_to_xy(headings):
+    '''
+    Array version of `__heading_to_xy`.
+    '''
+    headings = numpy.radians(90-headings)
+    x, y = numpy.cos(headings), numpy.sin(headings)
+    norm = numpy.sqrt(x ** 2 + y ** 2)
+    return x / norm, y / norm
+
+def batch_v3_to_heading(vectors):
+    '''
+    Array version of `v3_to_heading`.
+    '''
+    vectors = numpy.asarray(vectors, dtype=float)
+    angles = numpy.arctan2(vectors[..., 1], vectors[..., 0])
+    return (90 - angles * DEG_PER_RAD) % 360
+
+def batch_is_behind(velocities, positions, targets):
+    '''
+    Array version of `is_behind`.
+    '''
+    velocities = numpy.asarray(velocities, dtype=float)
+    deltas = numpy.asarray(targets, dtype=float)[..., :2] - \
+             numpy.asarray(positions, dtype=float)[..., :2]
+    vx, vy = velocities[..., 0], velocities[..., 1]
+    dx, dy = deltas[..., 0], deltas[..., 1]
+    # Coincident points give a NaN cosine, that is never <= -0.5
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        cosine = (vx * dx + vy * dy) / \
+                 (numpy.sqrt(vx ** 2 + vy ** 2) * numpy.sqrt(dx ** 2 + dy ** 2))
+    return cosine <= -0.5
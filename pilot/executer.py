@@ -65,8 +65,7 @@ class Executer(object):
         pl = self.plane
         tc = self.pilot.target_conf
         for cname, (args, flags) in commands.items():
-            log.info('%s executes: %s' %
-                     (pl.icao, ' '.join((cname, repr(args), repr(flags)))))
+            log.info('%s executes: %s %r %r', pl.icao, cname, args, flags)
             # PROCESS COMMANDS
             # Since flags are "universal" across commands (they all do the same
             # thing if they are called the same), it is possible to process
@@ -90,7 +89,7 @@ class Executer(object):
                     pi.say('Currently heading %s, our destination is %s' %
                           (U.rint(pl.heading), pl.destination), S.OK_COLOUR)
             else:
-                log.debug('process_commands() ignored: %s' % cname)
+                log.debug('process_commands() ignored: %s', cname)
             # PROCESS FLAGS
             # Flags with the same name have the same meaning and therefore
             # can be processed independently from the command they are
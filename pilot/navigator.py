@@ -4,12 +4,12 @@
 Provide support for pilot's navigation (calculate distances, radii, etc...).
 '''
 
-from math import sin, tan, radians
+from math import sin, tan, radians, acos, sqrt
 
 import lib.utils as U
 from engine.settings import settings as S
 from engine.logger import log
-from lib.euclid import Vector3, Vector2
+from lib.euclid import Vector3
 
 __author__ = "Mac Ryan"
 __copyright__ = "Copyright ©2011, Mac Ryan"
@@ -115,14 +115,14 @@ class Lander(object):
             self.taxiing_data = dict(
                  speed = min(self.plane.landing_speed, full_length_speed),
                  timer = S.RUNWAY_BUSY_TIME)
-            log.debug('%s *positive* landing decision on %s %s' %
-                      (self.plane.icao, self.port.iata, self.rnwy['name']))
+            log.debug('%s *positive* landing decision on %s %s',
+                      self.plane.icao, self.port.iata, self.rnwy['name'])
             self.plane.flags.locked = True
             return True
-        log.debug('%s *negative* landing decision on %s %s' %
-                  (self.plane.icao, self.port.iata, self.rnwy['name']))
+        log.debug('%s *negative* landing decision on %s %s',
+                  self.plane.icao, self.port.iata, self.rnwy['name'])
         msg = 'Somebody is using our landing runway!!!'
-        self.plane.pilot._abort_landing(msg)
+        self.pilot.status['procedure']._abort_landing(msg)
         return False
 
     @property
@@ -130,28 +130,28 @@ class Lander(object):
         '''
         Distance from the intersection point with the ILS vector.
         '''
-        return abs(self.ip-self.plane.position)
+        return self.plane.position.distance(self.ip)
 
     @property
     def md(self):
         '''
         Distance from the veering point for merging into the ILS.
         '''
-        return abs(self.mp-self.plane.position)
+        return self.plane.position.distance(self.mp)
 
     @property
     def fd(self):
         '''
         Distance from the foot of the runway.
         '''
-        return abs(self.foot-self.plane.position)
+        return self.plane.position.distance(self.foot)
 
     @property
     def bd(self):
         '''
         Distance from the braking point.
         '''
-        return abs(self.bp-self.plane.position)
+        return self.plane.position.distance(self.bp)
 
     @property
     def above_foot(self):
@@ -220,10 +220,15 @@ class Navigator(object):
         # vector and the vector to ``point``. This means that for any shorter
         # radius it will be possible to reach the point. So the formula
         # translates in: r < distance / (2*sin(alpha))
-        distance = float(abs(point - self.plane.position))
-        velocity = Vector2(*self.plane.velocity.xy)
-        to_target = Vector2(*(point - self.plane.position).xy)
-        alpha = velocity.angle(to_target)
+        pos = self.plane.position
+        vel = self.plane.velocity
+        distance = float(pos.distance(point))
+        # Same as ``Vector2.angle`` between the ground projections of the
+        # velocity and of the vector to the target
+        dx = point.x - pos.x
+        dy = point.y - pos.y
+        alpha = acos(round((vel.x * dx + vel.y * dy) /
+                           (vel.magnitude_xy() * sqrt(dx ** 2 + dy ** 2)), 7))
         # Eary retrun in case of the plane is already aligned
         if alpha == 0:
             return True
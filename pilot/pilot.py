@@ -8,7 +8,7 @@ from random import choice
 from math import radians, cos, sin
 
 import lib.utils as U
-from lib.euclid import Vector3, Vector2
+from lib.euclid import Vector3
 import checker
 import executer
 import navigator
@@ -67,6 +67,14 @@ class TargetConfiguration(object):
         else:  #absolute heading or map point
             self.__heading = value
 
+    @property
+    def heading_setting(self):
+        '''
+        The target heading as it has been set: either a numeric heading or a
+        point on the map. Unlike ``heading`` it is not converted to a course.
+        '''
+        return self.__heading
+
     def is_reached(self):
         '''
         Return True if ``self`` matches the configuration of a given plane.
@@ -175,9 +183,8 @@ class Pilot(object):
         type_ = self.status['haste']
         abs_ang_speed = self.navigator.get_veering_angular_velocity(type_)
         angular_speed = abs_ang_speed * -self.status['veer_dir']
-        axis = Vector3(0,0,1)
         amount = angular_speed * S.PING_IN_SECONDS
-        self.plane.velocity = self.plane.velocity.rotate_around(axis, amount)
+        self.plane.velocity.rotate_z(amount)
 
     def _dampen(self, previous_conf):
         '''
@@ -190,7 +197,7 @@ class Pilot(object):
         # Heading dampener (act on velocity vector)
         t_head = self.target_conf.heading
         if U.heading_in_between((p_head, pl.heading), t_head):
-            mag = abs(Vector2(*pl.velocity.xy))
+            mag = pl.velocity.magnitude_xy()
             theta = radians(90-t_head)
             pl.velocity.x = cos(theta)*mag
             pl.velocity.y = sin(theta)*mag
@@ -198,12 +205,9 @@ class Pilot(object):
         # Speed dampener (act on velocity vector)
         t_speed = self.target_conf.speed
         if U.in_between((p_speed, pl.speed), t_speed) and pl.fuel:
-            mag = t_speed
             # this is ground speed, so we want to normalise that without
             # affecting the z component...
-            saved_z = pl.velocity.z
-            pl.velocity = Vector3(*pl.velocity.xy).normalized() * t_speed
-            pl.velocity.z = saved_z
+            pl.velocity.normalize_xy(t_speed)
             self.target_conf.speed = pl.speed  #Fixes decimal approx.
         # Update onboard instruments, as the following dampener will modify
         # the data they would access
@@ -258,8 +262,6 @@ class Pilot(object):
             # Non expedite accelerations are limited at 50% of maximum accels
             if self.status['haste'] == 'normal':
                 gr_acc *= 0.5
-            norm_velocity = Vector3(*pl.velocity.xy).normalized()
-            acc_vector = norm_velocity * gr_acc
             # Acceleration cannot produce a speed over or under the limits
             if isinstance(
                           self.status['procedure'],
@@ -271,13 +273,20 @@ class Pilot(object):
             # Testing for the sign of gr_acc allows to have a taking off plane
             # at takeoff speed that is below its minimum flight speed, but
             # prevent a slowing plane to go pass it's minimum speed.
+            # The velocity is modified in place, as it is normalised on the
+            # ground plane (climb rate reset when hitting the limits).
             if (maybe <= min_ and gr_acc < 0):
-                pl.velocity = norm_velocity * min_
+                pl.velocity.normalize_xy(min_)
+                pl.velocity.z = 0.0
             elif (maybe >= max_ and gr_acc > 0):
-                pl.velocity = norm_velocity * max_
+                pl.velocity.normalize_xy(max_)
+                pl.velocity.z = 0.0
             else:
-                pl.velocity += acc_vector
-        pl.position += pl.velocity * S.PING_IN_SECONDS
+                speed = pl.velocity.magnitude_xy()
+                if speed:
+                    pl.velocity.x += pl.velocity.x / speed * gr_acc
+                    pl.velocity.y += pl.velocity.y / speed * gr_acc
+        pl.position.iadd_scaled(pl.velocity, S.PING_IN_SECONDS)
         self._dampen(initial_conf)
 
     def set_target_conf_to_current(self):
@@ -300,8 +309,8 @@ class Pilot(object):
         # ...perform validity checks...
         check = self.checker.check(commands)
         if check != True:
-            log.debug('%s failed to execute %s. Message: %s'
-                      % (self.plane.icao, commands, check))
+            log.debug('%s failed to execute %s. Message: %s',
+                      self.plane.icao, commands, check)
             self.say(check, S.KO_COLOUR)
             return False
         # ..and eventually execute the commands!
@@ -326,6 +335,9 @@ class Pilot(object):
         '''
         Modify aeroplane configuration according to pilot's instructions.
         '''
+        # The aeroplane is modified in place: derived state cannot be memoised
+        # until the update is over.
+        self.plane.suspend_memo()
         # Run the TCAS subroutine, which can override any order given to the
         # pilot in case of risk of imminent collision
         self.plane.tcas.update()
@@ -339,3 +351,4 @@ class Pilot(object):
             msg = 'Noooooooooo! Aaaarrghh!... <click>'
             self.say(msg, S.KO_COLOUR)
             self.plane.terminate(S.PLANE_CRASHES)
+        self.plane.resume_memo()
@@ -7,6 +7,8 @@ A procedure in ATC-NG is defined as an order that requires the pilot to perform
 different actions at different stages of it.
 '''
 
+import logging
+
 import lib.utils as U
 from engine.settings import settings as S
 from lib.euclid import Vector3
@@ -266,25 +268,31 @@ class Land(GeneralProcedure):
         pl = self.plane
         pi = self.pilot
         l = self.lander
+        # Debug lines are built out of several computed properties: only
+        # evaluate them if they are going to be logged.
+        debug = log.isEnabledFor(logging.DEBUG)
         assert self.phase in (self.ABORTED, self.INTERCEPTING, self.MERGING,
                               self.MATCHING, self.GLIDING, self.TAXIING)
         if self.phase == self.INTERCEPTING:
             #BUG: if command is given too late the plane won't manage to
             #     turn into the vector
-            log.debug('%s INTERCEPTING: md=%s fd=%s' % (pl.icao, l.md, l.fd))
+            if debug:
+                log.debug('%s INTERCEPTING: md=%s fd=%s', pl.icao, l.md, l.fd)
             if pi.navigator.check_overshot(l.mp) == True:
                 pi.target_conf.heading = l.foot
                 self.phase = self.MERGING
         if self.phase == self.MERGING:
-            log.debug('%s MERGING: head=%s t_head= %s fd=%s' % (pl.icao,
-                      pl.heading, pi.target_conf.heading, l.fd))
+            if debug:
+                log.debug('%s MERGING: head=%s t_head= %s fd=%s', pl.icao,
+                          pl.heading, pi.target_conf.heading, l.fd)
             if pl.heading == pi.target_conf.heading:
                 self.phase = self.MATCHING
         if self.phase == self.MATCHING:
             path_alt = l.path_alt
             alt_diff = path_alt - pl.altitude  #negative -> descend!
-            log.debug('%s MATCHING: alt=%s path_alt=%s delta=%s fd=%s' %
-                      (pl.icao, pl.altitude, path_alt, alt_diff, l.fd))
+            if debug:
+                log.debug('%s MATCHING: alt=%s path_alt=%s delta=%s fd=%s',
+                          pl.icao, pl.altitude, path_alt, alt_diff, l.fd)
             secs_to_foot = l.fd / pl.speed
             # Abort if the plane is too fast to descend
             if abs(secs_to_foot * pl.climb_rate_limits[0]) < l.above_foot:
@@ -304,15 +312,17 @@ class Land(GeneralProcedure):
             else:
                 pi.target_conf.altitude = path_alt
         elif self.phase == self.GLIDING:
-            log.debug('%s GLIDING: footalt=%s speed=%s t_speed=%s bd=%s fd=%s'
-                      % (pl.icao, l.above_foot, pl.speed,
-                         pi.target_conf.speed, l.bd, l.fd))
+            if debug:
+                log.debug('%s GLIDING: footalt=%s speed=%s t_speed=%s bd=%s '
+                          'fd=%s', pl.icao, l.above_foot, pl.speed,
+                          pi.target_conf.speed, l.bd, l.fd)
             # Abort if the plane is too fast to slow to landing speed
             if pi.navigator.check_overshot(l.bp):
                 pi.target_conf.speed = pl.landing_speed
             # Make decision if below minimum altitude
             if not l.taxiing_data and l.above_foot <= S.DECISION_ALTITUDE:
-                l.make_decision()
+                if not l.make_decision():
+                    return self.phase
             ticks = 1.0 * l.fd / pi.target_conf.speed / S.PING_IN_SECONDS
             z_step = 1.0 * l.above_foot / ticks
             pi.target_conf.altitude -= z_step
@@ -328,7 +338,8 @@ class Land(GeneralProcedure):
                     msg = 'Well, well... we just landed at the WRONG airport!'
                     pi.say(msg, S.KO_COLOUR)
         elif self.phase == self.TAXIING:
-            log.debug('%s TAXIING: speed=%s fd=%s' % (pl.icao, pl.speed, l.fd))
+            if debug:
+                log.debug('%s TAXIING: speed=%s fd=%s', pl.icao, pl.speed, l.fd)
             l.taxiing_data['timer'] -= S.PING_IN_SECONDS
             if l.taxiing_data['timer'] <= 0:
                 if pl.destination == l.port.iata:
@@ -6,14 +6,13 @@ Provides the sprite classes used in the radar window.
 These are: flight strips, airport maps,
 '''
 
-import os.path as path
-
 import pygame.sprite
 from pygame.locals import *
-from pkg_resources import resource_stream  #@UnresolvedImport
 
 import lib.utils as U
 from engine.settings import settings as S
+from engine.resources import resources as R
+from engine.profiler import profiler
 
 __author__ = "Mac Ryan"
 __copyright__ = "Copyright 2011, Mac Ryan"
@@ -33,6 +32,11 @@ class StripsGroup(pygame.sprite.RenderUpdates):
 
     status_hierarchy = ['on_ground', 'locked', 'busy', '', 'priority',
                         'fuel_emergency', 'collision']
+    POOL_SIZE = 20  #max removed strips kept for recycling
+
+    def __init__(self, *sprites):
+        super(StripsGroup, self).__init__(*sprites)
+        self.__pool = []
 
     def update(self, *args):
         filter = getattr(self, 'filter', 'TIME')
@@ -59,6 +63,17 @@ class StripsGroup(pygame.sprite.RenderUpdates):
             sprite.target_y = i*FlightStrip.strip_h
             sprite.update()
 
+    def add_strip(self, plane, status):
+        '''
+        Add the strip of a plane, recycling a removed strip if available.
+        '''
+        if self.__pool:
+            strip = self.__pool.pop()
+            strip.rebind(plane, status)
+        else:
+            strip = FlightStrip(plane, status)
+        self.add(strip)
+
     def remove_strip(self, plane):
         '''
         Remove a strip from the sprite group based on its plane object.
@@ -66,6 +81,8 @@ class StripsGroup(pygame.sprite.RenderUpdates):
         for sprite in self.sprites():
             if sprite.plane == plane:
                 sprite.kill()
+                if len(self.__pool) < self.POOL_SIZE:
+                    self.__pool.append(sprite)
                 return
     def _compare_status(self, plane_a, plane_b):
         '''
@@ -96,7 +113,7 @@ class Score(pygame.sprite.Sprite):
         self.image = pygame.surface.Surface(S.SCORE_RECT.size, SRCALPHA)
         self.rect = self.image.get_rect()
         self.score = self.gamelogic.score
-        self.fontobj = pygame.font.Font(S.MAIN_FONT, U.rint(self.rect.h * 0.8))
+        self.fontobj = R.get_font(S.MAIN_FONT, U.rint(self.rect.h * 0.8))
 
     def update(self):
         STEP = U.rint(S.PING_PERIOD / 1000.0 + 1)  #arbitrary: ping in sec + 1
@@ -115,16 +132,55 @@ class Score(pygame.sprite.Sprite):
         score = str(self.score).zfill(6)
         score_img = self.fontobj.render(score, True, colour)
         score_img.subsurface(score_img.get_bounding_rect()).copy()
+        profiler.count_surfaces(2)
         pos = U.get_rect_at_centered_pos(score_img, self.rect.center)
         self.image.blit(score_img, pos)
 
 
+class Splash(pygame.sprite.Sprite):
+
+    '''
+    Progress of the loading of the game, displayed on the radar screen.
+    '''
+
+    TITLE = 'AIR TRAFFIC CONTROLLER - NG'
+
+    def __init__(self, size):
+        super(Splash, self).__init__()
+        self.image = pygame.surface.Surface(size)
+        self.rect = self.image.get_rect()
+        w, h = size
+        fontobj = U.get_fontobj_by_text_width(S.MAIN_FONT, self.TITLE,
+                                              (w * 0.8, h / 10))
+        self.title = fontobj.render(self.TITLE, True, S.WHITE)
+        self.fontobj = R.get_font(S.MAIN_FONT, U.rint(h / 40.0))
+        self.bar = pygame.rect.Rect(w * 0.2, h * 0.55, w * 0.6, h / 40)
+        self.phase = None
+        self.phase_img = None
+
+    def update(self, progress, phase):
+        if phase != self.phase:
+            self.phase = phase
+            self.phase_img = self.fontobj.render(phase, True, S.PALE_GRAY)
+            profiler.count_surfaces()
+        self.image.fill(S.BLACK)
+        w, h = self.rect.size
+        U.blit_dead_centre(self.image, self.title, (w / 2, U.rint(h * 0.4)))
+        done = self.bar.copy()
+        done.w = U.rint(self.bar.w * progress)
+        pygame.draw.rect(self.image, S.GRAY, done)
+        pygame.draw.rect(self.image, S.WHITE, self.bar, 1)
+        U.blit_dead_centre(self.image, self.phase_img,
+                           (w / 2, self.bar.bottom + self.bar.h * 2))
+
+
 class FlightStrip(pygame.sprite.Sprite):
 
     '''
     Flight progress strips appears to the left of the GUI.
     '''
 
+    initialised = False
     empty_sprites = {}
     font_objects = {}
     radius = 7
@@ -133,26 +189,40 @@ class FlightStrip(pygame.sprite.Sprite):
 
     def __init__(self, plane, status):
         super(FlightStrip, self).__init__()
+        self.initialise()
+        size = (S.STRIPS_RECT.w, self.strip_h)
+        self.image = pygame.surface.Surface(size, SRCALPHA)
+        self.bkground = pygame.surface.Surface(size, SRCALPHA)
+        profiler.count_surfaces(2)
+        self.rebind(plane, status)
+
+    def rebind(self, plane, status):
+        '''
+        Associate the strip with a (new) aeroplane, so that it can be
+        recycled. The fixed part of the strip is drawn again on the surfaces
+        the strip already owns.
+        '''
         self.plane = plane
         # Draw fixed part of the strip
-        self.image = self.__get_empty(status)
-        self.image.blit(self.render_text('large', S.BLACK, plane.icao),
-                        (self.offset, self.offset))
+        self.bkground.fill(S.TRANSPARENT)
+        self.bkground.blit(self.__get_empty(status), (0, 0))
+        self.bkground.blit(self.render_text('large', S.BLACK, plane.icao),
+                           (self.offset, self.offset))
         task = '%s ] %s' % (plane.origin, plane.destination)
-        self.image.blit(self.render_text('small', S.BLACK, task),
-                        (S.STRIPS_RECT.w*0.60, self.offset))
-        self.image.blit(self.render_text('small', S.BLACK, plane.callsign),
-                        self.callsign_position)
-        # Save the empty one as bkground
-        self.bkground = self.image.copy()
+        self.bkground.blit(self.render_text('small', S.BLACK, task),
+                           (S.STRIPS_RECT.w*0.60, self.offset))
+        self.bkground.blit(self.render_text('small', S.BLACK, plane.callsign),
+                           self.callsign_position)
         # Initial position
         self.rect = pygame.rect.Rect(0, 0, S.STRIPS_RECT.w, self.strip_h)
 
     @classmethod
     def initialise(cls):
         '''
-        Initialisation method, called at import time.
+        Initialisation method, called when the first strip is created.
         '''
+        if cls.initialised:
+            return  #make sure initialisation occurs only once
         tmp = cls.__get_fontobj('large')
         l_height = tmp.render('M', True, S.WHITE).get_bounding_rect().h
         tmp = cls.__get_fontobj('small')
@@ -162,8 +232,7 @@ class FlightStrip(pygame.sprite.Sprite):
                       'drop-red.png', 'drop-yellow.png',
                       'master-alarm-off.png', 'master-alarm-on.png',
                       'expedite-off.png', 'expedite-on.png'):
-            data = resource_stream(__name__, path.join('data', fname))
-            image = pygame.image.load(data)
+            image = R.get_image('sprites/data/' + fname)
             if 'drop' in fname or 'alarm' in fname:
                 height = float(l_height)
             else:
@@ -191,6 +260,7 @@ class FlightStrip(pygame.sprite.Sprite):
         cls.master_alarm_position = (
             S.STRIPS_RECT.w - cls.offset - cls.master_alarm_on.get_width(),
             cls.offset + l_height + cls.offset)
+        cls.initialised = True
 
     @classmethod
     def __get_fontobj(cls, size_str):
@@ -201,7 +271,7 @@ class FlightStrip(pygame.sprite.Sprite):
             # set the big font
             size = 1
             while True:
-                fontobj = pygame.font.Font(S.MAIN_FONT, size)
+                fontobj = R.get_font(S.MAIN_FONT, size)
                 w,h = fontobj.render('XXX0000', True, S.WHITE).get_size()
                 if w > S.STRIPS_RECT.w/2 - cls.offset - cls.margin:
                     break
@@ -209,7 +279,7 @@ class FlightStrip(pygame.sprite.Sprite):
                 size += 1
             cls.font_objects['large'] = last_ok
             # set the small font
-            cls.font_objects['small'] = pygame.font.Font(S.MAIN_FONT,
+            cls.font_objects['small'] = R.get_font(S.MAIN_FONT,
                                                          U.rint(size/3.0))
         return cls.font_objects[size_str]
 
@@ -217,7 +287,8 @@ class FlightStrip(pygame.sprite.Sprite):
     def __get_empty(cls, type_):
         '''
         Generate an empty flight-strip.
-        Return the pygame.surface object of appropriate colour and dimenstion.
+        Return the cached pygame.surface object of appropriate colour and
+        dimension (callers must not draw on it).
         '''
         if type_ not in cls.empty_sprites.keys():
             if type_ == S.OUTBOUND:
@@ -238,7 +309,7 @@ class FlightStrip(pygame.sprite.Sprite):
                 S.STRIPS_RECT.w-2*cls.offset, cls.strip_h-2*cls.margin)
             pygame.draw.rect(s, color, r)
             cls.empty_sprites[type_] = s
-        return cls.empty_sprites[type_].copy()
+        return cls.empty_sprites[type_]
 
     @classmethod
     def render_text(cls, size, color, text):
@@ -247,10 +318,12 @@ class FlightStrip(pygame.sprite.Sprite):
         '''
         fo = cls.__get_fontobj(size)
         img = fo.render(text, True, color)
+        profiler.count_surfaces(2)
         return img.subsurface(img.get_bounding_rect()).copy()
 
     def update(self):
-        self.image = self.bkground.copy()
+        self.image.fill(S.TRANSPARENT)
+        self.image.blit(self.bkground, (0, 0))
         fuel_msg = 'FUEL: %s (%s)' % (str(U.rint(self.plane.fuel)).zfill(3),
                     str(U.rint(self.plane.fuel_delta)).zfill(3))
         color = S.DARK_GREEN if self.plane.fuel > 100 else S.KO_COLOUR
@@ -285,5 +358,9 @@ class FlightStrip(pygame.sprite.Sprite):
             text = self.render_text('small', S.GRAY, text)
             self.image.blit(text, self.order_being_processed_position)
 
-# MODULE INITIALISATION
-FlightStrip.initialise()
\ No newline at end of file
+def initialise():
+    '''
+    Initialise the sprite classes (otherwise this happens when the first
+    strip is created).
+    '''
+    FlightStrip.initialise()
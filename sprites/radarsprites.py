@@ -6,7 +6,6 @@ Provides the sprite classes used in the radar window.
 These are: aeroplanes, trailing dots, labels (tags) and tags connectors.
 '''
 
-import os
 from math import radians, sin, cos
 
 import pygame.sprite
@@ -15,10 +14,11 @@ import pygame.transform
 import pygame.image
 import pygame.font
 from pygame.locals import *
-from pkg_resources import resource_stream  #@UnresolvedImport
 
 import lib.utils as U
 from engine.settings import settings as S
+from engine.resources import resources as R
+from engine.profiler import profiler
 from lib.euclid import Vector2
 
 __author__ = "Mac Ryan"
@@ -37,10 +37,17 @@ class SuperSprite(pygame.sprite.Sprite):
     '''
     Base class to derive the in-game sprites in ATC.
     Add spritesheet manipulation capability.
+
+    The images shared by all the sprites of a class are prepared by the
+    ``initialise()`` class method, the first time a sprite is created.
     '''
 
     initialised = False
 
+    def __init__(self, *groups):
+        self.initialise()
+        super(SuperSprite, self).__init__(*groups)
+
     @classmethod
     def initialise(cls):
         if not cls.initialised:
@@ -51,8 +58,7 @@ class SuperSprite(pygame.sprite.Sprite):
         '''
         Return the specified sprite sheet as loaded surface.
         '''
-        data = resource_stream(__name__, os.path.join(directory, fname))
-        sheet = pygame.image.load(data)
+        sheet = R.get_image('sprites/%s/%s' % (directory, fname))
         if colorkey:
             if colorkey == -1:
             # If the colour key is -1, set it to colour of upper left corner
@@ -60,7 +66,7 @@ class SuperSprite(pygame.sprite.Sprite):
             sheet.set_colorkey(colorkey)
             sheet = sheet.convert()
         else: # If there is no colorkey, preserve the image's alpha per pixel.
-            _image = sheet.convert_alpha()
+            sheet = sheet.convert_alpha()
         return sheet
 
     @classmethod
@@ -84,9 +90,7 @@ class SuperSprite(pygame.sprite.Sprite):
         '''
         Return the cropped portion of an image.
         '''
-        new_surface = pygame.surface.Surface((area.width, area.height),
-                                             flags=SRCALPHA)
-        new_surface.blit(image, (0,0), area)
+        profiler.count_surfaces()
         return image.subsurface(area).copy()
 
     @classmethod
@@ -102,12 +106,14 @@ class SuperSprite(pygame.sprite.Sprite):
         factor = max(factor, 1.0*px_limit/y)
         if angle:
             image = pygame.transform.rotate(image, angle)
+            profiler.count_surfaces()
             # The rotation can potentially enlarge the bounding rectangle of
             # the sprite, filling the extra other space with alpha=0
             image = cls.crop(image, image.get_bounding_rect())
         # Calculate the actual ratio that allows not to exceed px_limit
         x, y = [int(round(v*factor)) for v in (x,y)]
         # Finally, scaling down as last operation guarantees anti-aliasing
+        profiler.count_surfaces()
         return pygame.transform.smoothscale(image, (x,y))
 
     @property
@@ -156,8 +162,10 @@ class TagConnector(SuperSprite):
         color = self.tag.color
         pygame.draw.aaline(image, color, (1,1), (self.rect.width-1,
                                                  self.rect.height-1))
+        profiler.count_surfaces()
         if flip_x != flip_y:  #both flips == no flip
             image = pygame.transform.flip(image, flip_x, flip_y)
+            profiler.count_surfaces()
         self.image = image
         self.rect.move_ip(placement)
 
@@ -170,7 +178,9 @@ class Tag(SuperSprite):
 
     @classmethod
     def initialise(cls):
-        cls.fontobj = pygame.font.Font(S.MAIN_FONT, S.HUD_INFO_FONT_SIZE)
+        if cls.initialised:
+            return  #make sure initialisation occurs only once
+        cls.fontobj = R.get_font(S.MAIN_FONT, S.HUD_INFO_FONT_SIZE)
         cls.default_angle = 45
         cls.default_radius = 50
         cls.initialised = True
@@ -187,12 +197,24 @@ class Tag(SuperSprite):
                                         SRCALPHA)
         for i in range(len(lines)):
             result.blit(surfaces[i], (0,i*font_height))
+        profiler.count_surfaces(len(surfaces) + 1)
         return result
 
     def __init__(self, data_source, radar_rect):
         super(Tag, self).__init__()
-        self.plane = data_source
         self.radar_rect = radar_rect
+        self.rebind(data_source)
+
+    def rebind(self, data_source):
+        '''
+        Associate the tag with a (new) aeroplane, so that it can be recycled.
+        '''
+        self.plane = data_source
+        # The placement is kept from one ping to the next, and is only
+        # changed by the aerospace if it becomes unsuitable.
+        self.angle = self.default_angle
+        self.radius = self.default_radius
+        self.last_search = 0  #time of the last search for a free placement
         self.update()
 
     def set_connector(self, connector_sprite):
@@ -203,17 +225,23 @@ class Tag(SuperSprite):
         '''
         self.connector = connector_sprite
 
+    def get_rect_at(self, angle, radius):
+        '''
+        Return the rect the tag would occupy if placed at ``angle`` and
+        ``radius`` from its plane.
+        '''
+        cx, cy = self.plane.trail[0]
+        rad = radians(angle)
+        ox = U.rint(cos(rad) * radius)
+        oy = -U.rint(sin(rad) * radius)  #minus because of screen coordinates
+        return U.get_rect_at_centered_pos(self.image, (cx + ox, cy + oy))
+
     def place(self):
         '''
         Place the tag according to the angle and radius properties. Return True
         if the tag is entirely on radar, False otherwise.
         '''
-        cx, cy = self.plane.trail[0]
-        rad = radians(self.angle)
-        ox = U.rint(cos(rad) * self.radius)
-        oy = -U.rint(sin(rad) * self.radius)  #minus because of screen coordinates
-        x, y = cx + ox, cy + oy
-        self.rect = U.get_rect_at_centered_pos(self.image, (x, y))
+        self.rect = self.get_rect_at(self.angle, self.radius)
         return self.radar_rect.contains(self.rect)
 
     def update(self):
@@ -232,8 +260,6 @@ class Tag(SuperSprite):
         lines.append('%s%s' % (alt,spd))
         self.image = self.render_lines(lines)
         self.rect = self.image.get_rect()
-        self.angle = self.default_angle
-        self.radius = self.default_radius
 
 
 class TrailingDot(SuperSprite):
@@ -281,8 +307,14 @@ class TrailingDot(SuperSprite):
           sprite represents
         '''
         super(TrailingDot, self).__init__()
-        self.data_source = data_source
         self.time_shift = time_shift
+        self.rebind(data_source)
+
+    def rebind(self, data_source):
+        '''
+        Associate the dot with a (new) aeroplane, so that it can be recycled.
+        '''
+        self.data_source = data_source
         self.last_status = None
         self.update()
 
@@ -314,15 +346,28 @@ class AeroplaneIcon(SuperSprite):
         sheets['propeller'] = cls.load_sprite_sheet('sprite-propeller.png')
         sheets['supersonic'] = cls.load_sprite_sheet('sprite-supersonic.png')
         cls.sprite_sheets = sheets
+        # The images of the aeroplane states are cropped and scaled only once
+        # per category, and shared by all icons.
+        cls.category_sprites = {}
+        for category, sheet in sheets.items():
+            cls.category_sprites[category] = \
+                    [cls.rotoscale(img, 0, S.SPRITE_SCALING,
+                                   S.MIN_PLANE_ICON_SIZE)
+                     for img in cls.get_sprites_from_sheet(sheet)]
         cls.initialised = True
 
     def __init__(self, data_source, category):
-        self.data_source = data_source
+        super(AeroplaneIcon, self).__init__()
+        self.rebind(data_source, category)
+
+    def rebind(self, data_source, category):
+        '''
+        Associate the icon with a (new) aeroplane, so that it can be recycled.
+        '''
         assert category in ('jet', 'propeller', 'supersonic')
+        self.data_source = data_source
         self.calss_ = category
-        super(AeroplaneIcon, self).__init__()
-        self.sprites = \
-                self.get_sprites_from_sheet(self.sprite_sheets[category])
+        self.sprites = self.category_sprites[category]
         self.last_status = None
         self.last_heading = None
         self.update()
@@ -340,15 +385,20 @@ class AeroplaneIcon(SuperSprite):
             # The CCW vs CW is compensated by sign reversal. The 90 degrees
             # offset is compensated by the orientation of the original sprite
             # (North rather than East).
-            heading *= -1
-            self.image = self.rotoscale(img, heading, S.SPRITE_SCALING,
-                                                      S.MIN_PLANE_ICON_SIZE)
+            # Images are already scaled, so rotozoom is used for antialiasing.
+            img = pygame.transform.rotozoom(img, -heading, 1)
+            self.image = self.crop(img, img.get_bounding_rect())
+            profiler.count_surfaces()
         self.rect = \
             U.get_rect_at_centered_pos(self.image, self.data_source.trail[0])
 
 
-# Initialisation of the sprite classes
-AeroplaneIcon.initialise()
-TrailingDot.initialise()
-Tag.initialise()
-TagConnector.initialise()
+def initialise():
+    '''
+    Initialise all the sprite classes (otherwise each class is initialised
+    when its first sprite is created).
+    '''
+    AeroplaneIcon.initialise()
+    TrailingDot.initialise()
+    Tag.initialise()
+    TagConnector.initialise()
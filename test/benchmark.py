@@ -0,0 +1,469 @@
+#!/usr/bin/env python
+# -*- coding: utf-8  -*-
+'''
+Benchmark suite for the simulation.
+
+Build aerospaces with an increasing number of aeroplanes, run them for a few
+radar pings and measure the time spent in the most expensive parts of the
+simulation:
+
+    Aerospace.update, Aerospace.set_tcas_data, Aerospace.place_tags,
+    Pilot.update, Land.update, StripsGroup.update, Logger.handle
+
+Times are inclusive (``Aerospace.update`` contains most of the others) and
+are given per radar ping. The number of vectors created per aeroplane and per
+radar ping is also counted, as a measure of the allocation pressure, as well
+as the hit rate of the memoised derived state of the aeroplanes. The planes
+on approach are placed so that they keep landing for the whole benchmark:
+the calls of ``Land.update`` per radar ping are reported next to their
+number, and a warning is printed if some of them were lost. For each
+function the scaling exponent ``k`` of ``time ~ planes^k`` is estimated with
+a least-squares fit on a log-log scale, so that quadratic behaviours are easy
+to spot. Results are also written as JSON, to be compared between
+revisions::
+
+    python test/benchmark.py --sizes 10,50,200,1000 --output bench.json
+
+The cost of logging can be measured with ``--log-level debug``, with the
+records written in background (as the game does) or, with ``--sync-log``,
+by the simulation itself: ``Logger.handle`` is the time the simulation
+spends handing the records over (or writing them).
+
+This file is not collected by the unittest runner (its name doesn't start
+with ``test``).
+'''
+
+import os
+import json
+import random
+import signal
+import logging
+import argparse
+from math import log as ln, cos, radians
+from time import time
+
+import pygame
+# The simulation runs without a window. PyGame initialisation must occur here
+# as the settings module needs a display to compute the size of the GUI.
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+pygame.init()
+pygame.display.set_mode((1280, 720), 0, 32)
+
+import lib.utils as U
+import engine.aerospace
+import engine.gamelogic
+import engine.logger
+import pilot.pilot
+import pilot.procedures
+import sprites.guisprites
+from engine.settings import settings as S
+from engine.logger import log
+from entities.aeroplane import Aeroplane, DERIVED_STATS
+from lib.euclid import Vector2, Vector3
+
+__author__ = "Mac Ryan"
+__copyright__ = "Copyright 2011, Mac Ryan"
+__license__ = "GPL v3"
+#__version__ = "<dev>"
+#__date__ = "<unknown>"
+__maintainer__ = "Mac Ryan"
+__email__ = "quasipedia@gmail.com"
+__status__ = "Development"
+
+# Functions to time: (label, class, method name)
+TIMED = [('Aerospace.update', engine.aerospace.Aerospace, 'update'),
+         ('Aerospace.set_tcas_data', engine.aerospace.Aerospace,
+          'set_tcas_data'),
+         ('Aerospace.place_tags', engine.aerospace.Aerospace, 'place_tags'),
+         ('Pilot.update', pilot.pilot.Pilot, 'update'),
+         ('Land.update', pilot.procedures.Land, 'update'),
+         ('StripsGroup.update', sprites.guisprites.StripsGroup, 'update'),
+         ('Logger.handle', logging.Logger, 'handle')]
+LANDING_RATIO = 0.1           # fraction of the planes performing a landing
+MAX_PLACEMENT_ATTEMPTS = 1000 # candidate approaches tried per landing plane
+APPROACH_SPEED_RATIO = 2      # speed of the landing planes / landing speed
+TIME_LIMIT_MSG = 'Benchmark time limit exceeded'
+
+
+class Timer(object):
+
+    '''
+    Wrap methods of simulation classes to accumulate the time spent in them.
+    The original methods are restored by ``remove()``.
+    '''
+
+    def __init__(self):
+        self.totals = dict((label, 0.0) for label, cls, name in TIMED)
+        self.calls = dict((label, 0) for label, cls, name in TIMED)
+        self.__originals = []
+        for label, cls, name in TIMED:
+            original = cls.__dict__[name]
+            self.__originals.append((cls, name, original))
+            setattr(cls, name, self.__wrap(label, original))
+
+    def __wrap(self, label, method):
+        totals = self.totals
+        calls = self.calls
+        def wrapper(*args, **kwargs):
+            start = time()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                totals[label] += time() - start
+                calls[label] += 1
+        return wrapper
+
+    def reset(self):
+        for label in self.totals:
+            self.totals[label] = 0.0
+            self.calls[label] = 0
+
+    def remove(self):
+        for cls, name, original in self.__originals:
+            setattr(cls, name, original)
+
+
+class VectorCounter(object):
+
+    '''
+    Wrap the constructors of the vector classes to count the vectors created
+    by the simulation. The original constructors are restored by
+    ``remove()``.
+    '''
+
+    def __init__(self):
+        self.count = 0
+        self.__originals = []
+        for cls in (Vector2, Vector3):
+            original = cls.__dict__['__init__']
+            self.__originals.append((cls, original))
+            setattr(cls, '__init__', self.__wrap(original))
+
+    def __wrap(self, method):
+        def wrapper(*args, **kwargs):
+            self.count += 1
+            method(*args, **kwargs)
+        return wrapper
+
+    def reset(self):
+        self.count = 0
+
+    def remove(self):
+        for cls, original in self.__originals:
+            setattr(cls, '__init__', original)
+
+
+def straight_track(position, direction, step, pings):
+    '''
+    Return the positions (one per radar ping, starting from the current one)
+    of a plane flying from ``position`` along the unit vector ``direction``,
+    covering ``step`` metres each ping.
+    '''
+    return [position + direction * (step * ping) for ping in range(pings + 1)]
+
+def is_clear(track, tracks, clearance):
+    '''
+    Return True if ``track`` is always at least ``clearance`` metres away
+    (horizontally) from each of ``tracks`` at the same radar ping.
+    '''
+    clearance **= 2
+    return all((a.x - b.x) ** 2 + (a.y - b.y) ** 2 >= clearance
+               for other in tracks for a, b in zip(track, other))
+
+def on_radar(position):
+    '''
+    Return True if ``position`` is on radar, not too close to its border.
+    '''
+    margin = S.RADAR_RANGE / 10
+    return margin < position.x < S.RADAR_RANGE * 2 - margin and \
+           margin < position.y < S.RADAR_RANGE * 2 - margin
+
+def place_landing_plane(rnd, runways, first, step, pings, tracks):
+    '''
+    Return ``(port, rname, position, heading, track)`` for a plane on
+    approach to a runway, covering ``step`` metres per radar ping. Planes are
+    at 1500 m, 12 to 20 km from the runway along its ILS and converge towards
+    it with a heading within 30° from the ILS one, intercepting it 5 km
+    ahead. Until then they fly straight, so their ``track`` for the first
+    ``pings`` is known: candidates getting too close to one of ``tracks``
+    (the other landing planes) are discarded, as the TCAS would take the
+    planes out of the landing procedure. Runways are tried in turn starting
+    from ``runways[first]``; return None if no suitable placement is found
+    (the approaches are full).
+    '''
+    run = 5000
+    for attempt in range(MAX_PLACEMENT_ATTEMPTS):
+        port, rname = runways[(first + attempt) % len(runways)]
+        runway = port.runways[rname]
+        ils = Vector3(*runway['ils'].xy).normalized()
+        foot = runway['location'] + port.location
+        angle = rnd.uniform(-30, 30)
+        heading = (U.v3_to_heading(ils) + angle) % 360
+        direction = U.heading_to_v3(heading)
+        distance = rnd.uniform(12000, 20000)
+        ip = foot - ils * (distance - run * cos(radians(angle)))
+        ip.z = 1500
+        position = ip - direction * run
+        track = straight_track(position, direction, step, pings)
+        if on_radar(position) and \
+           is_clear(track, tracks, S.HORIZONTAL_CLEARANCE * 1.05):
+            return port, rname, position, heading, track
+
+def place_cruising_plane(rnd, step, pings, tracks):
+    '''
+    Return ``(position, heading)`` for a plane flying at a random flight
+    level above the landing planes, covering ``step`` metres per radar ping.
+    Planes avoiding a collision change their flight level, so cruising planes
+    are kept clear of the ``tracks`` of the landing planes for the first
+    ``pings``. If no suitable placement is found the last candidate is
+    returned.
+    '''
+    margin = S.RADAR_RANGE / 10
+    for attempt in range(MAX_PLACEMENT_ATTEMPTS):
+        position = Vector3(rnd.uniform(margin, S.RADAR_RANGE * 2 - margin),
+                           rnd.uniform(margin, S.RADAR_RANGE * 2 - margin),
+                           rnd.randrange(2000, 9001, 500))
+        heading = rnd.uniform(0, 360)
+        track = straight_track(position, U.heading_to_v3(heading), step, pings)
+        if is_clear(track, tracks, S.HORIZONTAL_CLEARANCE * 2):
+            break
+    return position, heading
+
+def build_gamelogic(planes, scenario, seed, pings):
+    '''
+    Return a headless GameLogic for ``scenario`` with ``planes`` aeroplanes
+    flying in its aerospace. Most planes are randomly placed at random flight
+    levels above 2000 m, the others are on final approach to a runway and
+    keep performing a landing for (at least) ``pings`` radar pings. If the
+    approaches are full, the remaining planes that should be landing are
+    cruising instead.
+    '''
+    screen = pygame.display.get_surface()
+    gl = engine.gamelogic.GameLogic(screen, scenario=scenario, seed=seed,
+                                    record_replay=False)
+    rnd = random.Random(seed)
+    aerospace = gl.aerospace
+    ports = sorted(aerospace.airports.values(), key=lambda p : p.iata)
+    runways = [(port, rname) for port in ports
+               for rname in sorted(port.runways)]
+    destinations = [p.iata for p in ports] + sorted(aerospace.gates)
+    tracks = []
+    full = False
+    for i in range(planes):
+        kwargs = gl.challenge.model_generator()
+        kwargs.update(gl.challenge.flightnum_generator())
+        # Flight numbers are random: make sure they are unique
+        kwargs['icao'] = '%s%04d' % (kwargs['icao'][:3], i)
+        landing = None
+        if i < planes * LANDING_RATIO and not full:
+            # On approach planes fly slowly enough to lose their altitude
+            # before reaching the runway
+            speed = kwargs['landing_speed'] * APPROACH_SPEED_RATIO
+            landing = place_landing_plane(rnd, runways, i,
+                                    speed * S.PING_IN_SECONDS, pings, tracks)
+            full = landing is None
+        if landing:
+            port, rname, position, heading, track = landing
+            tracks.append(track)
+            kwargs['destination'] = port.iata
+        else:
+            speed = kwargs['max_speed']
+            position, heading = place_cruising_plane(
+                    rnd, speed * S.PING_IN_SECONDS, pings, tracks)
+            kwargs['destination'] = rnd.choice(destinations)
+        kwargs.update(origin='BENCH', position=position, fuel=10000,
+                      fuel_efficiency=gl.challenge.fuel_per_metre,
+                      velocity=U.heading_to_v3(heading) * speed)
+        plane = Aeroplane(aerospace, **kwargs)
+        gl.add_plane(plane)
+        plane.pilot.set_target_conf_to_current()
+        if landing:
+            plane.pilot.do([['LAND', [port.iata, rname], []]])
+    return gl
+
+def __time_limit_exceeded(signum, frame):
+    raise BaseException(TIME_LIMIT_MSG)
+
+def run_size(planes, pings, warmup, scenario, seed, time_limit=None):
+    '''
+    Benchmark an aerospace with ``planes`` aeroplanes. Return a dictionary
+    with the time per ping (in milliseconds) of each timed function.
+
+    If the benchmark takes more than ``time_limit`` seconds it is interrupted
+    and the times of the pings simulated until then (including the
+    interrupted one) are returned as lower bounds, with ``timeout`` set.
+    '''
+    gl = build_gamelogic(planes, scenario, seed, warmup + pings)
+    landing = len([p for p in gl.aerospace.aeroplanes
+                   if isinstance(p.pilot.status['procedure'],
+                                 pilot.procedures.Land)])
+    timer = Timer()
+    vectors = VectorCounter()
+    derived = dict(DERIVED_STATS)
+    timeout = False
+    done = count = 0
+    start = time()
+    if time_limit:
+        signal.signal(signal.SIGALRM, __time_limit_exceeded)
+        signal.alarm(time_limit)
+    try:
+        for i in range(warmup):
+            gl.aerospace.update(1)
+            gl.strips.update()
+        timer.reset()
+        vectors.reset()
+        derived = dict(DERIVED_STATS)
+        start = time()
+        for i in range(pings):
+            gl.aerospace.update(1)
+            gl.strips.update()
+            count += len(gl.aerospace.aeroplanes)
+            done += 1
+    except BaseException as e:
+        if e.args != (TIME_LIMIT_MSG,):
+            raise
+        timeout = True
+    finally:
+        signal.alarm(0)
+        timer.remove()
+        vectors.remove()
+        gl.shutdown()
+    elapsed = time() - start
+    measured = done + (1 if timeout else 0)
+    hits = DERIVED_STATS['hits'] - derived['hits']
+    reads = hits + DERIVED_STATS['misses'] - derived['misses']
+    functions = {}
+    for label, cls, name in TIMED:
+        functions[label] = dict(
+            ms_per_ping=timer.totals[label] * 1000 / max(measured, 1),
+            calls_per_ping=timer.calls[label] / float(max(measured, 1)))
+    return dict(planes=planes,
+                mean_planes=count / float(done) if done else planes,
+                pings=done, timeout=timeout, landing_planes=landing,
+                ms_per_ping=elapsed * 1000 / max(measured, 1),
+                vectors_per_plane_ping=vectors.count / float(max(count, 1)),
+                derived_hit_rate=100.0 * hits / reads if reads else 0.0,
+                functions=functions)
+
+def scaling_exponent(sizes, times):
+    '''
+    Return the exponent ``k`` of ``time ~ size^k`` that best fits the data
+    (least squares on a log-log scale), or None if it can't be computed.
+    '''
+    points = [(ln(s), ln(t)) for s, t in zip(sizes, times) if s > 0 and t > 0]
+    if len(points) < 2:
+        return None
+    n = len(points)
+    mx = sum(x for x, y in points) / n
+    my = sum(y for x, y in points) / n
+    sxx = sum((x - mx) ** 2 for x, y in points)
+    if not sxx:
+        return None
+    return sum((x - mx) * (y - my) for x, y in points) / sxx
+
+def run_benchmark(sizes, pings, warmup, scenario, seed, time_limit=None):
+    '''
+    Run the benchmark for all ``sizes`` and return the results. Sizes that
+    exceeded the time limit are not used to compute the scaling exponents.
+    '''
+    runs = [run_size(size, pings, warmup, scenario, seed, time_limit)
+            for size in sizes]
+    complete = [r for r in runs if not r['timeout']]
+    scaling = {}
+    for label, cls, name in TIMED:
+        scaling[label] = scaling_exponent(
+            [r['mean_planes'] for r in complete],
+            [r['functions'][label]['ms_per_ping'] for r in complete])
+    return dict(scenario=scenario, seed=seed, pings=pings, warmup=warmup,
+                time_limit=time_limit, runs=runs, scaling=scaling)
+
+def use_synchronous_log():
+    '''
+    Make the log write its records from the thread that generates them (as
+    it did before the background writer was introduced), to measure the
+    difference.
+    '''
+    engine.logger.initialise()
+    for handler in log.handlers[:]:
+        if isinstance(handler, engine.logger.QueueHandler):
+            log.removeHandler(handler)
+    log.addHandler(engine.logger.writer.handler)
+
+def print_results(results):
+    runs = results['runs']
+    print 'Scenario "%s", %d pings per size (ms per ping)' % \
+          (results['scenario'], results['pings'])
+    print 'Log threshold "%s", records written %s' % (results['log_level'],
+          'by the simulation' if results['sync_log'] else 'in background')
+    print
+    print '%-24s' % '' + ''.join('%12d' % r['planes'] for r in runs) + \
+          '   exponent'
+    # Times of interrupted runs are lower bounds
+    fmt = lambda r, t : ('>%.2f' if r['timeout'] else '%.2f') % t
+    for label, cls, name in TIMED:
+        exponent = results['scaling'][label]
+        exponent = '%11.2f' % exponent if exponent is not None else '%11s' % '-'
+        print '%-24s' % label + ''.join('%12s' %
+              fmt(r, r['functions'][label]['ms_per_ping']) for r in runs) + \
+              exponent
+    print '%-24s' % 'Total' + ''.join('%12s' % fmt(r, r['ms_per_ping'])
+                                      for r in runs)
+    print
+    print '%-24s' % 'Vectors / plane / ping' + ''.join('%12.1f' %
+          r['vectors_per_plane_ping'] for r in runs)
+    print '%-24s' % 'Derived state hits %' + ''.join('%12.1f' %
+          r['derived_hit_rate'] for r in runs)
+    print '%-24s' % 'Landing planes' + ''.join('%12d' %
+          r['landing_planes'] for r in runs)
+    print '%-24s' % 'Land.update / ping' + ''.join('%12.1f' %
+          r['functions']['Land.update']['calls_per_ping'] for r in runs)
+    # Land.update is only meaningful if the planes keep landing throughout
+    # the benchmark (the TCAS takes them out of the procedure, for example)
+    short = [r for r in runs if r['functions']['Land.update']
+             ['calls_per_ping'] < 0.9 * r['planes'] * LANDING_RATIO]
+    if short:
+        print
+        print '(!) Less than 90%% of the expected landings (%.0f%% of the ' \
+              'planes) with: %s' % (LANDING_RATIO * 100,
+                                    ', '.join(str(r['planes']) for r in short))
+    if [r for r in runs if r['timeout']]:
+        print
+        print '(>) time limit of %d s exceeded' % results['time_limit']
+
+def run_as_script():
+    parser = argparse.ArgumentParser(
+                                description='Benchmark the ATC-NG simulation.')
+    parser.add_argument('--sizes', default='10,50,200,1000',
+                        help='comma-separated numbers of aeroplanes')
+    parser.add_argument('--pings', type=int, default=10,
+                        help='radar pings measured for each size')
+    parser.add_argument('--warmup', type=int, default=2,
+                        help='radar pings simulated before measuring')
+    parser.add_argument('--time-limit', type=int, default=300,
+                        help='maximum seconds spent on each size (0 = none)')
+    parser.add_argument('--scenario', default='default')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--log-level', default='warning',
+                        choices=('debug', 'info', 'warning'),
+                        help='threshold of the log while benchmarking')
+    parser.add_argument('--sync-log', action='store_true',
+                        help='write the log records from the simulation '
+                             'thread instead of the background writer')
+    parser.add_argument('--output', metavar='FILE',
+                        help='save the results as JSON in FILE')
+    args = parser.parse_args()
+    S.FDR_ENABLED = False
+    log.setLevel(getattr(logging, args.log_level.upper()))
+    if args.sync_log:
+        use_synchronous_log()
+    sizes = [int(s) for s in args.sizes.split(',')]
+    results = run_benchmark(sizes, args.pings, args.warmup, args.scenario,
+                            args.seed, args.time_limit)
+    results.update(log_level=args.log_level, sync_log=args.sync_log)
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w') as file_:
+            json.dump(results, file_, indent=2, sort_keys=True)
+
+if __name__ == '__main__':
+    run_as_script()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+# -*- coding: utf-8  -*-
+'''
+Testing suite for the aerospace.
+'''
+
+import unittest
+
+import pygame
+# PyGame initialisation must occur here as subsequent imports need pygame
+# set up an running.
+pygame.init()
+pygame.display.set_mode((64,48), 0, 32)
+
+import entities.aeroplane
+import entities.airport
+import engine.aerospace
+import lib.utils as U
+from engine.settings import settings as S
+from lib.euclid import Vector3
+from sprites.radarsprites import Tag
+
+
+__author__ = "Mac Ryan"
+__copyright__ = "Copyright 2011, Mac Ryan"
+__license__ = "GPL v3"
+#__version__ = "<dev>"
+#__date__ = "<unknown>"
+__maintainer__ = "Mac Ryan"
+__email__ = "quasipedia@gmail.com"
+__status__ = "Development"
+
+# Mock classes to allow creation of a simulation without the GUI.
+class MockStrips(object):
+    def add(self, *args, **kwargs):
+        pass
+    def remove_strip(self, *args, **kwargs):
+        pass
+class MockGameLogic(object):
+    def __init__(self):
+        self.ping_count = 0
+        self.score = 0
+        self.strips = MockStrips()
+    def score_event(self, event, plane=None, multiplier=None):
+        self.score += event[1] * (multiplier or 1)
+    def say(self, *args, **kwargs):
+        pass
+    def remove_plane(self, plane, event):
+        self.aerospace.remove_plane(plane)
+    def step(self):
+        self.aerospace.update(1)
+        self.ping_count += 1
+
+
+class AerospaceTest(unittest.TestCase):
+
+    '''
+    Management of the aeroplanes by the aerospace.
+    '''
+
+    def setUp(self):
+        strip_kwargs = {'orientation' : 0,
+                        'length'      : 4000,
+                        'width'       : 60,
+                        'centre_pos'  : [0,0]}
+        port_kwargs = {'location' : (20000, 20000),
+                       'iata' : 'ABC',
+                       'name' : 'Test airport',
+                       'geolocation' : ['',''],
+                       'elevation' : 0}
+        # The radar surface must be large enough for the plane tags to fit.
+        surface = pygame.surface.Surface((1024, 1024))
+        self.gamelogic = MockGameLogic()
+        self.aerospace = engine.aerospace.Aerospace(self.gamelogic, surface)
+        self.gamelogic.aerospace = self.aerospace
+        strip = entities.airport.AsphaltStrip(**strip_kwargs)
+        self.aerospace.add_airport(entities.airport.airport(strips=[strip],
+                                                            **port_kwargs))
+        self.tag_placement_budget = S.TAG_PLACEMENT_BUDGET
+
+    def tearDown(self):
+        S.TAG_PLACEMENT_BUDGET = self.tag_placement_budget
+
+    def add_plane(self, icao, origin, position, velocity):
+        '''
+        Add to the aerospace a plane with given origin, position and velocity.
+        '''
+        plane_kwargs = {'icao' : icao,
+                        'callsign' : 'CALLME PLANE',
+                        'model' : 'A380',
+                        'category' : 'jet',
+                        'origin' : origin,
+                        'destination' : 'ABC',
+                        'fuel_efficiency' : 0.001,
+                        'max_altitude' : 10000,
+                        'climb_rate_limits' : [-30, 15],
+                        'climb_rate_accels' : [-20, 10],
+                        'max_speed' : 800 / 3.6,
+                        'ground_accels' : [-4, 6],
+                        'landing_speed' : 150 / 3.6,
+                        'max_g' : 2,
+                        'position' : position,
+                        'velocity' : velocity,
+                        'fuel' : 500}
+        plane = entities.aeroplane.Aeroplane(self.aerospace, **plane_kwargs)
+        self.aerospace.add_plane(plane)
+        return plane
+
+    def add_parked_plane(self, icao):
+        return self.add_plane(icao, 'ABC', Vector3(20000, 20000, -1),
+                              Vector3(0, 0, 0))
+
+    def add_plane_on_radar(self, icao, x, y):
+        '''
+        Add a plane flying north, whose icon is at (x, y) on the radar.
+        '''
+        mpp = S.METRES_PER_PIXEL
+        position = Vector3(x * mpp, (S.RADAR_RECT.height - y) * mpp, 3000)
+        return self.add_plane(icao, 'XXX', position, Vector3(0, 500 / 3.6, 0))
+
+    def add_crowded_planes(self):
+        '''
+        Add three pairs of planes in which the second plane is where the tag
+        of the first one is placed by default.
+        '''
+        for i in range(3):
+            self.add_plane_on_radar('PAI%d001' % i, 200 + 250 * i, 500)
+            self.add_plane_on_radar('PAI%d002' % i, 235 + 250 * i, 465)
+
+    def count_tag_overlaps(self):
+        '''
+        Return the number of tags overlapping a plane icon or another tag.
+        '''
+        tags = list(self.aerospace.tags)
+        icons = [s.rect for s in self.aerospace.top_layer if s not in tags]
+        overlaps = 0
+        for i, tag in enumerate(tags):
+            overlaps += len(tag.rect.collidelistall(icons))
+            overlaps += len(tag.rect.collidelistall([t.rect for t in
+                                                     tags[i + 1:]]))
+        return overlaps
+
+    def get_tag_placements(self):
+        return dict((tag.plane.icao, (tag.angle, tag.radius))
+                    for tag in self.aerospace.tags)
+
+    def testSleepingPlane(self):
+        '''
+        A plane waiting at the airport sleeps until it takes off, but its
+        waiting time still counts for the score.
+        '''
+        gl = self.gamelogic
+        parked = self.add_parked_plane('PRK0001')
+        for i in range(10):
+            gl.step()
+            self.assertTrue(parked.asleep)
+        self.assertAlmostEqual(gl.score, 10 * S.PING_IN_SECONDS *
+                                         S.PLANE_WAITS_ONE_SECOND[1])
+        self.assertTrue(parked.pilot.do([['TAKEOFF', ['36'], []]]))
+        self.assertFalse(parked.asleep)
+        for i in range(60):
+            gl.step()
+            self.assertFalse(parked.asleep)
+        self.assertFalse(parked.flags.on_ground)
+        self.assertTrue(parked.altitude > 0)
+
+    def testPlaneIndexes(self):
+        '''
+        The indexes of the planes follow the flags of the planes.
+        '''
+        gl = self.gamelogic
+        aerospace = self.aerospace
+        parked = self.add_parked_plane('PRK0001')
+        self.add_plane('FLY0001', 'XXX', Vector3(10000, 10000, 3000),
+                       Vector3(0, 500 / 3.6, 0))
+        lander = self.add_plane('LND0001', 'XXX', Vector3(15000, 0, 1000),
+                                U.heading_to_v3(30) * 400 / 3.6)
+        lander.pilot.set_target_conf_to_current()
+        lander.pilot.do([['LAND', ['ABC', '36'], []]])
+        icaos = lambda planes : sorted(p.icao for p in planes)
+        def get_indexes():
+            return (icaos(aerospace.airborne), icaos(aerospace.locked),
+                    icaos(aerospace.get_planes_on_ground('ABC')),
+                    aerospace.count_planes_on_ground(),
+                    aerospace.count_planes_airborne(),
+                    icaos(aerospace.get_planes_by_origin('ABC')),
+                    icaos(aerospace.get_planes_by_origin('XXX')),
+                    icaos(aerospace.get_planes_by_destination('ABC')))
+        self.assertEqual(get_indexes(),
+                         (['FLY0001', 'LND0001'], [], ['PRK0001'], 1, 2,
+                          ['PRK0001'], ['FLY0001', 'LND0001'],
+                          ['FLY0001', 'LND0001', 'PRK0001']))
+        # Take off
+        parked.pilot.do([['TAKEOFF', ['36'], []]])
+        self.assertEqual(icaos(aerospace.locked), ['PRK0001'])
+        self.assertEqual(aerospace.count_planes_on_ground(), 1)
+        while parked.flags.on_ground:
+            gl.step()
+        self.assertEqual(icaos(aerospace.airborne),
+                         ['FLY0001', 'LND0001', 'PRK0001'])
+        self.assertEqual(aerospace.count_planes_on_ground(), 0)
+        self.assertEqual(aerospace.count_planes_airborne(), 3)
+        # Landing
+        while not lander.flags.on_ground and gl.ping_count < 200:
+            gl.step()
+        self.assertEqual(icaos(aerospace.get_planes_on_ground('ABC')),
+                         ['LND0001'])
+        self.assertTrue(lander in aerospace.locked)
+        self.assertFalse(lander in aerospace.airborne)
+        # Removal
+        aerospace.remove_plane(lander)
+        self.assertFalse(aerospace.get_planes_on_ground('ABC'))
+        self.assertFalse(lander in aerospace.locked)
+        self.assertEqual(aerospace.count_planes_on_ground(), 0)
+        self.assertFalse(lander in aerospace.get_planes_by_origin('XXX'))
+        self.assertFalse(lander in aerospace.get_planes_by_destination('ABC'))
+
+    def testTagsDoNotOverlap(self):
+        '''
+        Tags are moved so as not to overlap icons or other tags.
+        '''
+        # Generous budget, so that the test doesn't depend on the machine
+        S.TAG_PLACEMENT_BUDGET = 1000
+        self.add_crowded_planes()
+        for tag in self.aerospace.tags:
+            tag.place()
+        self.assertTrue(self.count_tag_overlaps() > 0)
+        self.aerospace.place_tags()
+        self.assertEqual(self.count_tag_overlaps(), 0)
+        radar = self.aerospace.surface.get_rect()
+        for tag in self.aerospace.tags:
+            self.assertTrue(radar.contains(tag.rect))
+
+    def testTagsKeepPlacement(self):
+        '''
+        Tags keep their placement across pings, as long as it is free.
+        '''
+        S.TAG_PLACEMENT_BUDGET = 1000
+        self.add_crowded_planes()
+        lone = self.add_plane_on_radar('LON0001', 800, 800)
+        lone_tag = [t for t in self.aerospace.tags if t.plane is lone][0]
+        # The default placement would be free as well
+        lone_tag.angle, lone_tag.radius = 200, 80
+        self.aerospace.place_tags()
+        placements = self.get_tag_placements()
+        self.assertEqual(placements['LON0001'], (200, 80))
+        moved = [icao for icao, placement in placements.items()
+                 if placement != (Tag.default_angle, Tag.default_radius)]
+        self.assertEqual(len(moved), 4)
+        # Planes move by about a pixel in 5 pings
+        rects = [tag.rect for tag in self.aerospace.tags]
+        for i in range(5):
+            self.gamelogic.step()
+        self.assertNotEqual([tag.rect for tag in self.aerospace.tags], rects)
+        self.assertEqual(self.get_tag_placements(), placements)
+        self.assertEqual(self.count_tag_overlaps(), 0)
+
+    def testTagPlacementBudget(self):
+        '''
+        No placement is searched once the time budget is exhausted.
+        '''
+        S.TAG_PLACEMENT_BUDGET = 0
+        self.add_crowded_planes()
+        self.aerospace.place_tags()
+        self.assertTrue(self.count_tag_overlaps() > 0)
+        for tag in self.aerospace.tags:
+            self.assertEqual(tag.last_search, 0)
+            self.assertEqual((tag.angle, tag.radius),
+                             (Tag.default_angle, Tag.default_radius))
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
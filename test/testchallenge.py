@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8  -*-
+'''
+Testing suite for the challenge (creation of the aeroplanes).
+'''
+
+import random
+import unittest
+
+import pygame
+# PyGame initialisation must occur here as subsequent imports need pygame
+# set up an running.
+pygame.init()
+pygame.display.set_mode((64,48), 0, 32)
+
+import engine.aerospace
+import engine.challenge
+from engine.settings import settings as S
+
+
+__author__ = "Mac Ryan"
+__copyright__ = "Copyright 2011, Mac Ryan"
+__license__ = "GPL v3"
+#__version__ = "<dev>"
+#__date__ = "<unknown>"
+__maintainer__ = "Mac Ryan"
+__email__ = "quasipedia@gmail.com"
+__status__ = "Development"
+
+# Mock classes to allow creation of a simulation without the GUI.
+class MockStrips(object):
+    def remove_strip(self, *args, **kwargs):
+        pass
+class MockGameLogic(object):
+    def __init__(self):
+        self.sim_time = 0
+        self.fatalities = 0
+        self.replay = None
+        self.strips = MockStrips()
+    def score_event(self, *args, **kwargs):
+        pass
+    def say(self, *args, **kwargs):
+        pass
+    def add_plane(self, plane):
+        self.aerospace.add_plane(plane)
+
+
+class EntrySlotsTest(unittest.TestCase):
+
+    '''
+    Choice of the entry slots (gate and flight level) of the aeroplanes.
+    '''
+
+    def setUp(self):
+        random.seed(42)
+        gl = self.gamelogic = MockGameLogic()
+        surface = pygame.surface.Surface((1024, 1024))
+        self.aerospace = gl.aerospace = \
+                engine.aerospace.Aerospace(gl, surface)
+        self.challenge = engine.challenge.Challenge(gl)
+        scenario = self.challenge.scenario
+        for port in scenario.airports:
+            self.aerospace.add_airport(port)
+        for gate in scenario.gates:
+            self.aerospace.add_gate(gate)
+        # Only aeroplanes entering from gates
+        self.challenge.MAX_PORT_PLANES = 0
+        self.slots = []
+        for gate in scenario.gates:
+            levels = range(gate.top, gate.bottom-500, -500)
+            self.slots.extend((gate.name, l) for l in levels if l%1000 == 500)
+
+    def spawn(self):
+        '''
+        Make the challenge add aeroplanes, and return the new ones.
+        '''
+        before = set(self.aerospace.aeroplanes)
+        self.challenge.last_entry = - 10**6
+        self.challenge.update()
+        return [p for p in self.aerospace.aeroplanes if p not in before]
+
+    def get_free_slots(self):
+        '''
+        Return the slots at which no plane is within the clearances.
+        '''
+        gates = dict((g.name, g.location)
+                     for g in self.challenge.scenario.gates)
+        free = []
+        for name, level in self.slots:
+            x, y = gates[name]
+            if not [p for p in self.aerospace.airborne
+                    if abs(level - p.altitude) < S.VERTICAL_CLEARANCE and
+                    (x - p.position.x)**2 + (y - p.position.y)**2 <
+                    S.HORIZONTAL_CLEARANCE**2]:
+                free.append((name, level))
+        return free
+
+    def testBurst(self):
+        '''
+        Aeroplanes entering at the same time use different slots, until
+        there are no free slots left.
+        '''
+        self.challenge.PLANE_NUMBER_START = len(self.slots) + 2
+        planes = self.spawn()
+        self.assertEqual(sorted((p.origin, p.altitude) for p in planes),
+                         sorted(self.slots))
+        self.assertEqual(self.spawn(), [])
+
+    def testOccupiedSlots(self):
+        '''
+        Slots near an aeroplane are skipped, and the lowest free level of
+        a gate is chosen.
+        '''
+        self.challenge.PLANE_NUMBER_START = len(self.slots)
+        planes = self.spawn()
+        rnd = random.Random(1)
+        for i in range(30):
+            # Free some slots, and make some planes drift around theirs
+            for plane in rnd.sample(planes, rnd.randint(1, len(planes))):
+                self.aerospace.remove_plane(plane)
+                planes.remove(plane)
+            for plane in planes:
+                plane.position.x += rnd.uniform(-3500, 3500)
+                plane.position.y += rnd.uniform(-3500, 3500)
+                plane.position.z += rnd.uniform(-400, 400)
+            free = self.get_free_slots()
+            new = self.spawn()
+            if not free:
+                self.assertEqual(new, [])
+                continue
+            self.assertEqual(len(new), 1)
+            slot = new[0].origin, new[0].altitude
+            self.assertTrue(slot in free)
+            # The lowest free level of the gate
+            self.assertEqual(slot[1], min(l for n, l in free
+                                          if n == slot[0]))
+            planes.extend(new)
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8  -*-
+'''
+Testing suite for the background loader.
+'''
+
+import unittest
+import threading
+
+import pygame
+# The loader logs the duration of the phases, and the logger needs the
+# settings, which need pygame set up and running.
+pygame.init()
+pygame.display.set_mode((64,48), 0, 32)
+
+from engine.loader import BackgroundLoader
+
+__author__ = "Mac Ryan"
+__copyright__ = "Copyright 2011, Mac Ryan"
+__license__ = "GPL v3"
+#__version__ = "<dev>"
+#__date__ = "<unknown>"
+__maintainer__ = "Mac Ryan"
+__email__ = "quasipedia@gmail.com"
+__status__ = "Development"
+
+
+class BackgroundLoaderTest(unittest.TestCase):
+
+    '''
+    Progress, errors and cancellation of the loading.
+    '''
+
+    def setUp(self):
+        self.loaded = []
+        self.waiting = threading.Event()
+        self.gate = threading.Event()
+
+    def steps(self, fail=False):
+        yield 0.0, 'first'
+        self.loaded.append('first')
+        self.waiting.set()
+        self.gate.wait()
+        yield 0.5, 'second'
+        if fail:
+            raise ValueError('broken')
+        self.loaded.append('second')
+
+    def testProgress(self):
+        loader = BackgroundLoader(self.steps())
+        loader.start()
+        self.assertFalse(loader.finished())
+        self.gate.set()
+        loader.join()
+        self.assertTrue(loader.finished())
+        self.assertEqual(loader.progress, 1.0)
+        self.assertEqual(loader.phase, 'second')
+        self.assertEqual(self.loaded, ['first', 'second'])
+
+    def testError(self):
+        loader = BackgroundLoader(self.steps(fail=True))
+        loader.start()
+        self.gate.set()
+        loader.join()
+        self.assertRaises(ValueError, loader.finished)
+
+    def testCancel(self):
+        loader = BackgroundLoader(self.steps())
+        loader.start()
+        self.waiting.wait()
+        loader.cancelled = True
+        self.gate.set()
+        loader.join()
+        self.assertTrue(loader.finished())
+        self.assertEqual(self.loaded, ['first'])
+        self.assertEqual(loader.phase, 'first')
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
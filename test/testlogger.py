@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8  -*-
+'''
+Testing suite for the background writing of the log records.
+'''
+
+import logging
+import unittest
+from collections import deque
+
+import pygame
+# The settings need pygame set up and running.
+pygame.init()
+pygame.display.set_mode((64,48), 0, 32)
+
+from engine.logger import QueueHandler, LogWriter
+from lib.euclid import Vector3
+
+__author__ = "Mac Ryan"
+__copyright__ = "Copyright 2011, Mac Ryan"
+__license__ = "GPL v3"
+#__version__ = "<dev>"
+#__date__ = "<unknown>"
+__maintainer__ = "Mac Ryan"
+__email__ = "quasipedia@gmail.com"
+__status__ = "Development"
+
+
+class MockHandler(logging.Handler):
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.messages = []
+        self.closed = False
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+    def close(self):
+        self.closed = True
+        logging.Handler.close(self)
+
+
+class QueueHandlerTest(unittest.TestCase):
+
+    '''
+    Records handed over to the writer thread.
+    '''
+
+    def setUp(self):
+        self.queue = deque()
+        self.logger = logging.Logger('test-queue')
+        self.logger.addHandler(QueueHandler(self.queue))
+
+    def testMergeArgs(self):
+        '''
+        prepare - message and arguments are merged in the calling thread
+        '''
+        position = Vector3(1, 2, 3)
+        self.logger.warning('Position %s, ping %d', position, 7)
+        position.x = 100
+        record = self.queue.popleft()
+        self.assertEqual(record.msg, 'Position Vector3(1.00, 2.00, 3.00), '
+                                     'ping 7')
+        self.assertEqual(record.args, None)
+        self.assertEqual(record.getMessage(), record.msg)
+
+    def testExceptionInfo(self):
+        '''
+        prepare - the traceback is formatted in the calling thread
+        '''
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            self.logger.exception('Failed')
+        record = self.queue.popleft()
+        self.assertEqual(record.exc_info, None)
+        self.assertTrue('ValueError: boom' in record.exc_text)
+        self.assertFalse(self.queue)
+
+
+class LogWriterTest(unittest.TestCase):
+
+    '''
+    Writing of the queued records.
+    '''
+
+    def testFlushOnStop(self):
+        '''
+        stop - pending records are written before the thread terminates
+        '''
+        queue = deque()
+        handler = MockHandler()
+        logger = logging.Logger('test-writer')
+        logger.addHandler(QueueHandler(queue))
+        for i in range(500):
+            logger.warning('Record %d', i)
+        writer = LogWriter(queue, handler)
+        writer.start()
+        writer.stop()
+        self.assertFalse(writer.is_alive())
+        self.assertEqual(handler.messages,
+                         ['Record %d' % i for i in range(500)])
+        self.assertTrue(handler.closed)
+
+    def testDrain(self):
+        '''
+        drain - queued records are written in order
+        '''
+        queue = deque()
+        handler = MockHandler()
+        logger = logging.Logger('test-drain')
+        logger.addHandler(QueueHandler(queue))
+        writer = LogWriter(queue, handler)
+        for i in range(3):
+            logger.warning('Record %d', i)
+        writer.drain()
+        logger.warning('Record %d', 3)
+        writer.drain()
+        self.assertEqual(handler.messages, ['Record %d' % i for i in range(4)])
+        self.assertFalse(queue)
+        self.assertFalse(handler.closed)
+
+    def testStopNotStarted(self):
+        '''
+        stop - does nothing if the thread is not running
+        '''
+        queue = deque()
+        writer = LogWriter(queue, MockHandler())
+        writer.stop()
+        self.assertFalse(queue)
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# -*- coding: utf-8  -*-
+'''
+Testing suite for the periodic export of the metrics.
+'''
+
+import os
+import json
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import pygame
+# The settings need pygame set up and running.
+pygame.init()
+pygame.display.set_mode((64,48), 0, 32)
+
+from engine.metrics import MetricsExporter, QUEUE_SIZE
+
+__author__ = "Mac Ryan"
+__copyright__ = "Copyright 2011, Mac Ryan"
+__license__ = "GPL v3"
+#__version__ = "<dev>"
+#__date__ = "<unknown>"
+__maintainer__ = "Mac Ryan"
+__email__ = "quasipedia@gmail.com"
+__status__ = "Development"
+
+# Mock classes with the attributes sampled by the exporter.
+class MockRunwaysManager(object):
+    def get_state(self):
+        return {'ABC' : {'36' : 'LND0001'}, 'DEF' : {}}
+class MockAerospace(object):
+    def __init__(self):
+        self.runways_manager = MockRunwaysManager()
+        self.tcas_data = {}
+    def count_planes_airborne(self):
+        return 7
+    def count_planes_on_ground(self):
+        return 2
+class MockGameLogic(object):
+    def __init__(self):
+        self.aerospace = MockAerospace()
+        self.score = 0
+        self.ping_count = 0
+        self.sim_time = 0
+
+
+class MetricsTest(unittest.TestCase):
+
+    '''
+    Samples collected by the exporter and written by the writer thread.
+    '''
+
+    FIELDS = ['dropped', 'frame_ms', 'period', 'ping', 'ping_ms',
+              'planes_airborne', 'planes_on_ground', 'rss_kb', 'runways',
+              'runways_busy', 'score', 'score_per_sim_minute', 'sim_time',
+              'tcas_pairs', 'time']
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.target = os.path.join(self.directory, 'test.metrics.jsonl')
+        self.gamelogic = MockGameLogic()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read_samples(self):
+        with open(self.target) as file_:
+            return [json.loads(line) for line in file_]
+
+    def testPeriods(self):
+        '''
+        sample - fields and percentiles of the JSON lines
+        '''
+        gl = self.gamelogic
+        exporter = MetricsExporter(gl, self.target, period=3600)
+        for period in range(3):
+            for ms in range(1, 101):
+                exporter.frame(ms * (period + 1))
+            for i in range(10):
+                exporter.ping(0.002 * (i + 1))
+            gl.ping_count += 10
+            gl.sim_time += 30
+            gl.score += 15 * (period + 1)
+            gl.aerospace.tcas_data = {'A' : ['B'], 'B' : ['A']}
+            exporter.sample()
+        exporter.close()
+        samples = self.read_samples()
+        self.assertEqual(len(samples), 4)
+        for sample in samples:
+            self.assertEqual(sorted(sample), self.FIELDS)
+            self.assertEqual(sample['planes_airborne'], 7)
+            self.assertEqual(sample['planes_on_ground'], 2)
+            self.assertEqual(sample['runways_busy'], 1)
+            self.assertEqual(sample['dropped'], 0)
+            self.assertTrue(sample['rss_kb'] > 0)
+        first, second, third, last = samples
+        self.assertEqual(first['frame_ms'], dict(n=100, mean=50.5, p50=50.5,
+                                                 p90=90.1, p99=99.01,
+                                                 max=100))
+        self.assertEqual(third['frame_ms'], dict(n=100, mean=151.5,
+                                                 p50=151.5, p90=270.3,
+                                                 p99=297.03, max=300))
+        self.assertEqual(first['ping_ms'], dict(n=10, mean=11, p50=11,
+                                                p90=18.2, p99=19.82, max=20))
+        self.assertEqual([s['ping'] for s in samples], [10, 20, 30, 30])
+        self.assertEqual([s['score'] for s in samples], [15, 45, 90, 90])
+        self.assertEqual([s['score_per_sim_minute'] for s in samples],
+                         [30, 60, 90, 0])
+        self.assertEqual(second['tcas_pairs'], 1)
+        # Nothing happened between the last sample and the end of the match
+        self.assertEqual(last['frame_ms'], None)
+        self.assertEqual(last['ping_ms'], None)
+
+    def testFramePeriod(self):
+        '''
+        frame - a sample is emitted once the period has elapsed
+        '''
+        exporter = MetricsExporter(self.gamelogic, self.target, period=0)
+        for ms in (10, 20, 30):
+            exporter.frame(ms)
+        exporter.close()
+        samples = self.read_samples()
+        self.assertEqual([s['frame_ms'] and s['frame_ms']['max']
+                          for s in samples], [10, 20, 30, None])
+
+    def testDropWhenFull(self):
+        '''
+        sample - samples are dropped, not queued, while the writer is stuck
+        '''
+        exporter = MetricsExporter(self.gamelogic, self.target, period=3600)
+        taken = threading.Event()
+        release = threading.Event()
+        write = exporter.writer.write
+        def stuck_write(sample):
+            taken.set()
+            release.wait()
+            write(sample)
+        exporter.writer.write = stuck_write
+        exporter.sample()
+        self.assertTrue(taken.wait(5))
+        # With the writer stuck on the first sample, the queue fills up
+        extra = 10
+        sampler = threading.Thread(target=lambda: [exporter.sample() for i in
+                                                   range(QUEUE_SIZE + extra)])
+        sampler.start()
+        sampler.join(5)
+        self.assertFalse(sampler.is_alive())
+        self.assertEqual(exporter.dropped, extra)
+        release.set()
+        # Let the writer catch up, so that the last sample is not dropped
+        for i in range(500):
+            if exporter.writer.queue.empty():
+                break
+            time.sleep(0.01)
+        exporter.close()
+        samples = self.read_samples()
+        self.assertEqual(len(samples), 1 + QUEUE_SIZE + 1)
+        self.assertEqual(samples[-1]['dropped'], extra)
+
+    def testWriteError(self):
+        '''
+        write - an unwritable target loses the sample but not the writer
+        '''
+        target = os.path.join(self.directory, 'missing', 'metrics.jsonl')
+        exporter = MetricsExporter(self.gamelogic, target, period=3600)
+        exporter.sample()
+        exporter.close()
+        self.assertFalse(exporter.writer.is_alive())
+        self.assertFalse(os.path.exists(target))
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -37,6 +37,8 @@ class MockAerospace(object):
         self.airports = {}
         for icao in ('ABC', 'XYZ', 'NNO'):
             self.airports[icao] = MockAirport()
+    def reindex_plane(self, plane):
+        pass
 
 
 class NavigatorTest(unittest.TestCase):
@@ -38,6 +38,8 @@ class MockAerospace(object):
         self.airports = []
     def get_plane_by_icao(self, icao):
         return self.plane if icao == self.plane.icao else None
+    def reindex_plane(self, plane):
+        pass
 class MockProcessor(object):
     def xxx(self, *args, **kwargs):
         self.last = [args, kwargs]
@@ -33,6 +33,8 @@ class MockAerospace(object):
         self.tcas_data = {}
         self.gamelogic = MockGameLogic()
         self.airports = []
+    def reindex_plane(self, plane):
+        pass
 
 
 class CheckerTest(unittest.TestCase):
@@ -224,6 +226,7 @@ class MiscellaneousTest(unittest.TestCase):
                    ]
         # This tests if this test is complete, by verifying there is at least
         # a test command for each existing command
+        engine.commander.initialise()
         self.assertEqual(set(engine.commander.PLANE_COMMANDS.keys()),
                          set([a for a,b,c in TO_TEST]))
         for command in TO_TEST:
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8  -*-
+'''
+Testing suite for the profiler of the main loop.
+'''
+
+import unittest
+
+import pygame
+# The settings need pygame set up and running.
+pygame.init()
+pygame.display.set_mode((64,48), 0, 32)
+
+import engine.profiler
+from engine.profiler import Profiler
+
+__author__ = "Mac Ryan"
+__copyright__ = "Copyright 2011, Mac Ryan"
+__license__ = "GPL v3"
+#__version__ = "<dev>"
+#__date__ = "<unknown>"
+__maintainer__ = "Mac Ryan"
+__email__ = "quasipedia@gmail.com"
+__status__ = "Development"
+
+# Mock clock, advanced by hand by the tests.
+class MockClock(object):
+    def __init__(self):
+        self.now = 100.0
+    def __call__(self):
+        return self.now
+
+
+class ProfilerTest(unittest.TestCase):
+
+    '''
+    Aggregation of the timings and counters of the frames.
+    '''
+
+    def setUp(self):
+        self.clock = MockClock()
+        self.time = engine.profiler.time
+        engine.profiler.time = self.clock
+        self.profiler = Profiler()
+
+    def tearDown(self):
+        engine.profiler.time = self.time
+
+    def play_frame(self, milliseconds, surfaces=0):
+        '''
+        Time a frame where each of ``milliseconds`` is spent in the section
+        with the same index in ``SECTIONS``, then end it.
+        '''
+        t = self.clock()
+        for (key, label), ms in zip(Profiler.SECTIONS, milliseconds):
+            self.clock.now += ms / 1000.0
+            t = self.profiler.lap(key, t)
+        self.profiler.count_surfaces(surfaces)
+        self.profiler.end_frame()
+
+    def get_report(self):
+        return dict(self.profiler.get_report())
+
+    def testLap(self):
+        '''
+        lap - time is added to the section and the current time returned
+        '''
+        start = self.clock()
+        self.clock.now += 0.002
+        t = self.profiler.lap('tcas', start)
+        self.assertEqual(t, self.clock.now)
+        self.clock.now += 0.003
+        self.profiler.lap('physics', t)
+        self.clock.now += 0.001
+        self.profiler.lap('tcas', self.clock.now - 0.001)
+        self.assertAlmostEqual(self.profiler.times['tcas'], 0.003)
+        self.assertAlmostEqual(self.profiler.times['physics'], 0.003)
+        self.assertEqual(self.profiler.times['draw'], 0.0)
+
+    def testEndFrame(self):
+        '''
+        end_frame - average and maximum time over the frames
+        '''
+        self.play_frame([1, 2, 3], surfaces=4)
+        self.play_frame([3, 4, 0], surfaces=2)
+        self.assertEqual(len(self.profiler.frames), 2)
+        self.assertEqual(self.profiler.times['challenge'], 0.0)
+        self.assertEqual(self.profiler.surfaces, 0)
+        report = self.get_report()
+        self.assertEqual(report['Challenge'], '  2.00 ms (max   3.00)')
+        self.assertEqual(report['Strips'], '  3.00 ms (max   4.00)')
+        self.assertEqual(report['Aerospace physics'],
+                         '  1.50 ms (max   3.00)')
+        self.assertEqual(report['Flip'], '  0.00 ms (max   0.00)')
+        self.assertEqual(report['Total'], '  6.50 ms')
+        self.assertEqual(report['Surfaces/frame'], '   3.0')
+
+    def testWindow(self):
+        '''
+        end_frame - only the last ``WINDOW`` frames are kept
+        '''
+        for i in range(Profiler.WINDOW):
+            self.play_frame([10])
+        for i in range(Profiler.WINDOW):
+            self.play_frame([1])
+        self.assertEqual(len(self.profiler.frames), Profiler.WINDOW)
+        self.assertEqual(self.get_report()['Challenge'],
+                         '  1.00 ms (max   1.00)')
+
+    def testCounters(self):
+        '''
+        set_counters - values are reported, unset counters are zero
+        '''
+        self.profiler.set_counters(planes=12, tcas_pairs=3)
+        self.play_frame([1])
+        report = self.get_report()
+        self.assertEqual(report['Planes'], '  12')
+        self.assertEqual(report['TCAS pairs'], '   3')
+        self.assertEqual(report['Sprites'], '   0')
+
+    def testUnknownCounters(self):
+        '''
+        set_counters - only the keys in COUNTERS are accepted
+        '''
+        for key in ('plane', 'lap', 'end_frame', 'surfaces', 'frames'):
+            self.assertRaises(BaseException, self.profiler.set_counters,
+                              **{key : 1})
+        self.assertTrue(callable(self.profiler.lap))
+        self.assertTrue(callable(self.profiler.end_frame))
+        self.assertFalse(hasattr(self.profiler, 'plane'))
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
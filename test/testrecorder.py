@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# -*- coding: utf-8  -*-
+'''
+Testing suite for the flight data recorder.
+'''
+
+import shutil
+import tempfile
+import unittest
+
+import numpy
+import pygame
+# The settings need pygame set up and running.
+pygame.init()
+pygame.display.set_mode((64,48), 0, 32)
+
+from engine.recorder import FlightDataRecorder, load_recording
+from lib.euclid import Vector3
+
+__author__ = "Mac Ryan"
+__copyright__ = "Copyright 2011, Mac Ryan"
+__license__ = "GPL v3"
+#__version__ = "<dev>"
+#__date__ = "<unknown>"
+__maintainer__ = "Mac Ryan"
+__email__ = "quasipedia@gmail.com"
+__status__ = "Development"
+
+# Mock classes with the attributes read by the recorder.
+class MockFlags(object):
+    def __init__(self):
+        self.collision = False
+        self.priority = False
+        self.locked = False
+        self.busy = False
+        self.on_ground = False
+        self.fuel_emergency = False
+class MockTcas(object):
+    def __init__(self):
+        self.state = False
+class MockTargetConf(object):
+    def __init__(self):
+        self.heading = None
+        self.altitude = None
+        self.speed = None
+class MockPilot(object):
+    def __init__(self):
+        self.target_conf = MockTargetConf()
+        self.status = {'procedure' : None, 'haste' : 'normal'}
+class Land(object):
+    def __init__(self):
+        self.phase = 3
+class MockPlane(object):
+    def __init__(self, icao, n):
+        self.icao = icao
+        self.position = Vector3(1000.0 * n, 2000.5 * n, 3000.25)
+        self.velocity = Vector3(-n, 0.5, 0)
+        self.fuel = 100.0 + n
+        self.fuel_delta = 10.0 - n
+        self.flags = MockFlags()
+        self.tcas = MockTcas()
+        self.pilot = MockPilot()
+
+
+class RecorderTest(unittest.TestCase):
+
+    '''
+    Recording of the aeroplanes state and loading of the recorded segments.
+    '''
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def get_planes(self):
+        '''
+        Return three planes, each with some state set.
+        '''
+        planes = [MockPlane('ABC1234', 1), MockPlane('DEF5678', 2),
+                  MockPlane('GHI9012', 3)]
+        tc = planes[0].pilot.target_conf
+        tc.heading, tc.altitude, tc.speed = 90, 5000, 200
+        planes[1].flags.priority = True
+        planes[1].flags.fuel_emergency = True
+        planes[1].tcas.state = True
+        planes[2].pilot.status['procedure'] = Land()
+        planes[2].pilot.status['haste'] = 'expedite'
+        return planes
+
+    def testRoundTrip(self):
+        '''
+        load_recording - the columns match the recorded state
+        '''
+        planes = self.get_planes()
+        fdr = FlightDataRecorder(self.directory, flush_pings=2)
+        fdr.record(planes)
+        for plane in planes:
+            plane.position.z -= 100
+        fdr.record(planes)
+        fdr.record(planes[1:])
+        fdr.close()
+        data = load_recording(fdr.prefix, self.directory)
+        self.assertEqual(list(data['ping']), [0, 0, 0, 1, 1, 1, 2, 2])
+        self.assertEqual(list(data['icao']),
+                         ['ABC1234', 'DEF5678', 'GHI9012'] * 2 +
+                         ['DEF5678', 'GHI9012'])
+        for row, i in enumerate([0, 1, 2, 0, 1, 2, 1, 2]):
+            plane = planes[i]
+            self.assertEqual(data['x'][row], plane.position.x)
+            self.assertEqual(data['y'][row], plane.position.y)
+            self.assertEqual(data['vx'][row], plane.velocity.x)
+            self.assertEqual(data['vy'][row], plane.velocity.y)
+            self.assertEqual(data['fuel'][row], plane.fuel)
+            self.assertEqual(data['fuel_delta'][row], plane.fuel_delta)
+        self.assertEqual(list(data['z']), [3000.25] * 3 + [2900.25] * 5)
+        self.assertEqual(list(data['t_heading'][[0, 3]]), [90, 90])
+        self.assertEqual(list(data['t_altitude'][[0, 3]]), [5000, 5000])
+        self.assertEqual(list(data['t_speed'][[0, 3]]), [200, 200])
+        for name in ('t_heading', 't_altitude', 't_speed'):
+            self.assertTrue(numpy.isnan(data[name][[1, 2, 4, 5, 6, 7]]).all())
+        flags = FlightDataRecorder.FLAGS
+        emergency = sum(1 << flags.index(name) for name in
+                        ('priority', 'fuel_emergency', 'tcas'))
+        expedite = 1 << flags.index('expedite')
+        self.assertEqual(list(data['flags']), [0, emergency, expedite] * 2 +
+                                              [emergency, expedite])
+        land = FlightDataRecorder.PROCEDURES.index('Land')
+        self.assertEqual(list(data['procedure']), [0, 0, land] * 2 +
+                                                  [0, land])
+        self.assertEqual(list(data['phase']), [0, 0, 3] * 2 + [0, 3])
+
+    def testSegments(self):
+        '''
+        flush - each segment only holds the rows recorded since the last one
+        '''
+        planes = self.get_planes()
+        fdr = FlightDataRecorder(self.directory, flush_pings=2)
+        for ping in range(5):
+            fdr.record(planes)
+        self.assertEqual(fdr.segment, 2)
+        self.assertEqual(fdr.rows, 3)
+        fdr.close()
+        self.assertEqual(fdr.segment, 3)
+        data = load_recording(fdr.prefix, self.directory)
+        self.assertEqual(list(data['ping']), sorted(range(5) * 3))
+
+    def testGrowth(self):
+        '''
+        record - the buffers grow past their initial capacity
+        '''
+        planes = [MockPlane('P%06d' % n, n) for n in range(100)]
+        fdr = FlightDataRecorder(self.directory, flush_pings=0)
+        for ping in range(50):
+            fdr.record(planes)
+        self.assertTrue(fdr.capacity > FlightDataRecorder.INITIAL_CAPACITY)
+        self.assertEqual(fdr.rows, 5000)
+        fdr.close()
+        data = load_recording(fdr.prefix, self.directory)
+        self.assertEqual(len(data['x']), 5000)
+        self.assertEqual(list(data['x'][-100:]),
+                         [p.position.x for p in planes])
+        self.assertEqual(list(data['icao'][-100:]),
+                         [p.icao for p in planes])
+
+    def testNoRecording(self):
+        '''
+        load_recording - raise for an unknown prefix
+        '''
+        self.assertRaises(IOError, load_recording, 'nothing', self.directory)
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8  -*-
+'''
+Testing suite for the recording and playing back of replays.
+'''
+
+import os
+import imp
+import shutil
+import tempfile
+import unittest
+
+import pygame
+# The GUI of a match is sized on the display when the settings are loaded: it
+# must be as large as the one used by ``utils/run-replay.py``, so the settings
+# are loaded right away, before other test modules shrink the display.
+pygame.init()
+pygame.display.set_mode((1280, 720), 0, 32)
+
+import engine.replay
+import engine.gamelogic
+from engine.settings import settings as S
+S.initialise()
+
+__author__ = "Mac Ryan"
+__copyright__ = "Copyright 2011, Mac Ryan"
+__license__ = "GPL v3"
+#__version__ = "<dev>"
+#__date__ = "<unknown>"
+__maintainer__ = "Mac Ryan"
+__email__ = "quasipedia@gmail.com"
+__status__ = "Development"
+
+RUN_REPLAY = os.path.join(os.path.dirname(os.path.dirname(
+                          os.path.abspath(__file__))), 'utils', 'run-replay.py')
+
+
+class ReplayTest(unittest.TestCase):
+
+    '''
+    A match played back from its replay must unfold exactly like the original.
+    '''
+
+    SEED = 42
+    PINGS = 150
+    # Pings at which a command is issued, and the command (without callsign)
+    COMMANDS = [(20, 'H135'), (45, 'A20 S500'), (60, 'HEAD +45')]
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.settings = S.FDR_ENABLED, S.METRICS_ENABLED
+        S.FDR_ENABLED = S.METRICS_ENABLED = False
+        self.run_replay = imp.load_source('run_replay', RUN_REPLAY)
+
+    def tearDown(self):
+        S.FDR_ENABLED, S.METRICS_ENABLED = self.settings
+        shutil.rmtree(self.directory)
+
+    def play_match(self):
+        '''
+        Play a match issuing ``COMMANDS`` to the first flying aeroplane and
+        return the gamelogic and the name of its replay file.
+        '''
+        screen = pygame.display.set_mode(S.WINDOW_SIZE, 0, 32)
+        gl = engine.gamelogic.GameLogic(screen, seed=self.SEED,
+                                        record_replay=False)
+        gl.replay = engine.replay.ReplayWriter(gl.scenario_name, gl.seed,
+                                               self.directory)
+        commands = dict(self.COMMANDS)
+        while gl.ping_count < self.PINGS:
+            if gl.ping_count in commands:
+                flying = [p for p in gl.aerospace.aeroplanes
+                          if not p.flags.on_ground]
+                self.assertTrue(flying)
+                gl.cli.chars = list('%s %s' % (flying[0].icao,
+                                               commands[gl.ping_count]))
+                gl.cli.do_parsing()
+            gl.step()
+        gl.shutdown()
+        return gl, gl.replay.fname
+
+    def get_state(self, gl):
+        '''
+        Return the state of the aeroplanes in the aerospace.
+        '''
+        return sorted((p.icao, tuple(p.position), tuple(p.velocity))
+                      for p in gl.aerospace.aeroplanes)
+
+    def testRecording(self):
+        '''
+        ReplayWriter - the commands and spawns are in the replay file
+        '''
+        gl, fname = self.play_match()
+        header, records = engine.replay.load_replay(fname)
+        self.assertEqual(header['seed'], self.SEED)
+        self.assertEqual(header['scenario'], gl.scenario_name)
+        commands = [(ping, payload.split(' ', 1)[1]) for ping, kind, payload
+                    in records if kind == engine.replay.COMMAND]
+        self.assertEqual(commands, self.COMMANDS)
+        spawns = [r for r in records if r[1] == engine.replay.SPAWN]
+        self.assertEqual(len(spawns), gl.challenge.plane_counter)
+
+    def testDeterminism(self):
+        '''
+        play_replay - the replayed match matches the original one
+        '''
+        original, fname = self.play_match()
+        header, records = engine.replay.load_replay(fname)
+        extra_pings = self.PINGS - 1 - records[-1][0]
+        replayed, divergences = self.run_replay.play_replay(fname,
+                                                            extra_pings)
+        self.assertEqual(divergences, [])
+        self.assertEqual(replayed.ping_count, original.ping_count)
+        self.assertEqual(replayed.score, original.score)
+        self.assertEqual(replayed.event_counts, original.event_counts)
+        self.assertEqual(replayed.challenge.plane_counter,
+                         original.challenge.plane_counter)
+        self.assertEqual(self.get_state(replayed), self.get_state(original))
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8  -*-
+'''
+Testing suite for the access to the data files and the resource pack.
+'''
+
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+import engine.resources
+from engine.resources import ResourceManager, build_pack
+
+__author__ = "Mac Ryan"
+__copyright__ = "Copyright 2011, Mac Ryan"
+__license__ = "GPL v3"
+#__version__ = "<dev>"
+#__date__ = "<unknown>"
+__maintainer__ = "Mac Ryan"
+__email__ = "quasipedia@gmail.com"
+__status__ = "Development"
+
+
+class ResourcesTest(unittest.TestCase):
+
+    '''
+    A pack of the source tree must give back what the data files hold.
+    '''
+
+    DIRECTORIES = ['engine/data', 'entities/data',
+                   'entities/data/aeroplanes', 'entities/data/airports',
+                   'entities/data/scenarios', 'sprites/data']
+
+    @classmethod
+    def setUpClass(cls):
+        # Packing parses all the YAML files: it is done only once
+        cls.directory = tempfile.mkdtemp()
+        cls.fname = os.path.join(cls.directory, 'test.pack')
+        cls.count = build_pack(cls.fname)
+        # Nothing to be found in the (empty) root: all reads hit the pack
+        cls.empty = os.path.join(cls.directory, 'empty')
+        os.mkdir(cls.empty)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    def setUp(self):
+        self.loose = ResourceManager(pack=None)
+        self.packed = ResourceManager(root=self.empty, pack=self.fname)
+
+    def get_packed_names(self):
+        '''
+        Return the names of all the files that should be in the pack.
+        '''
+        names = []
+        for directory in self.DIRECTORIES:
+            path = self.loose.get_path(directory)
+            names.extend('%s/%s' % (directory, fname) for fname in
+                         sorted(os.listdir(path))
+                         if os.path.isfile(os.path.join(path, fname)) and
+                         os.path.splitext(fname)[1] not in
+                         engine.resources.PACK_EXCLUDED_EXT)
+        return names
+
+    def testListdir(self):
+        '''
+        listdir - the pack lists the same files as the source tree
+        '''
+        names = self.get_packed_names()
+        self.assertEqual(self.count, len(names))
+        for directory in self.DIRECTORIES:
+            expected = [n.rsplit('/', 1)[1] for n in names
+                        if n.rsplit('/', 1)[0] == directory]
+            self.assertTrue(expected)
+            self.assertEqual(self.packed.listdir(directory), expected)
+            self.assertEqual(self.packed.listdir(directory + '/'), expected)
+        # The template user directory is copied as it is, not packed
+        self.assertRaises(OSError, self.packed.listdir,
+                          'engine/data/template_user_dir')
+
+    def testGetBytes(self):
+        '''
+        get_bytes - raw files in the pack match the files on disk
+        '''
+        raw = [n for n in self.get_packed_names() if not n.endswith('.yml')]
+        self.assertTrue(raw)
+        for name in raw:
+            self.assertEqual(self.packed.get_bytes(name),
+                             self.loose.get_bytes(name))
+
+    def testGetYaml(self):
+        '''
+        get_yaml - parsed YAML files in the pack match the files on disk
+        '''
+        names = [n for n in self.get_packed_names() if n.endswith('.yml')]
+        self.assertTrue(names)
+        for name in names:
+            self.assertEqual(self.packed.get_yaml(name),
+                             self.loose.get_yaml(name))
+        # Each call returns a fresh copy
+        data = self.packed.get_yaml(names[0])
+        data['changed'] = True
+        self.assertFalse('changed' in self.packed.get_yaml(names[0]))
+
+    def testMissingPack(self):
+        '''
+        ResourceManager - raise for a pack that does not exist
+        '''
+        fname = os.path.join(self.directory, 'missing.pack')
+        resources = ResourceManager(pack=fname)
+        with self.assertRaises(BaseException) as context:
+            resources.get_yaml('engine/data/hardsettings.yml')
+        self.assertTrue('not found' in str(context.exception))
+
+    def testBadMagic(self):
+        '''
+        ResourceManager - raise for a file that is not a pack
+        '''
+        fname = os.path.join(self.directory, 'bad.pack')
+        shutil.copy(self.fname, fname)
+        with open(fname, 'r+b') as file_:
+            header = file_.read(struct.calcsize(engine.resources.PACK_HEADER))
+            magic, length = struct.unpack(engine.resources.PACK_HEADER,
+                                          header)
+            file_.seek(0)
+            file_.write(struct.pack(engine.resources.PACK_HEADER,
+                                    'NOTAPACK', length))
+        resources = ResourceManager(pack=fname)
+        with self.assertRaises(BaseException) as context:
+            resources.get_bytes('sprites/data/sprite-jet.png')
+        self.assertTrue('not a resource pack' in str(context.exception))
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
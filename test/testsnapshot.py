@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+# -*- coding: utf-8  -*-
+'''
+Testing suite for the snapshot/restore functionality.
+'''
+
+import unittest
+
+import pygame
+# PyGame initialisation must occur here as subsequent imports need pygame
+# set up an running.
+pygame.init()
+pygame.display.set_mode((64,48), 0, 32)
+
+import entities.aeroplane
+import entities.airport
+import engine.aerospace
+import engine.snapshot
+import lib.utils as U
+from lib.euclid import Vector3
+
+
+__author__ = "Mac Ryan"
+__copyright__ = "Copyright 2011, Mac Ryan"
+__license__ = "GPL v3"
+#__version__ = "<dev>"
+#__date__ = "<unknown>"
+__maintainer__ = "Mac Ryan"
+__email__ = "quasipedia@gmail.com"
+__status__ = "Development"
+
+# Mock classes to allow creation of a simulation without the GUI.
+class MockStrips(object):
+    def add(self, *args, **kwargs):
+        pass
+    def remove_strip(self, *args, **kwargs):
+        pass
+class MockChallenge(object):
+    def __init__(self):
+        self.scenario_name = 'test'
+        self.counter = 0
+    def get_state(self):
+        return dict(counter=self.counter)
+    def set_state(self, state):
+        self.counter = state['counter']
+class MockGameLogic(object):
+    def __init__(self):
+        self.ping_count = 0
+        self.score = 0
+        self.fatalities = 0
+        self.event_counts = {}
+        self.strips = MockStrips()
+        self.challenge = MockChallenge()
+    def score_event(self, event, plane=None, multiplier=None):
+        self.event_counts[event[0]] = self.event_counts.get(event[0], 0) + 1
+        self.score += event[1] * (multiplier or 1)
+    def say(self, *args, **kwargs):
+        pass
+    def remove_plane(self, plane, event):
+        self.aerospace.remove_plane(plane)
+    def _register_plane(self, plane):
+        self.aerospace.add_plane(plane)
+    def step(self):
+        self.aerospace.update(1)
+        self.challenge.counter += 1
+        self.ping_count += 1
+
+
+class SnapshotTest(unittest.TestCase):
+
+    '''
+    Verify that a simulation restored from a snapshot evolves exactly like the
+    original one.
+    '''
+
+    def get_gamelogic(self):
+        '''
+        Return a new gamelogic with an airport and no planes.
+        '''
+        strip_kwargs = {'orientation' : 0,
+                        'length'      : 4000,
+                        'width'       : 60,
+                        'centre_pos'  : [0,0]}
+        port_kwargs = {'location' : (20000, 20000),
+                       'iata' : 'ABC',
+                       'name' : 'Test airport',
+                       'geolocation' : ['',''],
+                       'elevation' : 0}
+        # The radar surface must be large enough for the plane tags to fit.
+        surface = pygame.surface.Surface((1024, 1024))
+        gamelogic = MockGameLogic()
+        aerospace = engine.aerospace.Aerospace(gamelogic, surface)
+        gamelogic.aerospace = aerospace
+        strip = entities.airport.AsphaltStrip(**strip_kwargs)
+        aerospace.add_airport(entities.airport.airport(strips=[strip],
+                                                       **port_kwargs))
+        return gamelogic
+
+    def get_plane(self, gamelogic, icao, origin, position, velocity):
+        '''
+        Add to the aerospace a plane with given origin, position and velocity.
+        '''
+        plane_kwargs = {'icao' : icao,
+                        'callsign' : 'CALLME PLANE',
+                        'model' : 'A380',
+                        'category' : 'jet',
+                        'origin' : origin,
+                        'destination' : 'ABC',
+                        'fuel_efficiency' : 0.001,
+                        'max_altitude' : 10000,
+                        'climb_rate_limits' : [-30, 15],
+                        'climb_rate_accels' : [-20, 10],
+                        'max_speed' : 800 / 3.6,
+                        'ground_accels' : [-4, 6],
+                        'landing_speed' : 150 / 3.6,
+                        'max_g' : 2,
+                        'position' : position,
+                        'velocity' : velocity,
+                        'fuel' : 500}
+        plane = entities.aeroplane.Aeroplane(gamelogic.aerospace,
+                                             **plane_kwargs)
+        gamelogic._register_plane(plane)
+        return plane
+
+    def get_state(self, gamelogic):
+        '''
+        Return the evolving values of the simulation.
+        '''
+        return (gamelogic.ping_count, gamelogic.score,
+                sorted(gamelogic.event_counts.items()),
+                [(p.icao, p.position.xyz, p.velocity.xyz, p.fuel,
+                  p.pilot.target_conf.heading, p.pilot.target_conf.altitude,
+                  p.pilot.target_conf.speed, p.flags.get_state(),
+                  getattr(p.pilot.status['procedure'], 'phase', None))
+                 for p in gamelogic.aerospace.aeroplanes])
+
+    def setUp(self):
+        gl = self.gamelogic = self.get_gamelogic()
+        self.lander = self.get_plane(gl, 'LND0001', 'XXX',
+                    Vector3(15000, 0, 1000), U.heading_to_v3(30) * 400 / 3.6)
+        self.lander.pilot.set_target_conf_to_current()
+        self.lander.pilot.do([['LAND', ['ABC', '36'], []]])
+        self.circler = self.get_plane(gl, 'CRC0001', 'XXX',
+                    Vector3(10000, 10000, 3000), Vector3(0, 500 / 3.6, 0))
+        self.circler.pilot.do([['CIRCLE', ['L'], []]])
+        self.climber = self.get_plane(gl, 'CLB0001', 'XXX',
+                    Vector3(30000, 10000, 2000), Vector3(0, -500 / 3.6, 0))
+        self.climber.pilot.do([['ALTITUDE', [4000], []],
+                               ['HEADING', [270], []]])
+
+    def assertSameContinuation(self, continuation):
+        '''
+        Take a snapshot, let the simulation proceed for ``continuation`` pings,
+        then restore the snapshot in a new gamelogic and verify the simulation
+        evolves in the same way.
+        '''
+        snapshot = engine.snapshot.take_snapshot(self.gamelogic)
+        original = []
+        for i in range(continuation):
+            self.gamelogic.step()
+            original.append(self.get_state(self.gamelogic))
+        restored_gl = self.get_gamelogic()
+        engine.snapshot.restore_snapshot(restored_gl, snapshot)
+        restored = []
+        for i in range(continuation):
+            restored_gl.step()
+            restored.append(self.get_state(restored_gl))
+        self.assertEqual(original, restored)
+
+    def testRoundTripAtStart(self):
+        '''
+        Snapshot taken before the first ping.
+        '''
+        self.assertSameContinuation(60)
+
+    def testRoundTripDuringProcedures(self):
+        '''
+        Snapshot taken while procedures are being performed.
+        '''
+        for i in range(40):
+            self.gamelogic.step()
+        self.assertTrue(self.lander.pilot.status['procedure'])
+        self.assertTrue(self.circler.pilot.status['procedure'])
+        self.assertSameContinuation(100)
+
+    def testRoundTripWithBusyRunway(self):
+        '''
+        Snapshot taken while a plane is taxiing on the runway.
+        '''
+        for i in range(65):
+            self.gamelogic.step()
+        runways = self.gamelogic.aerospace.runways_manager.get_state()
+        self.assertEqual(runways, {'ABC' : {'36' : 'LND0001'}})
+        self.assertSameContinuation(60)
+
+    def testIndexesAfterRestore(self):
+        '''
+        The indexes of the planes are rebuilt when a snapshot is restored.
+        '''
+        icaos = lambda planes : sorted(p.icao for p in planes)
+        def get_indexes(aerospace):
+            return (icaos(aerospace.airborne), icaos(aerospace.locked),
+                    icaos(aerospace.get_planes_on_ground('ABC')),
+                    aerospace.count_planes_on_ground(),
+                    icaos(aerospace.get_planes_by_origin('XXX')),
+                    icaos(aerospace.get_planes_by_destination('ABC')))
+        # The lander is on ground after 60 pings
+        for i in range(62):
+            self.gamelogic.step()
+        self.assertTrue(self.lander.flags.on_ground)
+        snapshot = engine.snapshot.take_snapshot(self.gamelogic)
+        restored_gl = self.get_gamelogic()
+        engine.snapshot.restore_snapshot(restored_gl, snapshot)
+        self.assertEqual(get_indexes(restored_gl.aerospace),
+                         get_indexes(self.gamelogic.aerospace))
+
+    def testEventCounts(self):
+        '''
+        The count of the score events is restored along with the score.
+        '''
+        for i in range(40):
+            self.gamelogic.step()
+        self.assertTrue(self.gamelogic.event_counts)
+        snapshot = engine.snapshot.take_snapshot(self.gamelogic)
+        restored_gl = self.get_gamelogic()
+        restored_gl.score_event((999, 1))
+        engine.snapshot.restore_snapshot(restored_gl, snapshot)
+        self.assertEqual(restored_gl.score, self.gamelogic.score)
+        self.assertEqual(restored_gl.event_counts,
+                         self.gamelogic.event_counts)
+        # The restored counts are not shared with the original gamelogic
+        self.gamelogic.score_event((999, 1))
+        self.assertFalse(999 in restored_gl.event_counts)
+
+    def testRestoreReplacesPlanes(self):
+        '''
+        Restoring a snapshot removes the planes already in the aerospace.
+        '''
+        snapshot = engine.snapshot.take_snapshot(self.gamelogic)
+        other = self.get_gamelogic()
+        self.get_plane(other, 'XYZ0001', 'XXX', Vector3(10000, 10000, 3000),
+                       Vector3(0, 500 / 3.6, 0))
+        engine.snapshot.restore_snapshot(other, snapshot)
+        icaos = sorted([p.icao for p in other.aerospace.aeroplanes])
+        self.assertEqual(icaos, ['CLB0001', 'CRC0001', 'LND0001'])
+
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
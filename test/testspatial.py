@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# -*- coding: utf-8  -*-
+'''
+Testing suite for the spatial indexes.
+'''
+
+import unittest
+from random import Random
+
+from pygame.rect import Rect
+
+from lib.spatial import RectIndex, PointIndex
+
+__author__ = "Mac Ryan"
+__copyright__ = "Copyright 2011, Mac Ryan"
+__license__ = "GPL v3"
+#__version__ = "<dev>"
+#__date__ = "<unknown>"
+__maintainer__ = "Mac Ryan"
+__email__ = "quasipedia@gmail.com"
+__status__ = "Development"
+
+
+class RectIndexTest(unittest.TestCase):
+
+    '''
+    Queries of the index of rectangles.
+    '''
+
+    def setUp(self):
+        self.rnd = Random(42)
+        self.index = RectIndex(64)
+        self.rects = {}
+        for key in range(200):
+            rect = self.get_random_rect()
+            self.rects[key] = rect
+            self.index.insert(key, rect)
+
+    def get_random_rect(self):
+        return Rect(self.rnd.randint(-50, 1000), self.rnd.randint(-50, 1000),
+                    self.rnd.randint(1, 150), self.rnd.randint(1, 80))
+
+    def brute_force(self, area):
+        return sorted(tuple(r) for r in self.rects.values()
+                      if r.colliderect(area))
+
+    def testQuery(self):
+        '''
+        query - all the colliding rects are returned, each once
+        '''
+        for i in range(200):
+            area = self.get_random_rect()
+            found = [tuple(r) for r in self.index.query(area)]
+            self.assertEqual(len(found), len(set(found)))
+            self.assertTrue(set(self.brute_force(area)) <= set(found))
+
+    def testCollides(self):
+        '''
+        collides - same outcome as a linear scan
+        '''
+        for i in range(500):
+            rect = self.get_random_rect()
+            self.assertEqual(self.index.collides(rect),
+                             bool(self.brute_force(rect)))
+
+    def testCellBoundaries(self):
+        '''
+        collides - rects touching (but not overlapping) across cells
+        '''
+        index = RectIndex(10)
+        index.insert('a', Rect(5, 5, 5, 5))
+        self.assertFalse(index.collides(Rect(10, 5, 5, 5)))
+        self.assertFalse(index.collides(Rect(5, 10, 5, 5)))
+        self.assertTrue(index.collides(Rect(9, 9, 5, 5)))
+        self.assertTrue(index.collides(Rect(0, 0, 30, 30)))
+
+    def testInsertRemove(self):
+        '''
+        insert/remove - rects can be moved and removed
+        '''
+        self.index.insert(0, Rect(5000, 5000, 10, 10))
+        self.rects[0] = Rect(5000, 5000, 10, 10)
+        for key in range(1, 100):
+            self.index.remove(key)
+            del self.rects[key]
+        self.assertEqual(len(self.index), 101)
+        self.assertTrue(self.index.collides(Rect(5005, 5005, 1, 1)))
+        for i in range(200):
+            rect = self.get_random_rect()
+            self.assertEqual(self.index.collides(rect),
+                             bool(self.brute_force(rect)))
+        self.index.clear()
+        self.assertEqual(len(self.index), 0)
+        self.assertEqual(self.index.query(Rect(0, 0, 2000, 2000)), [])
+
+
+class PointIndexTest(unittest.TestCase):
+
+    '''
+    Queries of the index of points.
+    '''
+
+    def setUp(self):
+        self.rnd = Random(42)
+        self.index = PointIndex(3000)
+        self.points = {}
+        for key in range(300):
+            point = (self.rnd.uniform(-5000, 50000),
+                     self.rnd.uniform(-5000, 50000))
+            self.points[key] = point
+            self.index.insert(key, point)
+
+    def brute_force(self, point, radius):
+        return sorted(key for key, (x, y) in self.points.items()
+                      if (x - point[0])**2 + (y - point[1])**2 < radius**2)
+
+    def testQuery(self):
+        '''
+        query - same points as a linear scan
+        '''
+        for i in range(200):
+            point = (self.rnd.uniform(-10000, 60000),
+                     self.rnd.uniform(-10000, 60000))
+            radius = self.rnd.choice((1000, 3000, 7500))
+            self.assertEqual(sorted(self.index.query(point, radius)),
+                             self.brute_force(point, radius))
+
+    def testBoundary(self):
+        '''
+        query - points at exactly ``radius`` are excluded
+        '''
+        index = PointIndex(10)
+        index.insert('on', (13, 4))
+        index.insert('in', (12.5, 4))
+        self.assertEqual(index.query((0, 4), 13), ['in'])
+
+    def testInsertRemove(self):
+        '''
+        insert/remove - points can be moved and removed
+        '''
+        self.index.insert(0, (100000, 100000))
+        self.index.remove(1)
+        del self.points[1]
+        self.points[0] = (100000, 100000)
+        self.assertEqual(len(self.index), 299)
+        for point in [(100000, 100000)] + self.points.values()[:20]:
+            self.assertEqual(sorted(self.index.query(point, 3000)),
+                             self.brute_force(point, 3000))
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8  -*-
+'''
+Testing suite for the radar trails.
+'''
+
+import unittest
+from random import Random
+
+import pygame
+# Screen coordinates depend on the settings, which need pygame set up and
+# running.
+pygame.init()
+pygame.display.set_mode((64,48), 0, 32)
+
+import lib.utils as U
+from engine.settings import settings as S
+from engine.trails import TrailBuffer, to_screen
+
+__author__ = "Mac Ryan"
+__copyright__ = "Copyright 2011, Mac Ryan"
+__license__ = "GPL v3"
+#__version__ = "<dev>"
+#__date__ = "<unknown>"
+__maintainer__ = "Mac Ryan"
+__email__ = "quasipedia@gmail.com"
+__status__ = "Development"
+
+
+class TrailBufferTest(unittest.TestCase):
+
+    '''
+    Recording and screen conversion of the trails.
+    '''
+
+    LENGTH = 5
+
+    def setUp(self):
+        self.rnd = Random(42)
+        self.trails = TrailBuffer(self.LENGTH)
+
+    def random_point(self):
+        # Multiples of half a pixel test the rounding of ties
+        if self.rnd.random() < 0.5:
+            return tuple(self.rnd.randint(-1000, 1000) * 0.5 *
+                         S.METRES_PER_PIXEL for i in range(2))
+        return tuple(self.rnd.uniform(-1000, 2 * S.RADAR_RANGE + 1000)
+                     for i in range(2))
+
+    def testToScreen(self):
+        '''
+        to_screen - same as U.sc
+        '''
+        points = [self.random_point() for i in range(2000)]
+        self.assertEqual([tuple(p) for p in to_screen(points).tolist()],
+                         [U.sc(p) for p in points])
+
+    def testRecord(self):
+        '''
+        record - trails hold the latest positions, latest first
+        '''
+        history = dict((icao, [self.random_point()]) for icao in 'ABC')
+        for icao, points in history.items():
+            self.trails.add(icao, points[0])
+            self.assertEqual(list(self.trails.get(icao)),
+                             [list(U.sc(points[0]))] * self.LENGTH)
+        for ping in range(12):
+            # Plane C stands still
+            for icao in 'AB':
+                history[icao].insert(0, self.random_point())
+            self.trails.record([(icao, history[icao][0]) for icao in 'AB'])
+        for icao, points in history.items():
+            expected = (points + points[-1:] * self.LENGTH)[:self.LENGTH]
+            self.assertEqual(self.trails.get_world(icao), expected)
+            self.assertEqual(list(self.trails.get(icao)),
+                             [list(U.sc(p)) for p in expected])
+
+    def testRowsReuse(self):
+        '''
+        add/remove - rows are recycled and the buffer grows as needed
+        '''
+        count = TrailBuffer.INITIAL_ROWS * 2 + 1
+        for i in range(count):
+            self.trails.add(i, (i, i))
+        self.trails.remove(0)
+        self.trails.add('new', (-1, -1))
+        self.assertEqual(len(self.trails.world), TrailBuffer.INITIAL_ROWS * 4)
+        self.trails.record([])
+        for i in range(1, count):
+            self.assertEqual(self.trails.get_world(i), [(i, i)] * self.LENGTH)
+        self.assertEqual(self.trails.get_world('new'),
+                         [(-1, -1)] * self.LENGTH)
+
+    def testSetWorld(self):
+        '''
+        set_world - restore a trail
+        '''
+        points = [self.random_point() for i in range(self.LENGTH)]
+        self.trails.add('A', (0, 0))
+        self.trails.record([('A', (1, 1))])
+        self.trails.set_world('A', points)
+        self.assertEqual(self.trails.get_world('A'), points)
+        self.assertEqual(list(self.trails.get('A')),
+                         [list(U.sc(p)) for p in points])
+
+    def testScaleChange(self):
+        '''
+        record - trails are converted again if the radar scale changes
+        '''
+        self.trails.add('A', (0, 0))
+        for i in range(self.LENGTH):
+            self.trails.record([('A', self.random_point())])
+        original = S.METRES_PER_PIXEL
+        S.METRES_PER_PIXEL = original * 2
+        try:
+            self.trails.record([('A', self.random_point())])
+            self.assertEqual(list(self.trails.get('A')),
+                             [list(U.sc(p))
+                              for p in self.trails.get_world('A')])
+        finally:
+            S.METRES_PER_PIXEL = original
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
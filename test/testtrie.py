@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8  -*-
+'''
+Testing suite for the prefix trie.
+'''
+
+import unittest
+
+from lib.trie import PrefixTrie
+
+__author__ = "Mac Ryan"
+__copyright__ = "Copyright 2011, Mac Ryan"
+__license__ = "GPL v3"
+#__version__ = "<dev>"
+#__date__ = "<unknown>"
+__maintainer__ = "Mac Ryan"
+__email__ = "quasipedia@gmail.com"
+__status__ = "Development"
+
+
+class PrefixTrieTest(unittest.TestCase):
+
+    '''
+    Lookup, completion and removal of keys.
+    '''
+
+    def setUp(self):
+        self.trie = PrefixTrie([('H', 'HEADING'), ('HEAD', 'HEADING'),
+                                ('HEADING', 'HEADING'), ('HOLD', 'CIRCLE'),
+                                ('SPEED', 'SPEED')])
+
+    def testLookup(self):
+        self.assertEqual(len(self.trie), 5)
+        self.assertTrue('HEAD' in self.trie)
+        self.assertFalse('HE' in self.trie)
+        self.assertEqual(self.trie.get('HOLD'), 'CIRCLE')
+        self.assertEqual(self.trie.get('HE'), None)
+        self.assertEqual(sorted(self.trie.keys('HE')), ['HEAD', 'HEADING'])
+
+    def testCompletion(self):
+        self.assertEqual(self.trie.complete('HE'), 'HEAD')
+        self.assertEqual(self.trie.complete('HEADI'), 'HEADING')
+        self.assertEqual(self.trie.complete('S'), 'SPEED')
+        self.assertEqual(self.trie.complete('H'), 'H')
+        self.assertEqual(self.trie.complete('X'), None)
+        self.assertEqual(self.trie.count('H'), 4)
+        self.assertEqual(sorted(self.trie.values('H')), ['CIRCLE', 'HEADING'])
+        self.assertEqual(self.trie.values('HE'), ['HEADING'])
+
+    def testRemoval(self):
+        self.trie.remove('HOLD')
+        self.trie.remove('H')
+        self.assertEqual(len(self.trie), 3)
+        self.assertEqual(self.trie.complete('H'), 'HEAD')
+        self.assertEqual(self.trie.values('H'), ['HEADING'])
+        self.assertEqual(self.trie.complete('HO'), None)
+        self.assertRaises(KeyError, self.trie.remove, 'HOLD')
+        self.assertRaises(KeyError, self.trie.remove, 'HE')
+        self.trie.insert('HOLD', 'CIRCLE')
+        self.assertEqual(self.trie.complete('HO'), 'HOLD')
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -5,7 +5,10 @@ Test the util U.heading_in_betweentions for ATC-NG game.
 '''
 
 import unittest
-from random import randint
+from math import cos, sin, radians, degrees, atan2
+from random import randint, Random
+
+import numpy
 
 import lib.utils as U
 from engine.settings import settings as S
@@ -20,6 +23,43 @@ __maintainer__ = "Mac Ryan"
 __email__ = "quasipedia@gmail.com"
 __status__ = "Development"
 
+# Reference implementations of the geometry functions, as they were written
+# before being optimised: the fast versions must give the same results.
+
+def ref_in_between(boundaries, value):
+    tmp = list(boundaries)
+    tmp.append(value)
+    tmp = [round(el, 7) for el in tmp]
+    tmp.sort()
+    return tmp[1] == round(value, 7)
+
+def ref_heading_to_v3(heading):
+    heading = radians(90-heading)
+    return Vector3(cos(heading), sin(heading)).normalized()
+
+def ref_heading_in_between(boundaries, value):
+    if (boundaries[0]-boundaries[1])%360 == 180:
+        return True
+    if value in boundaries:
+        return True
+    sort_a = lambda a,b : [a,b] if (a-b)%360 > (b-a)%360 else [b,a]
+    tmp = sort_a(*boundaries)
+    a, b = [ref_heading_to_v3(el) for el in tmp]
+    v = ref_heading_to_v3(value)
+    if cmp(a.cross(v).z, 0) == cmp(a.cross(b).z, 0) == cmp(v.cross(b).z, 0):
+        return True
+    return False
+
+def ref_v3_to_heading(vector):
+    return (90-degrees(atan2(vector.y, vector.x)))%360
+
+def ref_is_behind(velocity, position, target):
+    tuple_ = (velocity, position, target)
+    velocity, position, target = [Vector3(*el.xy) for el in tuple_]
+    if position == target:
+        return False
+    return velocity.angle(target-position) >= 1.5708
+
 
 class Test(unittest.TestCase):
 
@@ -257,6 +297,93 @@ class Test(unittest.TestCase):
         self.assertRaises(TypeError, U.chunks, dict(a=1, b=2), 2)
 
 
+class GeometryKernelTest(unittest.TestCase):
+
+    '''
+    Property-test the scalar and batch geometry functions against the
+    reference implementations, on random inputs.
+    '''
+
+    SAMPLES = 2000
+
+    def setUp(self):
+        self.rnd = Random(42)
+
+    def random_heading(self):
+        # Integer headings make ties and boundary cases likely
+        if self.rnd.random() < 0.5:
+            return float(self.rnd.randint(-360, 720))
+        return self.rnd.uniform(-360, 720)
+
+    def random_vector(self):
+        # Small integer components make aligned vectors likely
+        if self.rnd.random() < 0.5:
+            return Vector3(*[self.rnd.randint(-3, 3) for i in range(3)])
+        return Vector3(*[self.rnd.uniform(-1000, 1000) for i in range(3)])
+
+    def testInBetween(self):
+        '''
+        in_between / batch_in_between - same as reference implementation
+        '''
+        cases = []
+        for i in range(self.SAMPLES):
+            a, b = self.rnd.uniform(-10, 10), self.rnd.uniform(-10, 10)
+            value = self.rnd.choice([a, b, self.rnd.uniform(-10, 10),
+                                     a + 1e-9, b - 1e-9])
+            cases.append(((a, b), value))
+            self.assertEqual(U.in_between((a, b), value),
+                             ref_in_between((a, b), value))
+        boundaries, values = zip(*cases)
+        expected = [ref_in_between(*c) for c in cases]
+        self.assertEqual(list(U.batch_in_between(boundaries, values)),
+                         expected)
+
+    def testHeadingInBetween(self):
+        '''
+        heading_in_between / batch_heading_in_between - same as reference
+        '''
+        cases = []
+        for i in range(self.SAMPLES):
+            a, b = self.random_heading(), self.random_heading()
+            value = self.rnd.choice([a, b, a + 180, self.random_heading()])
+            cases.append(((a, b), value))
+            self.assertEqual(U.heading_in_between((a, b), value),
+                             ref_heading_in_between((a, b), value))
+        boundaries, values = zip(*cases)
+        expected = [ref_heading_in_between(*c) for c in cases]
+        self.assertEqual(list(U.batch_heading_in_between(boundaries, values)),
+                         expected)
+
+    def testV3ToHeading(self):
+        '''
+        v3_to_heading / batch_v3_to_heading - same as reference
+        '''
+        vectors = [self.random_vector() for i in range(self.SAMPLES)]
+        expected = [ref_v3_to_heading(v) for v in vectors]
+        self.assertEqual([U.v3_to_heading(v) for v in vectors], expected)
+        back = U.batch_v3_to_heading([tuple(v) for v in vectors])
+        for heading, exp in zip(back, expected):
+            self.assertAlmostEqual(heading, exp, 9)
+
+    def testIsBehind(self):
+        '''
+        is_behind / batch_is_behind - same as reference
+        '''
+        cases = []
+        while len(cases) < self.SAMPLES:
+            velocity, position, target = [self.random_vector()
+                                          for i in range(3)]
+            if not velocity.magnitude_xy():
+                continue
+            cases.append((velocity, position, target))
+            self.assertEqual(U.is_behind(velocity, position, target),
+                             ref_is_behind(velocity, position, target))
+        arrays = [numpy.array([tuple(v) for v in vectors])
+                  for vectors in zip(*cases)]
+        expected = [ref_is_behind(*c) for c in cases]
+        self.assertEqual(list(U.batch_is_behind(*arrays)), expected)
+
+
 if __name__ == "__main__":
     #import sys;sys.argv = ['', 'Test.testName']
     unittest.main()
\ No newline at end of file
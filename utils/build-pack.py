@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# -*- coding: utf-8  -*-
+'''
+This utility builds the resource pack of the game.
+
+The pack is a single file containing all the data files of the game (YAML
+files already parsed), that the game memory-maps at startup instead of
+opening and parsing each file separately. The game only uses it if the
+``ATC_NG_PACK`` environment variable points to it, and reads resources from
+the pack first: it must be built again whenever a data file changes::
+
+    python utils/build-pack.py
+    ATC_NG_PACK=atc-ng.pack python engine/main.py
+'''
+
+import os
+import argparse
+from time import time
+
+import engine.resources
+
+__author__ = "Mac Ryan"
+__copyright__ = "Copyright 2011, Mac Ryan"
+__license__ = "GPL v3"
+#__version__ = "<dev>"
+#__date__ = "<unknown>"
+__maintainer__ = "Mac Ryan"
+__email__ = "quasipedia@gmail.com"
+__status__ = "Development"
+
+
+def run_as_script():
+    default = os.path.join(engine.resources.ROOT, engine.resources.PACK_NAME)
+    parser = argparse.ArgumentParser(
+                            description='Build the ATC-NG resource pack.')
+    parser.add_argument('--output', metavar='FILE', default=default,
+                        help='name of the pack (default: %(default)s)')
+    args = parser.parse_args()
+    start = time()
+    count = engine.resources.build_pack(args.output)
+    print '%d resources packed in %s (%d kB) in %.2f s' % \
+          (count, args.output, os.path.getsize(args.output) / 1024,
+           time() - start)
+
+if __name__ == '__main__':
+    run_as_script()
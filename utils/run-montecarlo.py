@@ -0,0 +1,408 @@
+#!/usr/bin/env python
+# -*- coding: utf-8  -*-
+'''
+This utility evaluates a scenario by playing many headless matches.
+
+Each match runs in a worker of a ``multiprocessing`` pool, with its own random
+seed, and planes are controlled by a simple automated policy (see
+``AutoController``). The parameters of the challenge (``FREQ_START``,
+``FREQ_STEP``, ``FREQ_LIMIT``, ``MAX_PORT_PLANES``...) can be overridden from
+the command line, which allows to tune them without playing by hand::
+
+    python utils/run-montecarlo.py -n 1000 --set FREQ_START=60 --set FREQ_LIMIT=10
+
+At the end a report with score, fatalities, TCAS and fuel emergencies and
+per-ping step time is printed (and optionally saved as JSON).
+'''
+
+import os
+import json
+import logging
+import argparse
+import multiprocessing
+from time import time
+from math import sqrt
+
+import pygame
+# The simulation runs without a window. PyGame initialisation must occur here
+# as the settings module needs a display to compute the size of the GUI.
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+pygame.init()
+pygame.display.set_mode((1280, 720), 0, 32)
+
+import lib.utils as U
+import pilot.navigator
+import engine.challenge
+import engine.gamelogic
+from engine.settings import settings as S
+from engine.logger import log
+from lib.euclid import Vector3
+
+__author__ = "Mac Ryan"
+__copyright__ = "Copyright 2011, Mac Ryan"
+__license__ = "GPL v3"
+#__version__ = "<dev>"
+#__date__ = "<unknown>"
+__maintainer__ = "Mac Ryan"
+__email__ = "quasipedia@gmail.com"
+__status__ = "Development"
+
+# Challenge parameters that can be overridden from the command line
+TUNABLES = ['DELAY', 'PLANE_NUMBER_START', 'MOD_PERIOD', 'FREQ_START',
+            'FREQ_STEP', 'FREQ_LIMIT', 'MAX_LOST', 'MAX_PORT_PLANES']
+# Score events reported individually, by name
+EVENTS = ['PLANE_LANDS_CORRECT_PORT', 'PLANE_LANDS_WRONG_PORT',
+          'PLANE_LEAVES_CORRECT_GATE', 'PLANE_LEAVES_WRONG_GATE',
+          'PLANE_LEAVES_RANDOM', 'PLANE_CRASHES', 'COMMAND_IS_ISSUED',
+          'EMERGENCY_FUEL', 'EMERGENCY_TCAS']
+
+
+def heading_difference(h1, h2):
+    '''
+    Return the angle (in degrees, 0-180) between two headings.
+    '''
+    return abs((h1 - h2 + 180) % 360 - 180)
+
+
+class AutoController(object):
+
+    '''
+    A very simple air traffic controller. Every ``PERIOD`` pings it looks at
+    the planes that are not executing any order and:
+
+    - makes planes on ground take off;
+    - clears planes bound to an airport for landing as soon as they are lined
+      up with one of its runways, otherwise routes them to the interception
+      point of the ILS (if they are behind a runway) or to a staging point
+      beside its extended centreline (if they are not);
+    - routes planes bound to a gate towards it, at a valid exit level.
+
+    Commands are typed in the console, so they go through the same parser
+    and validation the player's commands go through.
+    '''
+
+    PERIOD = 5                # pings between two decisions
+    INTERCEPT_DISTANCE = 12000  # distance from the runway foot of the ILS
+                                # interception point
+    STAGING_DISTANCE = 24000  # distance from the runway foot of the staging
+                              # point (measured along the ILS)...
+    STAGING_OFFSET = 4000     # ...and its distance from the ILS
+    APPROACH_LEVEL = 10       # approach altitude (in hundreds of metres)
+    APPROACH_SPEED = 400      # approach speed (in km/h), for tighter turns
+    MIN_FINAL = 8000          # minimum length of the final approach
+    MARGIN = 8000             # minimum distance of waypoints from the edges
+    REISSUE_TOLERANCE = 5     # heading change worth a new command
+    LEVEL_STEP = 15           # maximum altitude change for a single command
+
+    def __init__(self, gamelogic):
+        self.gamelogic = gamelogic
+
+    def issue(self, text):
+        '''
+        Parse and execute a command. Return True if the pilot accepted it.
+        '''
+        parser = self.gamelogic.cli.parser
+        parser.initialise(text)
+        parsed = parser.parse()
+        if type(parsed) in (unicode, str):
+            return False
+        callable_, args = parsed
+        return callable_(args)
+
+    def __inside(self, point):
+        '''
+        Return True if ``point`` is well within the aerospace boundaries.
+        '''
+        low, high = self.MARGIN, S.RADAR_RANGE * 2 - self.MARGIN
+        return low <= point.x <= high and low <= point.y <= high
+
+    def __approaches(self, port):
+        '''
+        Return a list of (runway name, ILS heading, interception point,
+        staging point) for the runways of an airport that can be approached
+        without leaving the aerospace.
+        '''
+        approaches = []
+        for name, runway in port.runways.items():
+            foot = runway['location'] + port.location
+            foot = Vector3(foot.x, foot.y, 0)
+            ils = Vector3(*runway['ils'].xy).normalized()
+            side = Vector3(-ils.y, ils.x, 0)
+            intercept = foot - ils * self.INTERCEPT_DISTANCE
+            if not self.__inside(intercept):
+                continue
+            distance = self.STAGING_DISTANCE
+            staging = foot - ils * distance + side * self.STAGING_OFFSET
+            while not self.__inside(staging) and \
+                  distance > self.INTERCEPT_DISTANCE * 1.5:
+                distance -= 2000
+                staging = foot - ils * distance + side * self.STAGING_OFFSET
+            if self.__inside(staging):
+                approaches.append((name, U.v3_to_heading(ils), intercept,
+                                   staging))
+        return approaches
+
+    def __can_land(self, plane, port, name):
+        '''
+        Return True if a LAND command would start a landing that has some
+        chance to succeed, False if the plane is not lined up with the runway
+        and None if it is, but it is flying too high. These are the same
+        checks performed by the landing procedure, with some extra margin.
+        '''
+        pi = plane.pilot
+        lander = pilot.navigator.Lander(pi, port.iata, name)
+        if heading_difference(U.v3_to_heading(lander.ils), plane.heading) > \
+           S.ILS_TOLERANCE / 2 or not lander.set_intersection_point() or \
+           U.ground_distance(lander.ip, lander.foot) < self.MIN_FINAL:
+            return False
+        radius = pi.navigator.get_veering_radius('expedite')
+        if lander.set_merge_point(radius) is None:
+            return False
+        seconds = U.ground_distance(plane.position, lander.foot) / plane.speed
+        if lander.above_foot > -plane.climb_rate_limits[0] * seconds * 0.8:
+            return None
+        return True
+
+    def __to_airport(self, plane):
+        '''
+        Return the order to guide a plane towards its destination airport:
+        either the name of the runway to land on, or (heading, level).
+        '''
+        navigator = plane.pilot.navigator
+        port = self.gamelogic.aerospace.airports[plane.destination]
+        for name in sorted(port.runways):
+            can_land = self.__can_land(plane, port, name)
+            if can_land:
+                return name
+            if can_land is None:
+                return U.rint(plane.heading) % 360, self.APPROACH_LEVEL
+        approaches = self.__approaches(port)
+        # Planes already behind a runway, short of the interception point
+        for name, ils_heading, intercept, staging in approaches:
+            course = navigator.get_course_towards(intercept)
+            ahead = (intercept - Vector3(*plane.position.xy)).dot(
+                                                U.heading_to_v3(ils_heading))
+            if heading_difference(course, ils_heading) < \
+               S.ILS_TOLERANCE * 2 / 3 and ahead > self.INTERCEPT_DISTANCE / 4:
+                return U.rint(course) % 360, self.APPROACH_LEVEL
+        # Other planes fly to the closest staging point (or overhead the
+        # airport, if no runway can be approached from within the aerospace)
+        points = [a[3] for a in approaches] or [Vector3(*port.location.xy)]
+        staging = min(points,
+                      key=lambda p : U.ground_distance(p, plane.position))
+        course = navigator.get_course_towards(staging)
+        return U.rint(course) % 360, self.APPROACH_LEVEL
+
+    def __to_gate(self, plane):
+        '''
+        Return (heading, level) to exit from the destination gate of a plane.
+        Planes that would reach the gate before reaching the exit level keep
+        away from the edges of the aerospace in the meanwhile.
+        '''
+        gate = self.gamelogic.aerospace.gates[plane.destination]
+        # Planes must leave at a multiple of 1000 metres, within the gate
+        level = min((gate.bottom + gate.top) / 2, plane.max_altitude)
+        level = max(level / 1000, (gate.bottom + 999) / 1000) * 10
+        target = Vector3(*gate.location)
+        centre = Vector3(S.RADAR_RANGE, S.RADAR_RANGE)
+        # Planes must cross the gate flying (roughly) along its radial
+        if heading_difference(plane.pilot.navigator.get_course_towards(
+                              target), gate.radial) > S.GATE_TOLERANCE / 2:
+            target = (target + centre) / 2
+        climb = abs(level * 100 - plane.altitude)
+        rate = plane.climb_rate_limits[1] if level * 100 > plane.altitude \
+               else -plane.climb_rate_limits[0]
+        # Non expedited climbs are performed at half the maximum rate
+        if climb / (rate / 2.0) > \
+           U.ground_distance(target, plane.position) / plane.max_speed:
+            if U.ground_distance(centre, plane.position) < S.RADAR_RANGE / 2:
+                return U.rint(plane.heading) % 360, level
+            target = centre
+        course = plane.pilot.navigator.get_course_towards(target)
+        return U.rint(course) % 360, level
+
+    def __steer(self, plane, heading, level, speed=None):
+        '''
+        Give a plane a new heading, level or speed. Planes can't receive new
+        orders while climbing or descending, so turns come first and altitude
+        is changed in steps, to allow course corrections in between. Small
+        course corrections are not worth the points a command costs.
+        '''
+        current = U.rint(plane.altitude / 500.0) * 5
+        speed_cmd = ''
+        if speed and U.rint(plane.speed * 3.6) != speed:
+            speed_cmd = ' SPEED %d' % speed
+        if heading_difference(plane.heading, heading) >= \
+           self.REISSUE_TOLERANCE:
+            self.issue('%s HEADING %03d%s' % (plane.icao, heading, speed_cmd))
+        elif current != level:
+            step = max(-self.LEVEL_STEP, min(self.LEVEL_STEP, level - current))
+            self.issue('%s ALTITUDE %02d%s' %
+                       (plane.icao, current + step, speed_cmd))
+        elif speed_cmd:
+            self.issue(plane.icao + speed_cmd)
+
+    def __control(self, plane):
+        aerospace = self.gamelogic.aerospace
+        icao = plane.icao
+        if plane.flags.on_ground:
+            # The plane can't be steered until it completes the take off
+            cmd = '%s TAKEOFF %%s ALTITUDE %d SPEED %d EXPEDITE' % \
+                  (icao, self.LEVEL_STEP, self.APPROACH_SPEED)
+            for name in sorted(aerospace.airports[plane.origin].runways):
+                if self.issue(cmd % name):
+                    return
+        elif plane.destination in aerospace.airports:
+            order = self.__to_airport(plane)
+            if type(order) is tuple:
+                self.__steer(plane, *order, speed=self.APPROACH_SPEED)
+            else:
+                self.issue('%s LAND %s %s EXPEDITE' %
+                           (icao, plane.destination, order))
+        else:
+            self.__steer(plane, *self.__to_gate(plane))
+
+    def update(self):
+        '''
+        Give new orders to the planes that need them.
+        '''
+        if self.gamelogic.ping_count % self.PERIOD:
+            return
+        for plane in self.gamelogic.aerospace.aeroplanes:
+            if plane.flags.busy or plane.flags.locked or \
+               plane.pilot.status['procedure'] or plane.tcas.state:
+                continue
+            self.__control(plane)
+
+
+def init_worker(params):
+    '''
+    Prepare a worker process to play matches.
+    '''
+    for name, value in params.items():
+        setattr(engine.challenge.Challenge, name, value)
+    # Thousands of matches would otherwise flood the log directory
+    S.FDR_ENABLED = False
+    log.setLevel(logging.WARNING)
+
+def play_match(args):
+    '''
+    Play a match of ``pings`` radar pings with a given ``seed`` and return its
+    statistics as a dictionary.
+    '''
+    seed, pings, scenario = args
+    screen = pygame.display.get_surface()
+    gl = engine.gamelogic.GameLogic(screen, scenario=scenario, seed=seed,
+                                    record_replay=False)
+    controller = AutoController(gl)
+    step_times = []
+    max_planes = 0
+    while gl.ping_count < pings and \
+          gl.fatalities < engine.challenge.Challenge.MAX_LOST:
+        controller.update()
+        start = time()
+        gl.step()
+        step_times.append(time() - start)
+        max_planes = max(max_planes, len(gl.aerospace.aeroplanes))
+    gl.shutdown()
+    events = dict((name, gl.event_counts.get(getattr(S, name)[0], 0))
+                  for name in EVENTS)
+    return dict(seed=seed, pings=gl.ping_count, score=gl.score,
+                fatalities=gl.fatalities, planes=gl.challenge.plane_counter,
+                max_planes=max_planes, events=events, step_times=step_times)
+
+def summarise(values):
+    '''
+    Return mean, standard deviation, minimum and maximum of ``values``.
+    '''
+    n = len(values)
+    mean = sum(values) / float(n)
+    std = sqrt(sum((v - mean) ** 2 for v in values) / n)
+    return dict(mean=mean, std=std, min=min(values), max=max(values))
+
+def build_report(results, params, wall_time, jobs):
+    '''
+    Aggregate the statistics of all matches in a single report.
+    '''
+    step_times = sorted(t for r in results for t in r['step_times'])
+    total_pings = len(step_times)
+    report = dict(matches=len(results), jobs=jobs, wall_time=wall_time,
+                  parameters=params,
+                  game_over=len([r for r in results if r['fatalities'] >=
+                                 engine.challenge.Challenge.MAX_LOST]))
+    for key in ('score', 'fatalities', 'planes', 'max_planes', 'pings'):
+        report[key] = summarise([r[key] for r in results])
+    report['events'] = dict((name, summarise([r['events'][name] for r in
+                                              results])) for name in EVENTS)
+    report['step_time'] = dict(
+        mean=sum(step_times) / total_pings,
+        p95=step_times[int(total_pings * 0.95)],
+        max=step_times[-1],
+        pings_per_second=total_pings / wall_time)
+    return report
+
+def print_report(report):
+    line = '%-28s %12.2f %12.2f %12.2f %12.2f'
+    print 'Matches: %d on %d processes in %.1f s  (%d game over)' % \
+          (report['matches'], report['jobs'], report['wall_time'],
+           report['game_over'])
+    if report['parameters']:
+        print 'Parameters: %s' % ', '.join('%s=%s' % item for item in
+                                           sorted(report['parameters'].items()))
+    print
+    print '%-28s %12s %12s %12s %12s' % ('', 'mean', 'std', 'min', 'max')
+    for key in ('score', 'fatalities', 'planes', 'max_planes', 'pings'):
+        r = report[key]
+        print line % (key, r['mean'], r['std'], r['min'], r['max'])
+    for name in EVENTS:
+        r = report['events'][name]
+        print line % (name.lower(), r['mean'], r['std'], r['min'], r['max'])
+    st = report['step_time']
+    print
+    print 'Step time: mean %.2f ms, p95 %.2f ms, max %.2f ms ' \
+          '(%.0f pings/s overall)' % (st['mean'] * 1000, st['p95'] * 1000,
+                                      st['max'] * 1000, st['pings_per_second'])
+
+def run_as_script():
+    parser = argparse.ArgumentParser(
+                  description='Evaluate an ATC-NG scenario with many matches.')
+    parser.add_argument('-n', '--matches', type=int, default=100,
+                        help='number of matches to play')
+    parser.add_argument('-j', '--jobs', type=int,
+                        default=multiprocessing.cpu_count(),
+                        help='number of worker processes')
+    parser.add_argument('-p', '--pings', type=int, default=1200,
+                        help='maximum length of a match, in radar pings')
+    parser.add_argument('--scenario', default='default')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed of the first match (then +1, +2...)')
+    parser.add_argument('--set', action='append', default=[],
+                        metavar='NAME=VALUE',
+                        help='override a challenge parameter (%s)' %
+                             ', '.join(TUNABLES))
+    parser.add_argument('--json', metavar='FILE',
+                        help='save the report as JSON in FILE')
+    args = parser.parse_args()
+    params = {}
+    for item in args.set:
+        name, _, value = item.partition('=')
+        if name not in TUNABLES:
+            parser.error('%s is not a challenge parameter' % name)
+        params[name] = int(value)
+    # The parent process must know about overrides too (e.g.: MAX_LOST)
+    init_worker(params)
+    tasks = [(args.seed + i, args.pings, args.scenario)
+             for i in range(args.matches)]
+    start = time()
+    pool = multiprocessing.Pool(args.jobs, init_worker, (params,))
+    results = pool.map(play_match, tasks, chunksize=1)
+    pool.close()
+    pool.join()
+    report = build_report(results, params, time() - start, args.jobs)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as file_:
+            json.dump(report, file_, indent=2, sort_keys=True)
+
+if __name__ == '__main__':
+    run_as_script()
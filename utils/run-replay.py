@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8  -*-
+'''
+This utility plays back a replay file, headlessly and as fast as possible.
+
+Replays are written automatically by the game in ``~/.atc-ng/replays``. The
+commands stored in the replay are fed back through the console parser at the
+same radar ping at which they were originally issued, so that the match
+unfolds exactly as it did for the player. This is mostly useful to reproduce
+bugs and to measure performance on real-world sessions.
+'''
+
+import os
+import sys
+import argparse
+from time import time
+from collections import deque
+
+import pygame
+# The simulation runs without a window. PyGame initialisation must occur here
+# as the settings module needs a display to compute the size of the GUI.
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+pygame.init()
+pygame.display.set_mode((1280, 720), 0, 32)
+
+import engine.replay
+import engine.gamelogic
+from engine.settings import settings as S
+
+__author__ = "Mac Ryan"
+__copyright__ = "Copyright 2011, Mac Ryan"
+__license__ = "GPL v3"
+#__version__ = "<dev>"
+#__date__ = "<unknown>"
+__maintainer__ = "Mac Ryan"
+__email__ = "quasipedia@gmail.com"
+__status__ = "Development"
+
+
+def play_replay(fname, extra_pings=0):
+    '''
+    Play back the replay in ``fname`` and return the GameLogic object at the
+    end of it, plus the list of spawns that did not match the original match.
+    The simulation is stopped ``extra_pings`` pings after the last record.
+    '''
+    header, records = engine.replay.load_replay(fname)
+    screen = pygame.display.set_mode(S.WINDOW_SIZE, 0, 32)
+    gl = engine.gamelogic.GameLogic(screen, scenario=header['scenario'],
+                                    seed=header['seed'], record_replay=False)
+    last_ping = max([r[0] for r in records] or [0]) + extra_pings
+    records = deque(records)
+    divergences = []
+    while gl.ping_count <= last_ping:
+        ping = gl.ping_count
+        while records and records[0][0] == ping and \
+              records[0][1] == engine.replay.COMMAND:
+            gl.cli.chars = list(records.popleft()[2])
+            gl.cli.do_parsing()
+        gl.step()
+        icaos = [p.icao for p in gl.aerospace.aeroplanes]
+        while records and records[0][0] == ping and \
+              records[0][1] == engine.replay.SPAWN:
+            icao = records.popleft()[2]
+            if icao not in icaos:
+                divergences.append((ping, icao))
+    gl.shutdown()
+    return gl, divergences
+
+def run_as_script():
+    parser = argparse.ArgumentParser(description='Play back an ATC-NG replay.')
+    parser.add_argument('fname', help='the replay file (.replay.gz)')
+    parser.add_argument('--extra-pings', type=int, default=0,
+                        help='pings to simulate after the last record')
+    args = parser.parse_args()
+    start = time()
+    gl, divergences = play_replay(args.fname, args.extra_pings)
+    elapsed = time() - start
+    print 'Simulated pings : %d (%.1f s of game time)' % (gl.ping_count,
+                                                         gl.sim_time)
+    print 'Wall-clock time : %.2f s (%.1fx real time)' % \
+          (elapsed, gl.sim_time / elapsed if elapsed else 0)
+    print 'Final score     : %s' % gl.score
+    print 'Planes entered  : %d' % gl.challenge.plane_counter
+    for ping, icao in divergences:
+        print 'DIVERGENCE: %s did not enter the aerospace at ping %d' % \
+              (icao, ping)
+    sys.exit(1 if divergences else 0)
+
+if __name__ == '__main__':
+    run_as_script()